@@ -0,0 +1,99 @@
+"""
+..
+  Copyright 2020 The University of Sydney
+  This file is part of entrezpy.
+
+  Entrezpy is free software: you can redistribute it and/or modify it under the
+  terms of the GNU Lesser General Public License as published by the Free
+  Software Foundation, either version 3 of the License, or (at your option) any
+  later version.
+
+  Entrezpy is distributed in the hope that it will be useful, but WITHOUT ANY
+  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+  A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with entrezpy.  If not, see <https://www.gnu.org/licenses/>.
+
+Benchmark parse throughput of EsearchAnalyzer for one Esearch response with
+100,000 UIDs. Logging is either quiet, the entrezpy default, or enabled at the
+given level and written to /dev/null. No network is involved.
+
+Throughput is reported before and after deferring log messages: `eager`
+builds and serializes every message with json.dumps() at the call, also for
+disabled levels, as entrezpy did before
+:class:`entrezpy.log.logger.StructuredLogger`. `deferred` is the current
+logger, which builds messages only for enabled levels.
+
+  $ PYTHONPATH=src python benchmarks/esearch_parse.py
+  $ PYTHONPATH=src python benchmarks/esearch_parse.py --level INFO
+"""
+
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import entrezpy.log.logger
+import entrezpy.esearch.esearch_parameter
+import entrezpy.esearch.esearch_request
+import entrezpy.esearch.esearch_analyzer
+
+
+def make_response(uids):
+  """Returns an Esearch JSON response with uids"""
+  return json.dumps({'header':{'type':'esearch', 'version':'0.3'},
+                     'esearchresult':{'count':str(uids), 'retmax':str(uids),
+                                      'retstart':'0', 'webenv':'benchmark',
+                                      'querykey':'1',
+                                      'idlist':[str(i) for i in range(1, uids+1)]}})
+
+
+def log_eager(self, level, msg, *args, **kwargs):
+  """Replaces :meth:`entrezpy.log.logger.StructuredLogger.log` to build and
+  serialize messages at every call, i.e. before the level check"""
+  msg = entrezpy.log.logger.format_message(msg() if callable(msg) else msg)
+  if self.logger.isEnabledFor(level):
+    self.logger.log(level, msg, *args, **kwargs)
+
+
+def run(response, uids, repeats):
+  """Parses the response repeatedly and returns parsed UIDs per second"""
+  parameter = entrezpy.esearch.esearch_parameter.EsearchParameter({'db':'pubmed',
+                                                                   'term':'benchmark',
+                                                                   'retmax':uids,
+                                                                   'rettype':'uilist'})
+  start = time.time()
+  for _ in range(repeats):
+    request = entrezpy.esearch.esearch_request.EsearchRequest('esearch.fcgi', parameter, 0, uids)
+    analyzer = entrezpy.esearch.esearch_analyzer.EsearchAnalyzer()
+    analyzer.parse(response, request)
+    if len(analyzer.result.uids) != uids:
+      sys.exit("Missing UIDs: {}".format(len(analyzer.result.uids)))
+  return uids * repeats / (time.time() - start)
+
+
+def main():
+  ap = argparse.ArgumentParser(description='EsearchAnalyzer parse throughput')
+  ap.add_argument('--uids', type=int, default=100000)
+  ap.add_argument('--repeats', type=int, default=20)
+  ap.add_argument('--level', type=str, default=None,
+                  help='enable logging at level, e.g. INFO, default: quiet')
+  args = ap.parse_args()
+  if args.level:
+    sys.stderr = open(os.devnull, 'w')
+    entrezpy.log.logger.set_level(args.level)
+  response = make_response(args.uids)
+  level = args.level if args.level else 'quiet'
+  deferred = entrezpy.log.logger.StructuredLogger.log
+  print("level\tlogging\tUIDs/s")
+  for mode, log in (('eager', log_eager), ('deferred', deferred)):
+    entrezpy.log.logger.StructuredLogger.log = log
+    print("{}\t{}\t{:.0f}".format(level, mode, run(response, args.uids, args.repeats)))
+  entrezpy.log.logger.StructuredLogger.log = deferred
+
+
+if __name__ == '__main__':
+  main()
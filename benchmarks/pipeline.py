@@ -0,0 +1,82 @@
+"""
+..
+  Copyright 2020 The University of Sydney
+  This file is part of entrezpy.
+
+  Entrezpy is free software: you can redistribute it and/or modify it under the
+  terms of the GNU Lesser General Public License as published by the Free
+  Software Foundation, either version 3 of the License, or (at your option) any
+  later version.
+
+  Entrezpy is distributed in the hope that it will be useful, but WITHOUT ANY
+  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+  A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with entrezpy.  If not, see <https://www.gnu.org/licenses/>.
+
+Benchmark request throughput of Esummarizer with a slow analyzer for an
+increasing number of parse workers against the E-Utilities stand-in server.
+With 0 parse workers the network threads parse responses themselves.
+
+  $ PYTHONPATH=src python benchmarks/pipeline.py
+"""
+
+
+import sys
+import time
+import argparse
+
+import entrezpy.base.query
+import entrezpy.standin.server
+import entrezpy.standin.network
+import entrezpy.esummary.esummarizer
+import entrezpy.esummary.esummary_analyzer
+
+
+class SlowAnalyzer(entrezpy.esummary.esummary_analyzer.EsummaryAnalyzer):
+  """EsummaryAnalyzer spending a fixed time per response"""
+
+  parse_time = 0.05
+
+  def analyze_result(self, response, request):
+    time.sleep(SlowAnalyzer.parse_time)
+    super().analyze_result(response, request)
+
+
+def run(threads, parse_threads, requests, reqsize):
+  """Runs one Esummary query and returns requests per second"""
+  entrezpy.base.query.EutilsQuery.parse_threads = parse_threads
+  query = entrezpy.esummary.esummarizer.Esummarizer('benchmark', 'benchmark@localhost',
+                                                    apikey='benchmark', threads=threads)
+  query.ratelimiter.set_rate(10000)
+  start = time.time()
+  analyzer = query.inquire({'db':'pubmed', 'id':list(range(1, requests*reqsize+1)),
+                            'reqsize':reqsize}, SlowAnalyzer())
+  duration = time.time() - start
+  if analyzer.result.size() != requests*reqsize:
+    sys.exit("Missing summaries: {}".format(analyzer.result.size()))
+  return requests / duration
+
+
+def main():
+  ap = argparse.ArgumentParser(description='Esummarizer throughput by parse workers')
+  ap.add_argument('--requests', type=int, default=40)
+  ap.add_argument('--reqsize', type=int, default=20)
+  ap.add_argument('--latency', type=float, default=0.1, help='server latency [s]')
+  ap.add_argument('--parse-time', type=float, default=0.05, help='parse time per response [s]')
+  ap.add_argument('--threads', type=int, default=2, help='network threads')
+  ap.add_argument('--parse-threads', type=int, nargs='+', default=[0, 1, 2])
+  args = ap.parse_args()
+  SlowAnalyzer.parse_time = args.parse_time
+  latency = entrezpy.standin.network.Latency.constant(args.latency)
+  with entrezpy.standin.server.StandinServer(latency=latency) as server:
+    entrezpy.base.query.EutilsQuery.base_url = server.url
+    print("threads\tparse\treq/s")
+    for i in args.parse_threads:
+      print("{}\t{}\t{:.1f}".format(args.threads, i,
+                                   run(args.threads, i, args.requests, args.reqsize)))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,117 @@
+"""
+..
+  Copyright 2020 The University of Sydney
+  This file is part of entrezpy.
+
+  Entrezpy is free software: you can redistribute it and/or modify it under the
+  terms of the GNU Lesser General Public License as published by the Free
+  Software Foundation, either version 3 of the License, or (at your option) any
+  later version.
+
+  Entrezpy is distributed in the hope that it will be useful, but WITHOUT ANY
+  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+  A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with entrezpy.  If not, see <https://www.gnu.org/licenses/>.
+
+Benchmark Efetch throughput with a CPU-heavy XML analyzer for an increasing
+number of parse processes against the E-Utilities stand-in server. With 0
+processes the threads of the query parse responses under the GIL. Speedups
+require several cores.
+
+  $ PYTHONPATH=src python benchmarks/processes.py
+"""
+
+
+import sys
+import time
+import argparse
+
+import entrezpy.base.query
+import entrezpy.base.result
+import entrezpy.base.analyzer
+import entrezpy.standin.server
+import entrezpy.efetch.efetcher
+
+
+class GcResult(entrezpy.base.result.EutilsResult):
+  """GC content by UID"""
+
+  def __init__(self, request):
+    super().__init__('efetch', request.query_id, request.db)
+    self.gc = {}
+
+  def size(self):
+    return len(self.gc)
+
+  def isEmpty(self):
+    return not self.gc
+
+  def dump(self):
+    return {'size':self.size()}
+
+  def get_link_parameter(self, reqnum=0):
+    return None
+
+
+class GcAnalyzer(entrezpy.base.analyzer.EutilsAnalyzer):
+  """Parses stand-in XML records and computes their GC content in Python"""
+
+  process_parse = True
+
+  def init_result(self, response, request):
+    if self.result is None:
+      self.result = GcResult(request)
+
+  def analyze_result(self, response, request):
+    self.init_result(response, request)
+    uid = None
+    for _, elem in self.iterparse(response):
+      if elem.tag == 'Id':
+        uid = int(elem.text)
+      if elem.tag == 'Sequence':
+        seq = elem.text * 50
+        self.result.gc[uid] = sum(1 for i in seq if i in 'GC') / len(seq)
+        elem.clear()
+
+  def analyze_error(self, response, request):
+    sys.exit("Error response: {}".format(request.dump_internals()))
+
+  def merge_result(self, result, request):
+    self.init_result(None, request)
+    self.result.gc.update(result.gc)
+
+
+def run(threads, processes, requests, reqsize):
+  """Runs one Efetch query and returns requests per second"""
+  entrezpy.base.query.EutilsQuery.parse_processes = processes
+  query = entrezpy.efetch.efetcher.Efetcher('benchmark', 'benchmark@localhost',
+                                            apikey='benchmark', threads=threads)
+  query.ratelimiter.set_rate(10000)
+  start = time.time()
+  analyzer = query.inquire({'db':'nuccore', 'id':list(range(1, requests*reqsize+1)),
+                            'retmode':'xml', 'reqsize':reqsize}, GcAnalyzer())
+  duration = time.time() - start
+  if analyzer.result.size() != requests*reqsize:
+    sys.exit("Missing records: {}".format(analyzer.result.size()))
+  return requests / duration
+
+
+def main():
+  ap = argparse.ArgumentParser(description='Efetch throughput by parse processes')
+  ap.add_argument('--requests', type=int, default=40)
+  ap.add_argument('--reqsize', type=int, default=200)
+  ap.add_argument('--threads', type=int, default=4)
+  ap.add_argument('--processes', type=int, nargs='+', default=[0, 2, 4])
+  args = ap.parse_args()
+  with entrezpy.standin.server.StandinServer() as server:
+    entrezpy.base.query.EutilsQuery.base_url = server.url
+    print("threads\tprocs\treq/s")
+    for i in args.processes:
+      print("{}\t{}\t{:.1f}".format(args.threads, i,
+                                   run(args.threads, i, args.requests, args.reqsize)))
+
+
+if __name__ == '__main__':
+  main()
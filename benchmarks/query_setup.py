@@ -0,0 +1,53 @@
+"""
+..
+  Copyright 2020 The University of Sydney
+  This file is part of entrezpy.
+
+  Entrezpy is free software: you can redistribute it and/or modify it under the
+  terms of the GNU Lesser General Public License as published by the Free
+  Software Foundation, either version 3 of the License, or (at your option) any
+  later version.
+
+  Entrezpy is distributed in the hope that it will be useful, but WITHOUT ANY
+  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+  A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with entrezpy.  If not, see <https://www.gnu.org/licenses/>.
+
+Benchmark the setup time of queries created directly and from a
+:class:`entrezpy.session.Session`. No requests are sent.
+
+  $ PYTHONPATH=src python benchmarks/query_setup.py
+"""
+
+
+import timeit
+import argparse
+
+import entrezpy.session
+import entrezpy.elink.elinker
+import entrezpy.esummary.esummarizer
+
+
+def main():
+  ap = argparse.ArgumentParser(description='Query setup time')
+  ap.add_argument('--queries', type=int, default=20000)
+  ap.add_argument('--threads', type=int, default=4)
+  args = ap.parse_args()
+  session = entrezpy.session.Session('benchmark', 'benchmark@localhost', apikey='benchmark')
+  setups = [
+    ('Elinker', lambda: entrezpy.elink.elinker.Elinker('benchmark', 'benchmark@localhost',
+                                                       apikey='benchmark')),
+    ('Esummarizer', lambda: entrezpy.esummary.esummarizer.Esummarizer(
+      'benchmark', 'benchmark@localhost', apikey='benchmark', threads=args.threads)),
+    ('Session.elinker', session.elinker),
+    ('Session.esummarizer', lambda: session.esummarizer(threads=args.threads))]
+  print("query\tus/query")
+  for name, setup in setups:
+    duration = timeit.timeit(setup, number=args.queries)
+    print("{}\t{:.1f}".format(name, 1e6 * duration / args.queries))
+
+
+if __name__ == '__main__':
+  main()
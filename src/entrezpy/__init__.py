@@ -1 +1,3 @@
 name = "entrezpy"
+
+from entrezpy.session import Session
@@ -28,9 +28,31 @@ import sys
 import json
 import xml.etree.ElementTree
 
+import entrezpy.requester.responsestream
 import entrezpy.log.logger
 
 
+class XmlErrorResponse(Exception):
+  """Raised by :meth:`EutilsAnalyzer.iterparse` when an ERROR element is
+  encountered in an XML response.
+
+  :param elem: ERROR element
+  :type  elem: :class:`xml.etree.ElementTree.Element`
+  """
+
+  def __init__(self, elem):
+    super().__init__(elem.text)
+    self.elem = elem
+
+  def to_response(self):
+    """Returns the ERROR element as XML response for
+    :meth:`EutilsAnalyzer.analyze_error`.
+
+    :rtype: :class:`io.StringIO`
+    """
+    return io.StringIO(xml.etree.ElementTree.tostring(self.elem, encoding='unicode'))
+
+
 class EutilsAnalyzer:
   """EutilsAnalyzer is the base class for an entrezpy analyzer.
   It prepares the response based on the requested format and checks for
@@ -53,6 +75,33 @@ class EutilsAnalyzer:
   known_fmts = {'xml', 'json', 'text'}
   """Store formats known to EutilsAnalzyer"""
 
+  stream_response = False
+  """Parse responses while they are downloaded. XML and text responses are
+  passed to :meth:`.analyze_result` as text stream instead of
+  :class:`io.StringIO` and memory per request is bounded by the read chunk
+  size, not the response size. Analyzers setting it to `True` must read
+  responses sequentially, e.g. with :func:`xml.etree.ElementTree.iterparse`,
+  and cannot use `getvalue()` or `seek()`."""
+
+  inline_error_check = False
+  """XML responses are parsed once. Analyzers setting it to `True` parse XML
+  with :meth:`.iterparse`, which detects ERROR elements while
+  :meth:`.analyze_result` runs and switches to :meth:`.analyze_error`.
+  Otherwise, XML responses are scanned for errors before being parsed."""
+
+  process_parse = False
+  """Responses can be parsed in worker processes by
+  :class:`entrezpy.requester.processparser.ProcessParser`. Analyzers setting
+  it to `True` implement :meth:`.merge_result` and their results must be
+  picklable."""
+
+  resumable = False
+  """Requests can be skipped when resuming a query from a
+  :class:`entrezpy.requester.journal.Journal`. Analyzers setting it to `True`
+  must not need the responses of earlier runs, e.g. because they wrote each
+  response to a file, and can implement :meth:`.checkpoint` and
+  :meth:`.resume` to continue their output."""
+
   def __init__(self):
     """Inits EutilsAnalyzer with unknown type of result yet. The result needs to
     be set upon receiving the first response by :meth:`.init_result`.
@@ -94,6 +143,56 @@ class EutilsAnalyzer:
     """
     raise NotImplementedError("Require implementation of analyze_result()")
 
+  def new_partial(self):
+    """Returns an empty analyzer parsing one response in a worker process,
+    see :attr:`.process_parse`. Analyzers with constructor parameters need to
+    overwrite it.
+
+    :rtype: :class:`EutilsAnalyzer`
+    """
+    return type(self)()
+
+  def merge_partial(self, partial, request):
+    """Merges an analyzer returned by a worker process into this analyzer.
+
+    :param partial: analyzer from :meth:`.new_partial` after parsing
+    :type  partial: :class:`EutilsAnalyzer`
+    :param request: parsed request
+    :type  request: :class:`entrezpy.base.request.EutilsRequest`
+    """
+    if partial.hasErrorResponse:
+      self.hasErrorResponse = True
+    if partial.result is not None:
+      self.merge_result(partial.result, request)
+
+  def checkpoint(self):
+    """Returns the state of a resumable analyzer recorded in the journal with
+    each completed request, e.g. the offset of its output file. Must be JSON
+    serializable.
+
+    :return: analyzer state or None
+    """
+    return None
+
+  def resume(self, state):
+    """Restores a resumable analyzer before requests completed in an earlier
+    run are skipped.
+
+    :param state: state of the last completed request from
+      :meth:`.checkpoint` or None
+    """
+    pass
+
+  def merge_result(self, result, request):
+    """Virtual function merging the result parsed from one response in a
+    worker process into :attr:`result`.
+
+    :param result: partial result
+    :type  result: :class:`entrezpy.base.result.EutilsResult`
+    :raises NotImplementedError: if implementation is missing
+    """
+    raise NotImplementedError("Require implementation of merge_result()")
+
   def parse(self, raw_response, request):
     """Check for errors and calls parser for the raw response.
 
@@ -104,20 +203,26 @@ class EutilsAnalyzer:
     :raises NotImplementedError: if request format is not in
       :attr:`EutilsAnalyzer.known_fmts`"""
     if request.retmode not in EutilsAnalyzer.known_fmts:
-      self.logger.error(json.dumps({'unknown format': request.retmode}))
+      self.logger.error({'unknown format': request.retmode})
       raise NotImplementedError(f"Unknown format: {request.retmode}")
     #raw_response_decoded = raw_response.read().decode('utf-8')
     #self.logger.info((raw_response, raw_response.status, raw_response.read(), raw_response_decoded))
-    #self.logger.info(json.dumps({'parsing':raw_response_decoded, 'req':request.dump()}))
+    #self.logger.info({'parsing':raw_response_decoded, 'req':request.dump()})
     response = self.convert_response(raw_response, request)
-    if self.isErrorResponse(response, request):
+    if request.retmode == 'xml' and self.inline_error_check:
+      try:
+        self.analyze_result(response, request)
+      except XmlErrorResponse as err:
+        self.hasErrorResponse = True
+        self.analyze_error(err.to_response(), request)
+    elif self.isErrorResponse(response, request):
       self.hasErrorResponse = True
       self.analyze_error(response, request)
     else:
       self.analyze_result(response, request)
 
     if self.result is None:
-      json.dumps({'result attribute': 'not set', 'action':'continue'})
+      self.logger.debug({'result attribute': 'not set', 'action':'continue'})
 
   def convert_response(self, raw_response_decoded, request):
     """
@@ -125,11 +230,12 @@ class EutilsAnalyzer:
     set via the retmode parameter.
 
     :param raw_response:  response :class:`entrezpy.requester.requester.Requester`
-    :type  raw_response: :class:`urllib.request.Request`
+    :type  raw_response: str or
+      :class:`entrezpy.requester.responsestream.ResponseStream`
     :param request: query request
     :type  request: :class:`entrezpy.base.request.EutilsRequest`
     :return: response in parseable format
-    :rtype: dict or :class:`io.stringIO`
+    :rtype: dict, :class:`io.stringIO` or :class:`io.TextIOWrapper` if streamed
 
     ..note::
       Using threads without locks randomly 'looses' the response, i.e. the
@@ -137,8 +243,14 @@ class EutilsAnalyzer:
       threading is not much faster than non-threading. It seems JSON is more
       prone to this than XML.
     """
+    if isinstance(raw_response_decoded, entrezpy.requester.responsestream.ResponseStream):
+      if request.retmode == 'json':
+        return json.loads(raw_response_decoded.read(), strict=False)
+      if request.retmode == 'xml' and not self.inline_error_check:
+        raw_response_decoded.peek()
+      return raw_response_decoded.text()
     if request.retmode == 'json':
-      #self.logger.info(json.dumps({'raw':raw_response_decoded, 'req':request.dump()}))
+      #self.logger.info({'raw':raw_response_decoded, 'req':request.dump()})
       return json.loads(raw_response_decoded, strict=False)
     return io.StringIO(raw_response_decoded)
 
@@ -153,6 +265,8 @@ class EutilsAnalyzer:
     :return: error status
     :rtype: bool"""
     hasErrorResponse = None
+    if request.retmode == 'xml' and isinstance(response, io.TextIOWrapper):
+      return self.check_error_xml_prefix(response.buffer.raw.peek())
     if request.retmode == 'xml':
       hasErrorResponse = self.check_error_xml(response)
       response.seek(0)
@@ -161,6 +275,24 @@ class EutilsAnalyzer:
       hasErrorResponse = self.check_error_json(response)
     return hasErrorResponse
 
+  def iterparse(self, response, events=('end',)):
+    """Iterates over XML parsing events like
+    :func:`xml.etree.ElementTree.iterparse` and detects E-Utilities errors
+    in the same pass. Used by analyzers setting :attr:`inline_error_check`.
+
+    :param response: XML response
+    :type  response: :class:`io.StringIO` or text stream
+    :param tuple events: events to report
+    :return: event and element
+    :rtype: tuple
+    :raises XmlErrorResponse: if an ERROR element ends
+    """
+    for event, elem in xml.etree.ElementTree.iterparse(response, events=set(events) | {'end'}):
+      if event == 'end' and elem.tag == 'ERROR':
+        raise XmlErrorResponse(elem)
+      if event in events:
+        yield event, elem
+
   def check_error_xml(self, response):
     """Checks for errors in XML responses
 
@@ -175,6 +307,23 @@ class EutilsAnalyzer:
       elem.clear()
     return False
 
+  def check_error_xml_prefix(self, prefix):
+    """Checks for errors in the beginning of a streamed XML response. E-Utility
+    error responses are short and report the error at the top.
+
+    :param bytes prefix: beginning of XML response
+    :return: if XML response starts with error message
+    :rtype: bool"""
+    parser = xml.etree.ElementTree.XMLPullParser(events=['start'])
+    try:
+      parser.feed(prefix)
+      for _, elem in parser.read_events():
+        if elem.tag == 'ERROR':
+          return True
+    except xml.etree.ElementTree.ParseError:
+      return False
+    return False
+
   def check_error_json(self, response):
     """Checks for errors in JSON responses. Not unified among Eutil functions.
 
@@ -25,15 +25,24 @@
 
 import atexit
 import base64
-import json
 import os
 import uuid
 import queue
+import weakref
 import threading
 
+import entrezpy.requester.asyncrequester
+import entrezpy.requester.asyncrequestpool
+import entrezpy.requester.cache
 import entrezpy.requester.monitor
+import entrezpy.requester.processparser
+import entrezpy.requester.ratelimiter
+import entrezpy.requester.concurrency
+import entrezpy.requester.hedging
 import entrezpy.requester.requester
 import entrezpy.requester.requestpool
+import entrezpy.requester.retrypolicy
+import entrezpy.requester.singleflight
 import entrezpy.log.logger
 
 
@@ -54,23 +63,82 @@ class EutilsQuery:
 
   - set unique query id
   - check for / set NCBI apikey
-  - initialize :class:`entrezpy.requester.requester.Requester` with allowed
-    requests per second
+  - initialize :class:`entrezpy.requester.requester.Requester` with the
+    process-wide :class:`entrezpy.requester.ratelimiter.RateLimiter` for the
+    apikey, admitting the allowed requests per second across all queries
   - assemble Eutil url for desire EUtils function
   - initialize Multithreading queue and register query at
-    :class:`entrezpy.base.monitor.QueryMonitor` for logging
+    :class:`entrezpy.base.monitor.QueryMonitor` for logging until the query
+    is garbage collected
 
   Multithreading is handled using the nested classes
   :class:`entrezpy.base.query.EutilsQuery.RequestPool` and
-  :class:`entrezpy.base.query.EutilsQuery.ThreadedRequester`."""
+  :class:`entrezpy.base.query.EutilsQuery.ThreadedRequester`, running on the
+  process-wide :class:`entrezpy.requester.workerpool.WorkerPool`."""
 
   base_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
   """Base url for all Eutil request"""
 
-
-  def __init__(self, eutil, tool, email, apikey=None, apikey_var=None, threads=None, qid=None):
+  cache = None
+  """Response cache for all queries, e.g.
+  :class:`entrezpy.requester.cache.ResponseCache` on disk or
+  :class:`entrezpy.requester.memorycache.MemoryResponseCache` in memory.
+  Disabled if None."""
+
+  cassette = None
+  """Cassette recording or replaying the requests of all queries, see
+  :class:`entrezpy.requester.cassette.Cassette`. Disabled if None."""
+
+  parse_threads = 0
+  """Parse workers of threaded queries. If larger than 0, the threads of a
+  query only download responses and parse workers parse them, see
+  :class:`entrezpy.requester.requestpool.RequestPool`."""
+
+  parse_queue_size = None
+  """Maximum number of downloaded responses waiting for parse workers,
+  default is twice the number of threads"""
+
+  retry_policy = entrezpy.requester.retrypolicy.RetryPolicy()
+  """Backoff, retry limits, per-query retry budget and circuit breakers of
+  all queries, see :class:`entrezpy.requester.retrypolicy.RetryPolicy`"""
+
+  parse_processes = 0
+  """Worker processes parsing responses for analyzers setting
+  :attr:`entrezpy.base.analyzer.EutilsAnalyzer.process_parse`, shared by all
+  queries. Disabled if 0, see
+  :class:`entrezpy.requester.processparser.ProcessParser`."""
+
+  adaptive_concurrency = False
+  """Limit the requests in flight per apikey with the shared
+  :class:`entrezpy.requester.concurrency.ConcurrencyController`, which
+  shrinks the limit on 429s, server errors and rising latency. Threads of a
+  query remain the upper bound of its requests in flight."""
+
+  hedge_policy = None
+  """Hedging of small idempotent requests, which send a duplicate try if the
+  first one is slower than the usual latency, see
+  :class:`entrezpy.requester.hedging.HedgePolicy`. Disabled if None."""
+
+  single_flight = None
+  """Coalescing of identical requests in flight of all queries, e.g.
+  :meth:`entrezpy.requester.singleflight.SingleFlight.get_shared`. Requests
+  identical to a request in flight share its call and response, see
+  :class:`entrezpy.requester.singleflight.SingleFlight`. Disabled if None."""
+
+  journal = None
+  """Checkpoint journal of all queries, see
+  :class:`entrezpy.requester.journal.Journal`. Requests of analyzers setting
+  :attr:`entrezpy.base.analyzer.EutilsAnalyzer.resumable` are recorded once
+  parsed and skipped if they completed in an earlier run of a query with
+  the same query id. Disabled if None."""
+
+
+  def __init__(self, eutil, tool, email, apikey=None, apikey_var=None, threads=None, qid=None,
+               session=None):
     """Inits EutilsQuery instance with eutil, toolname, email, apikey,
-    apikey_envar, threads and qid.
+    apikey_envar, threads and qid. Queries created with a session reuse its
+    apikey, monitor, requester, cache statistics and stop event instead of
+    creating their own, see :class:`entrezpy.session.Session`.
 
     :param str eutil: name of eutil function on EUtils server
     :param str tool: tool name
@@ -79,11 +147,14 @@ class EutilsQuery:
     :param str apikey_var: enviroment variable storing NCBI apikey
     :param int threads: set threads for multithreading
     :param str qid: unique query id
+    :param session: session providing shared query setup
+    :type  session: :class:`entrezpy.session.Session`
 
     :ivar id: unique query id
     :ivar base_url: unique query id
     :ivar int requests_per_sec:  default limit of requests/sec (set by NCBI)
     :ivar int max_requests_per_sec:  max.requests/sec with apikeyby (set NCBI)
+    :ivar ratelimiter: rate limiter shared by all queries using the same apikey
     :ivar str url:  full URL for Eutil function
     :ivar str contact:  user email (required by NCBI)
     :ivar str tool:  tool name (required by NCBI)
@@ -91,26 +162,104 @@ class EutilsQuery:
     :ivar int num_threads:  number of threads to use
     :ivar list failed_requests: store failed requests for analysis if desired
     :ivar request_pool: :class:`entrezpy.base.query.EutilsQuery.RequestPool` instance
+    :ivar async_request_pool: :class:`entrezpy.requester.asyncrequestpool.AsyncRequestPool`
+      instance, created by :meth:`.get_async_request_pool` for :meth:`.ainquire`
     :ivar int request_counter: requests counter for a EutilsQuery instance
+    :ivar cache_stats: response cache usage of this query, or of all queries
+      of its session
+    :type cache_stats: :class:`entrezpy.requester.cache.CacheStats`
+    :ivar retry_budget: retries left for all requests of this query
+    :type retry_budget: :class:`entrezpy.requester.retrypolicy.RetryBudget`
+    :ivar concurrency: adaptive limit of requests in flight for the apikey or
+      None if :attr:`adaptive_concurrency` is disabled
+    :type concurrency: :class:`entrezpy.requester.concurrency.ConcurrencyController`
+    :ivar journal: checkpoint journal or None
+    :type journal: :class:`entrezpy.requester.journal.Journal`
+    :ivar str journal_scope: scope of the requests in the journal, the query
+      id or the stage of a Conduit query. Queries without query id have a new
+      id and do not resume.
+    :ivar str journal_owner: unique id claiming the journal scope for this
+      query, see :meth:`entrezpy.requester.journal.Journal.claim`
+    :ivar int resumed_requests: requests skipped since they completed in an
+      earlier run
     """
-    self.id = base64.urlsafe_b64encode(uuid.uuid4().bytes).decode('utf-8') if not qid else qid
     self.eutil = eutil
     self.requests_per_sec = 3
     self.max_requests_per_sec = 10
     self.url = '/'.join([EutilsQuery.base_url, self.eutil])
     self.contact = email
     self.tool = tool
-    self.apikey = self.check_ncbi_apikey(apikey, apikey_var)
-    self.num_threads = 0 if not threads else threads
     self.failed_requests = []
     self.request_counter = 0
+    self.retry_budget = None
+    self.concurrency = None
+    self.journal = EutilsQuery.journal
+    self.journal_scope = None
+    self.journal_owner = uuid.uuid4().hex
+    self.resumed_requests = 0
+    self.resumed = set()
+    self.session = session
+    if session is not None:
+      self.init_from_session(session, threads, qid)
+      return
+    self.id = base64.urlsafe_b64encode(uuid.uuid4().bytes).decode('utf-8') if not qid else qid
+    self.journal_scope = self.id
+    self.apikey = self.check_ncbi_apikey(apikey, apikey_var)
+    self.num_threads = 0 if not threads else threads
     self.query_monitor = entrezpy.requester.monitor.QueryMonitor(self.id)
+    weakref.finalize(self, self.query_monitor.release_query, self.id)
+    self.ratelimiter = entrezpy.requester.ratelimiter.RateLimiter.get_limiter(self.apikey,
+                                                                              self.requests_per_sec)
+    self.cache_stats = entrezpy.requester.cache.CacheStats()
+    self.retry_budget = EutilsQuery.retry_policy.new_budget()
+    if EutilsQuery.adaptive_concurrency:
+      self.concurrency = entrezpy.requester.concurrency.ConcurrencyController.get_controller(
+        self.apikey)
+    requester = entrezpy.requester.requester.Requester(1/self.requests_per_sec,
+                                                       ratelimiter=self.ratelimiter,
+                                                       cache=EutilsQuery.cache,
+                                                       cache_stats=self.cache_stats,
+                                                       cassette=EutilsQuery.cassette,
+                                                       retry_policy=EutilsQuery.retry_policy,
+                                                       concurrency=self.concurrency,
+                                                       hedge_policy=EutilsQuery.hedge_policy,
+                                                       single_flight=EutilsQuery.single_flight)
     self.request_pool = entrezpy.requester.requestpool.RequestPool(self.num_threads,
                                                                    self.failed_requests,
                                                                    self.query_monitor,
-                                                                   entrezpy.requester.requester.Requester(1/self.requests_per_sec))
+                                                                   requester,
+                                                                   EutilsQuery.parse_threads,
+                                                                   EutilsQuery.parse_queue_size,
+                                                                   self.get_process_parser())
+    self.async_request_pool = None
+    self.logger = entrezpy.log.logger.get_class_logger(EutilsQuery)
+    self.logger.debug(lambda: {'init':self.dump()})
+
+  def init_from_session(self, session, threads=None, qid=None):
+    """Inits the query with the shared setup of a session. Only the request
+    pool is created per query.
+
+    :param session: session providing shared query setup
+    :type  session: :class:`entrezpy.session.Session`
+    :param int threads: threads for this query, default are the session threads
+    :param str qid: unique query id, default is a new session query id
+    """
+    self.id = qid if qid else session.new_query_id()
+    self.journal_scope = self.id
+    self.apikey = session.apikey
+    self.requests_per_sec = session.requests_per_sec
+    self.num_threads = session.threads if threads is None else threads
+    self.query_monitor = session.query_monitor
+    self.query_monitor.register_query(self.id)
+    weakref.finalize(self, self.query_monitor.release_query, self.id)
+    self.ratelimiter = session.ratelimiter
+    self.cache_stats = session.cache_stats
+    self.retry_budget = session.retry_policy.new_budget()
+    self.concurrency = session.concurrency
+    self.journal = session.journal
+    self.request_pool = session.new_request_pool(self.num_threads, self.failed_requests)
+    self.async_request_pool = None
     self.logger = entrezpy.log.logger.get_class_logger(EutilsQuery)
-    self.logger.debug(json.dumps({'init':self.dump()}))
 
   def inquire(self, parameter, analyzer):
     """Virtual function starting query. Each query requires its own implementation.
@@ -123,6 +272,18 @@ class EutilsQuery:
     """
     raise NotImplementedError("{} requires inquire() implementation".format(__name__))
 
+  async def ainquire(self, parameter, analyzer):
+    """Virtual coroutine starting query on an asyncio event loop. Same as
+    :meth:`.inquire` but sends requests via :meth:`.add_async_request`.
+
+    :param dict parameter: E-Utilities parameters
+    :param analzyer: query response analyzer
+    :type  analzyer: :class:`entrezpy.base.analyzer.EutilsAnalzyer`
+    :returns: analyzer
+    :rtype: :class:`entrezpy.base.analyzer.EutilsAnalzyer`
+    """
+    raise NotImplementedError("{} requires ainquire() implementation".format(__name__))
+
   def check_requests(self):
     """Virtual function testing and handling failed requests. These requests
     fail due to HTTP/URL issues and stored
@@ -161,9 +322,40 @@ class EutilsQuery:
     request.url = self.url
     request.tool = self.tool
     request.apikey = self.apikey
+    request.retry_budget = self.retry_budget
     request.status = 2
     return request
 
+  def isResumed(self, request, analyzer):
+    """Tests if a request of a resumable analyzer completed in an earlier run
+    recorded in the journal. Otherwise the request is recorded once parsed.
+    Only the first query of a scope in a process resumes. Before the first
+    request of an analyzer is skipped, the analyzer is restored with the last
+    state of the query scope.
+
+    :param request: prepared entrezpy request
+    :type  request: :class:`entrezpy.base.request.EutilsRequest`
+    :param analzyer: entrezpy analyzer instance
+    :type analyzer: :class:`entrezpy.base.analzyer.EutilsAnalyzer`
+    :rtype: bool
+    """
+    if self.journal is None or not analyzer.resumable:
+      return False
+    request.journal = self.journal
+    request.journal_scope = self.journal_scope
+    request.journal_key = request.get_cache_key()
+    if not self.journal.claim(self.journal_scope, self.journal_owner):
+      return False
+    if not self.journal.isDone(self.journal_scope, request.journal_key):
+      return False
+    if id(analyzer) not in self.resumed:
+      self.resumed.add(id(analyzer))
+      analyzer.resume(self.journal.get_state(self.journal_scope))
+    self.resumed_requests += 1
+    self.journal.count_resumed()
+    self.logger.debug({'query':self.id, 'request':request.id, 'resumed':request.journal_key})
+    return True
+
   def add_request(self, request, analyzer):
     """Adds one request and corresponding analyzer to the request pool.
 
@@ -172,7 +364,58 @@ class EutilsQuery:
     :param analzyer: entrezpy analyzer instance
     :type analyzer: :class:`entrezpy.base.analzyer.EutilsAnalyzer`
     """
-    self.request_pool.add_request(self.prepare_request(request), analyzer)
+    request = self.prepare_request(request)
+    if not self.isResumed(request, analyzer):
+      self.request_pool.add_request(request, analyzer)
+    self.request_counter += 1
+
+  def get_process_parser(self):
+    """Returns the process-wide parser with :attr:`parse_processes` worker
+    processes or None if disabled.
+
+    :rtype: :class:`entrezpy.requester.processparser.ProcessParser` or None
+    """
+    if EutilsQuery.parse_processes > 0:
+      return entrezpy.requester.processparser.ProcessParser.get_shared(EutilsQuery.parse_processes)
+    return None
+
+  def get_async_request_pool(self):
+    """Returns the request pool for asyncio queries and creates it if required.
+    It shares the rate limiter with :attr:`request_pool`.
+
+    :rtype: :class:`entrezpy.requester.asyncrequestpool.AsyncRequestPool`
+    """
+    if self.async_request_pool is None:
+      if self.session is not None:
+        requester = self.session.get_async_requester()
+      else:
+        requester = entrezpy.requester.asyncrequester.AsyncRequester(1/self.requests_per_sec,
+                                                                     ratelimiter=self.ratelimiter,
+                                                                     cache=EutilsQuery.cache,
+                                                                     cache_stats=self.cache_stats,
+                                                                     cassette=EutilsQuery.cassette,
+                                                                     retry_policy=EutilsQuery.retry_policy,
+                                                                     concurrency=self.concurrency,
+                                                                     hedge_policy=EutilsQuery.hedge_policy,
+                                                                     single_flight=EutilsQuery.single_flight)
+      self.async_request_pool = entrezpy.requester.asyncrequestpool.AsyncRequestPool(self.failed_requests,
+                                                                                     self.query_monitor,
+                                                                                     requester)
+    return self.async_request_pool
+
+  def add_async_request(self, request, analyzer):
+    """Adds one request and corresponding analyzer to the asyncio request
+    pool. Requests are sent by awaiting
+    :meth:`entrezpy.requester.asyncrequestpool.AsyncRequestPool.drain`.
+
+    :param request: entrezpy request instance
+    :type  request: :class:`entrezpy.base.request.EutilsRequest`
+    :param analzyer: entrezpy analyzer instance
+    :type analyzer: :class:`entrezpy.base.analzyer.EutilsAnalyzer`
+    """
+    request = self.prepare_request(request)
+    if not self.isResumed(request, analyzer):
+      self.get_async_request_pool().add_request(request, analyzer)
     self.request_counter += 1
 
   def monitor_start(self, query_parameters):
@@ -195,6 +438,24 @@ class EutilsQuery:
     """
     self.query_monitor.update_observer(self.id, updated_query_parameters)
 
+  def get_cache_stats(self):
+    """Returns the response cache usage of this query: hits, misses,
+    bypassed requests, stored responses and transferred bytes.
+
+    :rtype: dict
+    """
+    return self.cache_stats.dump()
+
+  def get_concurrency(self):
+    """Returns the adaptive concurrency limit of the apikey: current window,
+    requests in flight, p95 latency and its baseline, or None if disabled.
+
+    :rtype: dict or None
+    """
+    if self.concurrency is None:
+      return None
+    return self.concurrency.dump()
+
   def hasFailedRequests(self):
     """Reports if at least one request failed."""
     if self.failed_requests:
@@ -206,7 +467,12 @@ class EutilsQuery:
     return {'id':self.id, 'base_url':EutilsQuery.base_url, 'eutil':self.eutil,
             'url':self.url, 'req/sec':self.requests_per_sec, 'tool':self.tool,
             'contact':self.contact, 'apikey':self.apikey,
-            'threads':self.num_threads}
+            'threads':self.num_threads, 'parse_threads':EutilsQuery.parse_threads,
+            'parse_processes':EutilsQuery.parse_processes,
+            'concurrency':self.concurrency.limit() if self.concurrency else None,
+            'journal':self.journal.path if self.journal else None,
+            'resumed_requests':self.resumed_requests,
+            'cache':type(EutilsQuery.cache).__name__ if EutilsQuery.cache else None}
 
   def isGoodQuery(self):
     """
@@ -215,8 +481,8 @@ class EutilsQuery:
       :rtype: bool
     """
     if not self.failed_requests:
-      self.logger.debug(json.dumps({'query':self.id, 'status':'OK'}))
+      self.logger.debug({'query':self.id, 'status':'OK'})
       return True
-    self.logger.debug(json.dumps({'query':self.id, 'status':'failed',
-      'request-dumps':[x.dump_internals() for x in self.failed_requests]}))
+    self.logger.debug(lambda: {'query':self.id, 'status':'failed',
+      'request-dumps':[x.dump_internals() for x in self.failed_requests]})
     return False
@@ -23,9 +23,10 @@
 .. moduleauthor:: Jan P Buchmann <jan.buchmann@sydney.edu.au>
 """
 
-import json
 from socket import gaierror
 import time
+import json
+import hashlib
 
 import entrezpy.log.logger
 
@@ -54,6 +55,9 @@ class EutilsRequest:
   :param str db: database for request
   """
 
+  uncached_parameters = frozenset(['email', 'tool', 'api_key'])
+  """Parameters not affecting the response, ignored by :meth:`get_cache_key`"""
+
   def __init__(self, eutil, db):
     """ Initializes a new request with initial attributes as part of a query in
     :class:`entrezpy.base.query.EutilsQuery`.
@@ -69,6 +73,15 @@ class EutilsRequest:
     :ivar float start_time: start time of request in seconds since epoch
     :ivar duration: duration for this request in seconds
     :ivar doseq: set doseq parameter in :meth:`entrezpy.request.Request.request`
+    :ivar int bytes_received: response body size as received, i.e. compressed
+    :ivar int bytes_decoded: response body size after decompression
+    :ivar bool cached: response was served from the response cache
+    :ivar retry_budget: retry budget of the query
+    :type retry_budget: :class:`entrezpy.requester.retrypolicy.RetryBudget`
+    :ivar journal: journal recording this request once parsed or None
+    :type journal: :class:`entrezpy.requester.journal.Journal`
+    :ivar str journal_scope: scope of the request in the journal
+    :ivar str journal_key: key of the request in the journal
 
     .. note:: :attr:`.status` is work in progress.
     """
@@ -86,6 +99,13 @@ class EutilsRequest:
     self.start_time = None
     self.duration = None
     self.doseq = True
+    self.bytes_received = None
+    self.bytes_decoded = None
+    self.cached = False
+    self.retry_budget = None
+    self.journal = None
+    self.journal_scope = None
+    self.journal_key = None
     self.logger = entrezpy.log.logger.get_class_logger(EutilsRequest)
 
   def get_post_parameter(self):
@@ -98,6 +118,48 @@ class EutilsRequest:
     """
     raise NotImplementedError()
 
+  def get_cache_key(self, parameter=None, isUrlKeyed=True):
+    """Returns the key identifying the response of this request in a
+    :class:`entrezpy.requester.cache.ResponseCache`. The key is the SHA-256
+    digest of the URL, i.e. host and E-Utility, and the normalized POST
+    parameters, i.e. sorted parameters with string values without email,
+    tool, api_key and unset parameters. The order of values in lists, e.g.
+    UIDs, is kept since it determines the order of the response.
+
+    :param dict parameter: POST parameters, default
+      :meth:`get_post_parameter`
+    :param bool isUrlKeyed: include the URL, otherwise only the E-Utility,
+      e.g. to replay a cassette against another host
+    :rtype: str
+    """
+    if parameter is None:
+      parameter = self.get_post_parameter()
+    normalized = {}
+    for i in parameter:
+      if i in EutilsRequest.uncached_parameters or parameter[i] is None:
+        continue
+      if isinstance(parameter[i], (list, tuple)):
+        normalized[i] = [str(x) for x in parameter[i]]
+      else:
+        normalized[i] = str(parameter[i])
+    key = json.dumps([self.url if isUrlKeyed else None, self.eutil, normalized], sort_keys=True,
+                     separators=(',', ':'))
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+  @staticmethod
+  def isHistoryStoring(eutil, parameter):
+    """Tests if a request stores results on the History server, i.e. epost,
+    Esearch with `usehistory` or Elink `*_history` commands. Their responses
+    hold new WebEnv and query_key references and must be requested anew.
+
+    :param str eutil: E-Utility, e.g. elink.fcgi
+    :param dict parameter: POST parameters
+    :rtype: bool
+    """
+    if eutil == 'epost.fcgi' or parameter.get('usehistory'):
+      return True
+    return str(parameter.get('cmd', '')).endswith('_history')
+
   def prepare_base_qry(self, extend=None):
     """
     Returns instance attributes required for every POST request.
@@ -125,9 +187,9 @@ class EutilsRequest:
     """
     Reports request status when triggered
     """
-    self.logger.info(json.dumps({'query':self.query_id,
-      'request':self.id, 'status':self.status}))
-    self.logger.debug(json.dumps({'status': self.dump_internals()}))
+    self.logger.info({'query':self.query_id,
+      'request':self.id, 'status':self.status})
+    self.logger.debug(lambda: {'status': self.dump_internals()})
 
   def get_request_id(self):
     """
@@ -145,6 +207,15 @@ class EutilsRequest:
     self.request_error = error
     self.status = 1
 
+  def set_transfer_size(self, received, decoded):
+    """Sets the size of the response body as received and after decompression
+
+    :param int received: received bytes
+    :param int decoded: decompressed bytes
+    """
+    self.bytes_received = received
+    self.bytes_decoded = decoded
+
   def start_stopwatch(self):
     """Starts time to measure request duration."""
     self.start_time = time.time()
@@ -164,7 +235,8 @@ class EutilsRequest:
 
     reqdump = {'eutil':self.eutil, 'db':self.db, 'id':self.id, 'query_id':self.query_id,
                 'tool':self.tool, 'url':self.url, 'email':self.contact, 'size':self.size,
-                'request_error':self.request_error, 'apikey':'no'}
+                'request_error':self.request_error, 'apikey':'no',
+                'bytes_received':self.bytes_received, 'bytes_decoded':self.bytes_decoded, 'cached':self.cached}
     if self.request_error is gaierror:
       reqdump['request_error'] = 'gaierror'
     if self.apikey is not None:
@@ -25,10 +25,16 @@
 import sys
 import json
 import uuid
+import heapq
 import base64
+import hashlib
 import queue
+import asyncio
 import logging
 
+import entrezpy.base.analyzer
+import entrezpy.base.query
+import entrezpy.base.result
 import entrezpy.esearch.esearcher
 import entrezpy.esearch.esearch_analyzer
 import entrezpy.elink.elinker
@@ -38,6 +44,8 @@ import entrezpy.epost.epost_analyzer
 import entrezpy.efetch.efetcher
 import entrezpy.esummary.esummarizer
 import entrezpy.esummary.esummary_analyzer
+import entrezpy.registry
+import entrezpy.requester.workerpool
 import entrezpy.log.logger
 
 
@@ -55,17 +63,86 @@ class Conduit:
   by all Conduit instances. A single :class:`Conduit.Pipeline` stores only the
   query id for this instance
 
+  Scheduling
+  ----------
+  :meth:`run` orders the queries of a pipeline into a dependency graph,
+  :class:`Conduit.QueryGraph`, using :attr:`Conduit.Query.dependency`.
+  Queries without pending dependency run concurrently on the shared
+  :class:`entrezpy.requester.workerpool.WorkerPool`, and each query starts as
+  soon as its dependency has been resolved. Independent branches, e.g.
+  several searches each followed by a fetch, therefore take as long as the
+  longest branch instead of the sum of all queries. All queries share the
+  rate limiter of the apikey. With `max_queries` set to 1, queries run one
+  after another in the calling thread, e.g. for analyzers using SQLite3.
+
+  Streaming
+  ---------
+  Esummary and Efetch queries added with `stream=True` and depending on an
+  Esearch query start together with it and consume its UIDs in batches, one
+  per Esearch response, through a :class:`Conduit.UidStream`. Requests for
+  the first UIDs are in flight while Esearch is still paging, overlapping
+  both stages. Each batch is requested by the same query and analyzer. If
+  the Esearch query yields no UIDs, e.g. only History server references,
+  the query runs after it as usual. Streaming requires concurrent queries
+  and is not used by :meth:`arun` or with `max_queries` set to 1.
+
+  Checkpoints
+  -----------
+  With a journal set in :attr:`entrezpy.base.query.EutilsQuery.journal` or
+  the session, each completed query is recorded as pipeline stage with its
+  follow-up parameters, e.g. WebEnv and query_key, see
+  :class:`entrezpy.requester.journal.Journal`. A stage is identified by
+  :attr:`Conduit.Query.key`, which is the same when the pipeline is set up
+  again in a restarted process, i.e. created in the same order from a new
+  Conduit. Running it again restores stages completed in the earlier run as
+  :class:`Conduit.JournaledAnalyzer` without requests, and queries of
+  resumable analyzers, e.g. Efetch, skip requests completed before they were
+  interrupted. Each stage is restored once, running a pipeline again in the
+  same process sends its requests again. A streaming query interrupted before it completed resumes
+  from the History server reference of its Esearch dependency, not from its
+  streamed batches.
+
+  Storage
+  -------
+  Analyzers are stored in :attr:`Conduit.analyzers`, an
+  :class:`entrezpy.registry.AnalyzerRegistry`, until released with
+  :meth:`release` or :meth:`release_pipeline`. Queries retain the analyzer
+  of their dependency until they completed. Long-running processes can
+  bound the analyzers in memory by spilling completed ones to disk, e.g.
+  `Conduit.analyzers = AnalyzerRegistry(max_analyzers=100, spill_dir=path)`.
+
   :param str email: user email
   :param str apikey: NCBI apikey
   :param str apikey_var: enviroment variable storing NCBI apikey
   :param int threads: set threads for multithreading
+  :param session: session shared by all queries of the Conduit, see
+    :class:`entrezpy.session.Session`
+  :type  session: :class:`entrezpy.session.Session`
+  :param int max_queries: maximum number of concurrently running queries of
+    a pipeline, None for no limit
   """
 
   queries = {}
   """Query storage"""
 
-  analyzers = {}
-  """Analyzed query storage"""
+  analyzers = entrezpy.registry.AnalyzerRegistry()
+  """Analyzed query storage, see :class:`entrezpy.registry.AnalyzerRegistry`"""
+
+  queriers = {'esearch' : (entrezpy.esearch.esearcher.Esearcher,
+                           entrezpy.esearch.esearch_analyzer.EsearchAnalyzer),
+              'elink' : (entrezpy.elink.elinker.Elinker,
+                         entrezpy.elink.elink_analyzer.ElinkAnalyzer),
+              'epost' : (entrezpy.epost.eposter.Eposter,
+                         entrezpy.epost.epost_analyzer.EpostAnalyzer),
+              'esummary' : (entrezpy.esummary.esummarizer.Esummarizer,
+                            entrezpy.esummary.esummary_analyzer.EsummaryAnalyzer),
+              'efetch' : (entrezpy.efetch.efetcher.Efetcher,
+                          entrezpy.efetch.efetch_analyzer.EfetchAnalyzer)}
+  """Query and default analyzer classes by Eutils function"""
+
+  runners = {'esearch':'search', 'elink':'link', 'epost':'post', 'esummary':'summarize',
+             'efetch':'fetch'}
+  """Methods running a query by Eutils function"""
 
   class Query:
     """ Entrezpy query for a Conduit pipeline. Conduit assembles pipelines using
@@ -77,13 +154,21 @@ class Conduit:
     :param str dependency: query id from earlier query
     :param analyzer: analyzer instance for this query
     :type analyzer: :class:`entrezpy.base.analyzer.EutilsAnalyzer`
+    :param bool stream: consume the UIDs of an Esearch dependency while it is
+      running
+
+    The analyzer is stored in :attr:`Conduit.analyzers` once the query
+    completed and no longer referenced by the query.
     """
 
-    def __init__(self, function, parameter, dependency=None, analyzer=None):
+    streamable = frozenset(['esummary', 'efetch'])
+    """Eutils functions able to consume streamed UIDs"""
+
+    def __init__(self, function, parameter, dependency=None, analyzer=None, stream=False):
       self.logger = entrezpy.log.logger.get_class_logger(Conduit.Query)
       if not parameter and not dependency:
-        sys.exit(self.logger.error(json.dumps({'Missing required arguments':'parameter/dependency',
-                                               'action' : 'abort'})))
+        sys.exit(self.logger.error({'Missing required arguments':'parameter/dependency',
+                                    'action' : 'abort'}))
       if not parameter:
         parameter = {}
       self.id = base64.urlsafe_b64encode(uuid.uuid4().bytes).decode()
@@ -91,7 +176,25 @@ class Conduit:
       self.parameter = parameter
       self.dependency = dependency
       self.analyzer = analyzer
-      self.logger.debug(json.dumps({'init': self.dump()}))
+      self.stream = stream and function in Conduit.Query.streamable
+      self.key = self.get_key()
+      self.isRetaining = False
+      self.logger.debug(lambda: {'init': self.dump()})
+
+    def get_key(self, pipeline=None):
+      """Returns the stage key identifying this query in a journal across runs
+      of the same pipeline, i.e. the SHA-256 digest of function, parameters,
+      stream flag, the stage key of its dependency and the pipeline ordinal.
+
+      :param int pipeline: ordinal of the pipeline, see
+        :class:`Conduit.Pipeline`
+      :rtype: str
+      """
+      dependency = Conduit.queries.get(self.dependency)
+      key = json.dumps([self.function, self.parameter, self.stream,
+                        dependency.key if dependency else self.dependency, pipeline],
+                       sort_keys=True, separators=(',', ':'), default=str)
+      return hashlib.sha256(key.encode('utf-8')).hexdigest()
 
     def resolve_dependency(self):
       """Resolves dependencies to obtain paremeters from earlier query.
@@ -103,24 +206,84 @@ class Conduit:
           parameter['dbfrom'] = parameter['db']
         parameter.update(self.parameter)
         self.parameter = parameter
-        self.logger.debug(json.dumps({'resolved dependency': self.dump()}))
+        self.logger.debug(lambda: {'resolved dependency': self.dump()})
 
     def dump(self):
       return {'id':self.id, 'function':self.function, 'param':self.parameter,
-              'dependency':self.dependency}
+              'dependency':self.dependency, 'stream':self.stream, 'key':self.key}
+
+  class JournaledResult(entrezpy.base.result.EutilsResult):
+    """JournaledResult is the result of a pipeline query completed in an
+    earlier run. It returns the follow-up parameters and size recorded in the
+    journal to dependent queries.
+
+    :param query: Conduit query
+    :type  query: :class:`Conduit.Query`
+    :param dict record: stage record from
+      :meth:`entrezpy.requester.journal.Journal.take_stage`
+    """
+
+    def __init__(self, query, record):
+      link = record['link'] if record['link'] else {}
+      webenv = link.get('WebEnv') if link.get('query_key') is not None else None
+      super().__init__(query.function, query.id, link.get('db'), webenv, link.get('query_key'))
+      self.record = record
+
+    def size(self):
+      """:rtype: int or None"""
+      return self.record['size']
+
+    def isEmpty(self):
+      """:rtype: bool"""
+      return bool(self.record['empty'])
+
+    def get_link_parameter(self, reqnum=0):
+      """Returns the recorded follow-up parameters
+
+      :rtype: dict
+      """
+      return dict(self.record['link']) if self.record['link'] else {}
+
+    def dump(self):
+      return {'function':self.function, 'query_id':self.query_id, 'db':self.db,
+              'stage':self.record['key'], 'size':self.record['size'],
+              'empty':self.record['empty'], 'references':self.references.dump()}
+
+  class JournaledAnalyzer(entrezpy.base.analyzer.EutilsAnalyzer):
+    """JournaledAnalyzer replaces the analyzer of a pipeline query completed
+    in an earlier run and holds its :class:`Conduit.JournaledResult`.
+
+    :param query: Conduit query
+    :type  query: :class:`Conduit.Query`
+    :param dict record: stage record
+    """
+
+    def __init__(self, query, record):
+      super().__init__()
+      self.result = Conduit.JournaledResult(query, record)
+
+    def isEmpty(self):
+      return self.result.isEmpty()
 
   class Pipeline:
     """The Pipeline class implements a query pipeline with several consecutive
     queries. New pipelines are obtained through :class:`.Conduit`. Query
     instances are stored in :attr:`Conduit.queries` and the corresponding query
     id's in :attr:`.queries`. Every added query returns its id which can be
-    used to retrieve it. """
+    used to retrieve it.
 
-    def __init__(self):
+    :param int ordinal: position of the pipeline among the pipelines of its
+      Conduit, part of the stage keys of its queries
+    """
+
+    def __init__(self, ordinal=None):
       """:ivar  queries: queries for this Pipeline instance
          :type  queries: :class:`queue.Queue()`
+         :ivar list query_ids: ids of all queries added to this Pipeline
       """
       self.queries = queue.Queue()
+      self.query_ids = []
+      self.ordinal = ordinal
 
     def add_search(self, parameter=None, dependency=None, analyzer=None):
       """Adds Esearch query
@@ -142,15 +305,19 @@ class Conduit:
       """Adds Epost query. Signature as :meth:`Conduit.Pipeline.add_search`"""
       return self.add_query(Conduit.Query('epost', parameter, dependency, analyzer))
 
-    def add_summary(self, parameter=None, dependency=None, analyzer=None):
-      """Adds Esummary query. Signature as :meth:`Conduit.Pipeline.add_search`"""
-      return self.add_query(Conduit.Query('esummary', parameter, dependency, analyzer))
+    def add_summary(self, parameter=None, dependency=None, analyzer=None, stream=False):
+      """Adds Esummary query. Signature as :meth:`Conduit.Pipeline.add_search`.
+      With `stream`, UIDs of an Esearch dependency are summarized while it is
+      running."""
+      return self.add_query(Conduit.Query('esummary', parameter, dependency, analyzer, stream))
 
-    def add_fetch(self, parameter=None, dependency=None, analyzer=None):
+    def add_fetch(self, parameter=None, dependency=None, analyzer=None, stream=False):
       """Adds Efetch query. Same signature as :meth:`Conduit.Pipeline.add_search`
       but analyzer is required as this step obtains highly variable results.
+      With `stream`, UIDs of an Esearch dependency are fetched while it is
+      running.
       """
-      return self.add_query(Conduit.Query('efetch', parameter, dependency, analyzer))
+      return self.add_query(Conduit.Query('efetch', parameter, dependency, analyzer, stream))
 
     def add_query(self, query):
       """Adds query to own pipeline and storage
@@ -160,44 +327,485 @@ class Conduit:
       :return: query id of added query
       :rtype: str
       """
+      query.key = query.get_key(self.ordinal)
       self.queries.put(query.id)
+      self.query_ids.append(query.id)
       Conduit.queries[query.id] = query
+      if query.dependency:
+        Conduit.analyzers.retain(query.dependency)
+        query.isRetaining = True
       return query.id
 
-  def __init__(self, email, apikey=None, apikey_envar=None, threads=None):
+  class QueryGraph:
+    """QueryGraph orders the queries of a pipeline by their dependencies.
+    Queries depending on a query outside the pipeline, e.g. from an earlier
+    run, only wait if that query has no stored analyzer yet. Ready queries
+    are returned in pipeline order. Streaming queries depending on an Esearch
+    query in the pipeline become ready when it starts.
+
+    :param list query_ids: query ids in pipeline order
+    :param bool isStreaming: allow streaming queries
+    """
+
+    def __init__(self, query_ids, isStreaming=True):
+      self.order = query_ids
+      self.index = {qid:i for i, qid in enumerate(query_ids)}
+      self.dependents = {qid:[] for qid in query_ids}
+      self.streaming = {qid:[] for qid in query_ids}
+      self.ready = []
+      self.waiting = set()
+      self.skipped = {}
+      for qid in query_ids:
+        dependency = Conduit.queries[qid].dependency
+        if isStreaming and Conduit.queries[qid].stream and dependency in self.dependents and \
+           Conduit.queries[dependency].function == 'esearch':
+          self.streaming[dependency].append(qid)
+          self.waiting.add(qid)
+        elif dependency in self.dependents:
+          self.dependents[dependency].append(qid)
+          self.waiting.add(qid)
+        elif dependency and dependency not in Conduit.analyzers:
+          self.waiting.add(qid)
+        else:
+          heapq.heappush(self.ready, (self.index[qid], qid))
+
+    def hasReady(self):
+      """:rtype: bool"""
+      return bool(self.ready)
+
+    def next_query(self):
+      """Returns the first ready query id in pipeline order
+
+      :rtype: str
+      """
+      return heapq.heappop(self.ready)[1]
+
+    def start(self, query_id):
+      """Marks a query as started and its streaming dependents as ready
+
+      :param str query_id: query id
+      :return: streaming dependents
+      :rtype: list
+      """
+      for i in self.streaming[query_id]:
+        self.waiting.discard(i)
+        heapq.heappush(self.ready, (self.index[i], i))
+      return self.streaming[query_id]
+
+    def resolve(self, query_id):
+      """Marks a query as done and its dependents as ready
+
+      :param str query_id: query id
+      """
+      for i in self.dependents[query_id]:
+        self.waiting.discard(i)
+        heapq.heappush(self.ready, (self.index[i], i))
+
+    def skip(self, query_id):
+      """Skips all queries depending directly or indirectly on a query,
+      e.g. after an empty response
+
+      :param str query_id: query id
+      """
+      dependents = list(self.dependents[query_id])
+      while dependents:
+        qid = dependents.pop()
+        self.waiting.discard(qid)
+        self.skipped[qid] = query_id
+        dependents.extend(self.dependents[qid])
+
+    def skip_streaming(self, query_id):
+      """Skips a streaming query whose Esearch dependency had no results and
+      all queries depending on it
+
+      :param str query_id: query id
+      """
+      self.skipped[query_id] = Conduit.queries[query_id].dependency
+      self.skip(query_id)
+
+    def get_last(self):
+      """Returns the last query of the pipeline or, if skipped, the query
+      whose empty response skipped it
+
+      :rtype: str
+      """
+      query_id = self.order[-1]
+      while query_id in self.skipped:
+        query_id = self.skipped[query_id]
+      return query_id
+
+  class UidStream:
+    """UidStream passes UID batches from a running Esearch query to a
+    streaming query. Batches are added by
+    :meth:`entrezpy.esearch.esearch_analyzer.EsearchAnalyzer.add_uid_listener`
+    callbacks and the stream is closed once the Esearch query finished.
+    Iterating the stream blocks until the next batch or the end and merges
+    all batches added meanwhile, i.e. a consumer slower than Esearch gets
+    fewer but larger batches to request with all its threads.
+    """
+
+    def __init__(self):
+      self.batches = queue.SimpleQueue()
+      self.uids = 0
+
+    def put(self, uids):
+      """Adds a batch of UIDs
+
+      :param list uids: UIDs of one Esearch response
+      """
+      if uids:
+        self.uids += len(uids)
+        self.batches.put(uids)
+
+    def close(self):
+      """Ends the stream"""
+      self.batches.put(None)
+
+    def __iter__(self):
+      isClosed = False
+      while not isClosed:
+        uids = self.batches.get()
+        if uids is None:
+          return
+        while not self.batches.empty():
+          batch = self.batches.get()
+          if batch is None:
+            isClosed = True
+            break
+          uids = uids + batch
+        yield uids
+
+  def __init__(self, email, apikey=None, apikey_envar=None, threads=None, session=None,
+               max_queries=None):
     self.tool = 'entrezpyConduit'
     self.email = email
     self.apikey = apikey
     self.api_envar = apikey_envar
     self.threads = threads
+    self.session = session
+    self.max_queries = max_queries
+    self.pipelines = 0
     self.logger = entrezpy.log.logger.get_class_logger(Conduit)
 
   def run(self, pipeline):
-    """Runs one query in pipeline and checks for errors. If errors are
-    encounterd the pipeline aborts.
+    """Runs the queries of a pipeline as soon as their dependencies are
+    resolved and checks for errors. If errors are encounterd, no further
+    query is started and the error is raised once running queries finished.
+    Queries depending on a query with an empty response are skipped.
+
+    :param pipeline: Conduit pipeline
+    :type  pipeline: :class:`Conduit.Pipeline`
+    :return: analyzer of the last query in the pipeline or of the empty
+      query it depended on
+    :rtype: :class:`entrezpy.base.analyzer.EutilsAnalyzer`
+    """
+    graph = Conduit.QueryGraph(self.take_queries(pipeline), self.max_queries != 1)
+    if not graph.order:
+      return None
+    completed = queue.SimpleQueue()
+    streams = {}
+    closing = {}
+    running = 0
+    error = None
+    while True:
+      while error is None and graph.hasReady() and \
+            (self.max_queries is None or running < self.max_queries):
+        query = Conduit.queries[graph.next_query()]
+        closing[query.id] = self.open_streams(query, graph.start(query.id))
+        streams.update(closing[query.id])
+        running += 1
+        if self.max_queries == 1:
+          self.run_query(query, completed)
+        else:
+          self.get_worker_pool().submit(self.run_query, query, completed,
+                                        streams.pop(query.id, None))
+      if running == 0:
+        break
+      query_id, err = completed.get()
+      running -= 1
+      for i in closing.pop(query_id).values():
+        i.close()
+        Conduit.queries[query_id].analyzer.remove_uid_listener(i.put)
+      error = self.schedule(graph, query_id, err, error)
+    return self.finish(graph, error)
+
+  async def arun(self, pipeline):
+    """Asyncio variant of :meth:`.run`. Queries are run as tasks using
+    :meth:`entrezpy.base.query.EutilsQuery.ainquire` and share the event loop
+    and rate limit with other coroutines.
+
+    :param pipeline: Conduit pipeline
+    :type  pipeline: :class:`Conduit.Pipeline`
+    :rtype: :class:`entrezpy.base.analyzer.EutilsAnalyzer`
+    """
+    graph = Conduit.QueryGraph(self.take_queries(pipeline))
+    if not graph.order:
+      return None
+    tasks = {}
+    error = None
+    while True:
+      while error is None and graph.hasReady() and \
+            (self.max_queries is None or len(tasks) < self.max_queries):
+        query = Conduit.queries[graph.next_query()]
+        tasks[asyncio.ensure_future(self.arun_query(query))] = query.id
+      if not tasks:
+        break
+      done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+      for i in done:
+        error = self.schedule(graph, tasks.pop(i), i.exception(), error)
+    return self.finish(graph, error)
+
+  def take_queries(self, pipeline):
+    """Takes all query ids from a pipeline
 
     :param pipeline: Conduit pipeline
     :type  pipeline: :class:`Conduit.Pipeline`
+    :return: query ids in pipeline order
+    :rtype: list
     """
+    query_ids = []
     while not pipeline.queries.empty():
-      q = Conduit.queries[pipeline.queries.get()]
-      q.resolve_dependency()
-      self.logger.info(json.dumps({'querying':{'queryid':q.id, 'util':q.function}}))
-      if q.function == 'esearch':
-        Conduit.analyzers[q.id] = self.search(q)
-      if q.function == 'elink':
-        Conduit.analyzers[q.id] = self.link(q)
-      if q.function == 'efetch':
-        Conduit.analyzers[q.id] = self.fetch(q)
-      if q.function == 'epost':
-        Conduit.analyzers[q.id] = self.post(q)
-      if q.function == 'esummary':
-        Conduit.analyzers[q.id] = self.summarize(q)
-      self.check_query(q)
-      if Conduit.analyzers[q.id].isEmpty():
-        self.logger.warning(json.dumps({'empty response':{'queryid':q.id, 'action':'skip'}}))
-        return Conduit.analyzers[q.id]
-    return Conduit.analyzers[q.id]
+      query_ids.append(pipeline.queries.get())
+    return query_ids
+
+  def get_worker_pool(self):
+    """Returns the worker pool of the session or the process-wide pool
+
+    :rtype: :class:`entrezpy.requester.workerpool.WorkerPool`
+    """
+    if self.session is not None:
+      return self.session.worker_pool
+    return entrezpy.requester.workerpool.WorkerPool.get_shared()
+
+  def open_streams(self, query, streaming):
+    """Connects an Esearch query to its streaming dependents before it starts
+
+    :param query: Esearch query
+    :type  query: :class:`Conduit.Query`
+    :param list streaming: query ids of streaming dependents
+    :return: streams by streaming query id
+    :rtype: dict
+    """
+    streams = {}
+    if streaming and query.analyzer is None:
+      query.analyzer = Conduit.queriers[query.function][1]()
+    for i in streaming:
+      streams[i] = Conduit.UidStream()
+      query.analyzer.add_uid_listener(streams[i].put)
+    return streams
+
+  def run_query(self, query, completed, stream=None):
+    """Runs one query and reports it as completed with its error, if any.
+
+    :param query: Conduit Query
+    :type  query: :class:`Conduit.Query`
+    :param completed: completed query ids and errors
+    :type  completed: :class:`queue.SimpleQueue`
+    :param stream: UIDs of the running Esearch dependency of a streaming
+      query
+    :type  stream: :class:`Conduit.UidStream`
+    """
+    try:
+      if stream is not None:
+        self.stream_query(query, stream)
+      elif not self.resume_stage(query):
+        query.resolve_dependency()
+        self.logger.info({'querying':{'queryid':query.id, 'util':query.function}})
+        Conduit.analyzers[query.id] = getattr(self, Conduit.runners[query.function])(query)
+        self.check_query(query)
+    except BaseException as err:
+      completed.put((query.id, err))
+    else:
+      completed.put((query.id, None))
+
+  def stream_query(self, query, stream):
+    """Runs a streaming query for each UID batch of its Esearch dependency
+    using the same query and analyzer. Runs the query as usual if no UIDs
+    were streamed, and stores no analyzer if the Esearch query was empty.
+
+    :param query: Conduit Query
+    :type  query: :class:`Conduit.Query`
+    :param stream: UIDs of the running Esearch dependency
+    :type  stream: :class:`Conduit.UidStream`
+    """
+    if self.resume_stage(query):
+      return
+    query.analyzer = query.analyzer if query.analyzer else Conduit.queriers[query.function][1]()
+    eutils_query = self.new_querier(query)
+    db = Conduit.queries[query.dependency].parameter.get('db')
+    for uids in stream:
+      self.logger.info({'streaming':{'queryid':query.id, 'util':query.function,
+                                     'uids':len(uids)}})
+      parameter = {'db':db, 'id':uids}
+      parameter.update(query.parameter)
+      Conduit.analyzers[query.id] = eutils_query.inquire(parameter, query.analyzer)
+      self.check_query(query)
+    if query.id in Conduit.analyzers:
+      return
+    dependency = Conduit.analyzers.get(query.dependency)
+    if dependency is None or not dependency.isSuccess() or dependency.isEmpty():
+      return
+    query.resolve_dependency()
+    self.logger.info({'querying':{'queryid':query.id, 'util':query.function}})
+    Conduit.analyzers[query.id] = eutils_query.inquire(query.parameter, query.analyzer)
+    self.check_query(query)
+
+  async def arun_query(self, query):
+    """Asyncio variant of :meth:`.run_query` raising errors"""
+    if self.resume_stage(query):
+      return
+    query.resolve_dependency()
+    self.logger.info({'querying':{'queryid':query.id, 'util':query.function}})
+    Conduit.analyzers[query.id] = await self.ainquire(query)
+    self.check_query(query)
+
+  def schedule(self, graph, query_id, err, error):
+    """Updates the query graph after a query completed
+
+    :param graph: query graph of the running pipeline
+    :type  graph: :class:`Conduit.QueryGraph`
+    :param str query_id: completed query id
+    :param BaseException err: error of the completed query or None
+    :param BaseException error: first error of the pipeline or None
+    :return: first error of the pipeline or None
+    """
+    query = Conduit.queries[query_id]
+    self.release_dependency(query)
+    query.analyzer = None
+    if err is not None:
+      return error if error is not None else err
+    if query_id not in Conduit.analyzers:
+      graph.skip_streaming(query_id)
+      return error
+    self.record_stage(query)
+    if Conduit.analyzers[query_id].isEmpty():
+      self.logger.warning({'empty response':{'queryid':query_id, 'action':'skip'}})
+      graph.skip(query_id)
+    else:
+      graph.resolve(query_id)
+    Conduit.analyzers.complete(query_id)
+    return error
+
+  def finish(self, graph, error):
+    """Raises the first error of a pipeline or returns its last analyzer
+
+    :param graph: query graph of the finished pipeline
+    :type  graph: :class:`Conduit.QueryGraph`
+    :param BaseException error: first error of the pipeline or None
+    :rtype: :class:`entrezpy.base.analyzer.EutilsAnalyzer`
+    :raises RuntimeError: if dependencies could not be resolved
+    """
+    for i in graph.order:
+      self.release_dependency(Conduit.queries[i])
+    if error is not None:
+      raise error
+    if graph.waiting:
+      self.logger.error({'unresolved dependencies':sorted(graph.waiting), 'action':'abort'})
+      raise RuntimeError('Unresolved query dependency')
+    return Conduit.analyzers[graph.get_last()]
+
+  async def ainquire(self, query):
+    """Configures and runs a query on the event loop. Analyzer are class
+    references in :attr:`Conduit.queriers` and instantiated here if the query
+    has none.
+
+    :param query: Conduit Query
+    :type  query: :class:`Conduit.Query`
+    :return: analyzer
+    :rtype: :class:`entrezpy.base.analyzer.EutilsAnalyzer`
+    """
+    analyzer = query.analyzer if query.analyzer else Conduit.queriers[query.function][1]()
+    return await self.new_querier(query).ainquire(query.parameter, analyzer)
+
+  def new_querier(self, query):
+    """Creates the entrezpy query running a Conduit query. Its requests are
+    journaled in the scope of the query stage.
+
+    :param query: Conduit Query
+    :type  query: :class:`Conduit.Query`
+    :rtype: :class:`entrezpy.base.query.EutilsQuery`
+    """
+    eutils_query = Conduit.queriers[query.function][0](self.tool, self.email, self.apikey,
+                                                      threads=self.threads, qid=query.id,
+                                                      session=self.session)
+    eutils_query.journal_scope = query.key
+    return eutils_query
+
+  def get_journal(self):
+    """Returns the journal of the session or of all queries
+
+    :rtype: :class:`entrezpy.requester.journal.Journal` or None
+    """
+    if self.session is not None:
+      return self.session.journal
+    return entrezpy.base.query.EutilsQuery.journal
+
+  def resume_stage(self, query):
+    """Restores a query completed in an earlier run of the pipeline from the
+    journal.
+
+    :param query: Conduit Query
+    :type  query: :class:`Conduit.Query`
+    :return: True if the query was restored
+    :rtype: bool
+    """
+    journal = self.get_journal()
+    record = journal.take_stage(query.key) if journal is not None else None
+    if record is None:
+      return False
+    self.logger.info({'resuming':{'queryid':query.id, 'util':query.function,
+                                  'stage':query.key}})
+    Conduit.analyzers[query.id] = Conduit.JournaledAnalyzer(query, record)
+    return True
+
+  def record_stage(self, query):
+    """Records a completed query as pipeline stage in the journal
+
+    :param query: Conduit Query
+    :type  query: :class:`Conduit.Query`
+    """
+    journal = self.get_journal()
+    analyzer = Conduit.analyzers[query.id]
+    if journal is None or isinstance(analyzer, Conduit.JournaledAnalyzer):
+      return
+    isEmpty = bool(analyzer.isEmpty())
+    link = None
+    size = None
+    if not isEmpty and isinstance(analyzer.result, entrezpy.base.result.EutilsResult):
+      link = analyzer.result.get_link_parameter()
+      size = analyzer.result.size()
+    journal.record_stage(query.key, query.function, link, size, isEmpty)
+
+  def release_dependency(self, query):
+    """Ends the retention of the analyzer of the dependency of a query
+
+    :param query: Conduit Query
+    :type  query: :class:`Conduit.Query`
+    """
+    if query.isRetaining:
+      query.isRetaining = False
+      Conduit.analyzers.unretain(query.dependency)
+
+  def release(self, query_id):
+    """Releases a query and its analyzer. Analyzers retained by pending
+    queries are removed once these completed.
+
+    :param str query_id: query id
+    """
+    query = Conduit.queries.pop(query_id, None)
+    if query is not None:
+      self.release_dependency(query)
+    Conduit.analyzers.release(query_id)
+
+  def release_pipeline(self, pipeline):
+    """Releases all queries of a pipeline and their analyzers, e.g. once its
+    results have been processed
+
+    :param pipeline: Conduit pipeline
+    :type  pipeline: :class:`Conduit.Pipeline`
+    """
+    for i in pipeline.query_ids:
+      self.release(i)
 
   def check_query(self, query):
     """Check for successful query.
@@ -206,12 +814,12 @@ class Conduit:
     :type  query: :class:`Conduit.Query`
     """
     if not Conduit.analyzers[query.id]:
-      self.logger.error(json.dumps({'request error':{'queryid':query.id,
-                                                              'action':'abort'}}))
+      self.logger.error({'request error':{'queryid':query.id,
+                                                   'action':'abort'}})
       raise RuntimeError('Unsuccessful query')
     if not Conduit.analyzers[query.id].isSuccess():
-      self.logger.error(json.dumps({'response error':{'queryid':query.id,
-                                                               'action':'abort'}}))
+      self.logger.error({'response error':{'queryid':query.id,
+                                                    'action':'abort'}})
       raise RuntimeError('Unsuccessful query')
 
   def get_result(self, query_id):
@@ -232,7 +840,8 @@ class Conduit:
     :return: Conduit pipeline
     :rtype: :class:`Conduit.Pipeline`
     """
-    return Conduit.Pipeline()
+    self.pipelines += 1
+    return Conduit.Pipeline(self.pipelines)
 
   def search(self, query, analyzer=entrezpy.esearch.esearch_analyzer.EsearchAnalyzer):
     """Configures and runs an Esearch query. Analyzer are class references and
@@ -245,11 +854,7 @@ class Conduit:
     :rtype: :class:`entrezpy.esearch.esearch_analyzer.EsearchAnalyzer`
     """
     analyzer = query.analyzer if query.analyzer else analyzer()
-    return entrezpy.esearch.esearcher.Esearcher(self.tool,
-                                                self.email,
-                                                self.apikey,
-                                                threads=self.threads,
-                                                qid=query.id).inquire(query.parameter, analyzer)
+    return self.new_querier(query).inquire(query.parameter, analyzer)
 
   def summarize(self, query, analyzer=entrezpy.esummary.esummary_analyzer.EsummaryAnalyzer):
     """Configures and runs an Esummary query. Analyzer are class references and
@@ -262,11 +867,7 @@ class Conduit:
     :rtype: :class:`entrezpy.esummary.esummary_analyzer.EsummaryAnalyzer`
     """
     analyzer = query.analyzer if query.analyzer else analyzer()
-    return entrezpy.esummary.esummarizer.Esummarizer(self.tool,
-                                                     self.email,
-                                                     self.apikey,
-                                                     threads=self.threads,
-                                                     qid=query.id).inquire(query.parameter, analyzer)
+    return self.new_querier(query).inquire(query.parameter, analyzer)
 
   def link(self, query, analyzer=entrezpy.elink.elink_analyzer.ElinkAnalyzer):
     """Configures and runs an Elink query. Analyzer are class references and
@@ -279,11 +880,7 @@ class Conduit:
     :rtype: :class:`entrezpy.elink.elink_analyzer.ElinkAnalyzer`
     """
     analyzer = query.analyzer if query.analyzer else analyzer()
-    return entrezpy.elink.elinker.Elinker(self.tool,
-                                          self.email,
-                                          self.apikey,
-                                          threads=self.threads,
-                                          qid=query.id).inquire(query.parameter, analyzer)
+    return self.new_querier(query).inquire(query.parameter, analyzer)
 
   def post(self, query, analyzer=entrezpy.epost.epost_analyzer.EpostAnalyzer):
     """Configures and runs an Epost query. Analyzer are class references and
@@ -296,11 +893,7 @@ class Conduit:
     :rtype: :class:`entrezpy.epost.epost_analyzer.EpostAnalyzer`
     """
     analyzer = query.analyzer if query.analyzer else analyzer()
-    return entrezpy.epost.eposter.Eposter(self.tool,
-                                          self.email,
-                                          self.apikey,
-                                          threads=self.threads,
-                                          qid=query.id).inquire(query.parameter, analyzer)
+    return self.new_querier(query).inquire(query.parameter, analyzer)
 
   def fetch(self, query, analyzer=entrezpy.efetch.efetch_analyzer.EfetchAnalyzer):
     """uns an Efetch query. The Analyzer needs to be added to the quuery
@@ -313,8 +906,4 @@ class Conduit:
     :rtype: :class:`entrezpy.efetch.efetch_analyzer.EfetchAnalyzer`
     """
     analyzer = query.analyzer if query.analyzer else analyzer()
-    return entrezpy.efetch.efetcher.Efetcher(self.tool,
-                                             self.email,
-                                             self.apikey,
-                                             threads=self.threads,
-                                             qid=query.id).inquire(query.parameter, analyzer)
+    return self.new_querier(query).inquire(query.parameter, analyzer)
@@ -23,10 +23,11 @@
 """
 
 
-import json
-
+import sys
+import shutil
 
 import entrezpy.base.analyzer
+import entrezpy.requester.responsestream
 import entrezpy.log.logger
 
 
@@ -43,6 +44,13 @@ class EfetchAnalyzer(entrezpy.base.analyzer.EutilsAnalyzer):
     :meth:`entrezpy.base.analyzer.EutilsAnalzyer.analyze_error`.
   """
 
+  resumable = True
+  """Responses are printed once parsed and not needed when resuming"""
+
+  stream_response = True
+  """Responses are copied to stdout in chunks while downloading, see
+  :attr:`entrezpy.base.analyzer.EutilsAnalyzer.stream_response`"""
+
   def __init__(self):
     """:ivar result: :class:`entrezpy.efetch.efetch_result.EfetchResult`"""
     super().__init__()
@@ -53,30 +61,51 @@ class EfetchAnalyzer(entrezpy.base.analyzer.EutilsAnalyzer):
     """Should be implemented if used properly"""
     if not self.result:
       self.result = True
-      print(self.norm_response(response, request.rettype))
+      self.print_response(response, request.rettype)
       return True
     return False
 
+  def resume(self, state):
+    """Responses printed in an earlier run are part of the result"""
+    self.result = True
+
   def analyze_result(self, response, request):
     if not self.init_result(response, request):
-      print(self.norm_response(response, request.rettype))
+      self.print_response(response, request.rettype)
 
   def analyze_error(self, response, request):
-    self.logger.error(json.dumps({'response':self.norm_response(response, request.rettype)}))
+    self.logger.error({'response':self.norm_response(response, request.rettype)})
 
-    self.logger.debug(json.dumps({'response':{'dump':request.dump_internals(),
-                                              'error':self.norm_response(response, request.rettype)}}))
+    self.logger.debug(lambda: {'response':{'dump':request.dump_internals(),
+                                           'error':self.norm_response(response, request.rettype)}})
 
   def norm_response(self, response, rettype=None):
     """Normalizes response for printing
 
     :param response: efetch response
-    :type  response: dict or `io.StringIO`
+    :type  response: dict, `io.StringIO` or text stream
     :return: str or dict
     """
     if rettype == 'json':
       return response
-    return response.getvalue()
+    if hasattr(response, 'getvalue'):
+      return response.getvalue()
+    return response.read()
+
+  def print_response(self, response, rettype=None):
+    """Prints a response. Text responses are copied to stdout in chunks
+    instead of being read as a whole, i.e. streamed responses are printed
+    while downloading.
+
+    :param response: efetch response
+    :type  response: dict, `io.StringIO` or text stream
+    """
+    if rettype == 'json' or isinstance(response, dict):
+      print(response)
+      return
+    shutil.copyfileobj(response, sys.stdout,
+                       entrezpy.requester.responsestream.ResponseStream.chunk_size)
+    print()
 
   def isEmpty(self):
     if not self.result:
@@ -24,7 +24,6 @@
 
 import sys
 import math
-import json
 
 
 import entrezpy.base.parameter
@@ -70,7 +69,7 @@ class EfetchParameter(entrezpy.base.parameter.EutilsParameter):
     self.complexity = param.get('complexity')
     self.calculate_expected_requests(reqsize=self.reqsize)
     self.logger = entrezpy.log.logger.get_class_logger(EfetchParameter)
-    self.logger.debug(json.dumps({'init':self.dump()}))
+    self.logger.debug(lambda: {'init':self.dump()})
 
   def adjust_retmax(self, retmax):
     """Adjusts retmax parameter. Order of check is crucial.
@@ -82,7 +81,7 @@ class EfetchParameter(entrezpy.base.parameter.EutilsParameter):
     if self.uids:           # we got UIDs to fetch
       return len(self.uids)
     if retmax is None:      # we have no clue what to expect, e.g. WebEnv
-      self.logger.debug(json.dumps({'No retmax': 'fetching 1 request using retmode/retmax'}))
+      self.logger.debug({'No retmax': 'fetching 1 request using retmode/retmax'})
       return EfetchParameter.req_limits(self.retmode)
     return int(retmax)      # we set a limitation
 
@@ -94,14 +93,13 @@ class EfetchParameter(entrezpy.base.parameter.EutilsParameter):
     :rtype: str
     """
     if retmode not in EfetchParameter.req_limits:
-      sys.exit(self.logger.error(json.dumps(
-        {'Unknown retmode':retmode, 'action':'abort'})))
+      sys.exit(self.logger.error(
+        {'Unknown retmode':retmode, 'action':'abort'}))
 
     if self.db in EfetchParameter.valid_retmodes and \
        retmode not in EfetchParameter.valid_retmodes[self.db]:
-      sys.exit(self.logger.error(
-        json.dumps({'Bad database retmode':{'db':self.db, 'retmode':retmode},
-                    'action':'abort'})))
+      sys.exit(self.logger.error({'Bad database retmode':{'db':self.db, 'retmode':retmode},
+                                  'action':'abort'}))
     return retmode
 
   def adjust_reqsize(self, reqsize):
@@ -140,18 +138,18 @@ class EfetchParameter(entrezpy.base.parameter.EutilsParameter):
     check for the minumum required parameters. Aborts if any check fails.
     """
     if not self.haveDb():
-      sys.exit(self.logger.error(json.dumps(
-        {'Missing parameter':{'db':self.db}, 'action':'abort'})))
+      sys.exit(self.logger.error(
+        {'Missing parameter':{'db':self.db}, 'action':'abort'}))
 
     if not self.haveExpectedRequets():
-      sys.exit(self.logger.error(json.dumps(
-        {'Bad expected requests':self.expected_requests, 'action':'abort'})))
+      sys.exit(self.logger.error(
+        {'Bad expected requests':self.expected_requests, 'action':'abort'}))
 
     if not self.uids and not self.haveQuerykey() and not self.haveWebenv():
-      sys.exit(self.logger.error(json.dumps(
+      sys.exit(self.logger.error(
         {'Missing parameters':{'id': self.uids, 'QueryKey':self.querykey,
                                'WebEnv':self.webenv},
-         'action':'abort'})))
+         'action':'abort'}))
 
   def dump(self):
     return {'db' : self.db,
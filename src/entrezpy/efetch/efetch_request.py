@@ -23,9 +23,6 @@
 """
 
 
-import json
-
-
 import entrezpy.base.request
 import entrezpy.log.logger
 
@@ -56,7 +53,7 @@ class EfetchRequest(entrezpy.base.request.EutilsRequest):
     self.seqstop = parameter.seqstop
     self.complexity = parameter.complexity
     self.logger = entrezpy.log.logger.get_class_logger(EfetchRequest)
-    self.logger.debug(json.dumps({'init': self.dump()}))
+    self.logger.debug(lambda: {'init': self.dump()})
 
   def get_post_parameter(self):
     qry = self.prepare_base_qry()
@@ -77,7 +74,7 @@ class EfetchRequest(entrezpy.base.request.EutilsRequest):
                   'retstart' : self.start, 'retmax' : self.retmax})
     else:
       qry.update({'id' : ','.join(str(x) for x in self.uids)})
-    self.logger.debug(json.dumps({'POST':self.dump()}))
+    self.logger.debug(lambda: {'POST':self.dump()})
     return qry
 
   def dump(self):
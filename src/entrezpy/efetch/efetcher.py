@@ -23,8 +23,6 @@
 """
 
 
-import json
-
 import entrezpy.base.query
 import entrezpy.efetch.efetch_parameter
 import entrezpy.efetch.efetch_request
@@ -41,11 +39,13 @@ class Efetcher(entrezpy.base.query.EutilsQuery):
   chapter2.T._entrez_unique_identifiers_ui/?report=objectonly
   """
 
-  def __init__(self, tool, email, apikey=None, apikey_var=None, threads=None, qid=None):
+  def __init__(self, tool, email, apikey=None, apikey_var=None, threads=None, qid=None,
+               session=None):
     """:ivar result: :class:`entrezpy.base.result.EutilsResult`"""
-    super().__init__('efetch.fcgi', tool, email, apikey=apikey, threads=threads, qid=qid)
+    super().__init__('efetch.fcgi', tool, email, apikey=apikey, threads=threads, qid=qid,
+                     session=session)
     self.logger = entrezpy.log.logger.get_class_logger(Efetcher)
-    self.logger.debug(json.dumps({'init':self.dump()}))
+    self.logger.debug(lambda: {'init':self.dump()})
 
   def inquire(self, parameter, analyzer=entrezpy.efetch.efetch_analyzer.EfetchAnalyzer()):
     """
@@ -63,16 +63,49 @@ class Efetcher(entrezpy.base.query.EutilsQuery):
     :rtype: :class:`entrezpy.base.analyzer.EutilsAnalyzer` or None
     """
     param = entrezpy.efetch.efetch_parameter.EfetchParameter(parameter)
-    self.logger.debug(json.dumps({'parameter':param.dump()}))
+    self.logger.debug(lambda: {'parameter':param.dump()})
     self.monitor_start(param)
-    req_size = param.reqsize
-    for i in range(param.expected_requests):
-      if i * req_size + req_size > param.retmax:
-        req_size = param.retmax % param.reqsize
-      self.add_request(entrezpy.efetch.efetch_request.EfetchRequest(
-        self.eutil, param, (i*param.reqsize), req_size), analyzer)
+    self.add_requests(param, analyzer, self.add_request)
     self.request_pool.drain()
     self.monitor_stop()
     if self.isGoodQuery():
       return analyzer
     return None
+
+  async def ainquire(self, parameter, analyzer=None):
+    """Implements :meth:`entrezpy.base.query.EutilsQuery.ainquire`. Asyncio
+    variant of :meth:`.inquire`.
+
+    :param dict parameter: EFetch parameter
+    :param analyzer: analyzer for Efetch results, default is a new
+      :class:`entrezpy.efetch.efetch_analyzer.EfetchAnalyzer`
+    :type analyzer: :class:`entrezpy.base.analyzer.EutilsAnalyzer`
+    :return: analyzer instance or None if request errors have been encountered
+    :rtype: :class:`entrezpy.base.analyzer.EutilsAnalyzer` or None
+    """
+    if analyzer is None:
+      analyzer = entrezpy.efetch.efetch_analyzer.EfetchAnalyzer()
+    param = entrezpy.efetch.efetch_parameter.EfetchParameter(parameter)
+    self.logger.debug(lambda: {'parameter':param.dump()})
+    self.monitor_start(param)
+    self.add_requests(param, analyzer, self.add_async_request)
+    await self.get_async_request_pool().drain()
+    self.monitor_stop()
+    if self.isGoodQuery():
+      return analyzer
+    return None
+
+  def add_requests(self, param, analyzer, add_request):
+    """Splits the query into requests of the request size.
+
+    :param param: Efetch parameter
+    :type  param: :class:`entrezpy.efetch.efetch_parameter.EfetchParameter`
+    :param analyzer: analyzer for Efetch results
+    :param add_request: :meth:`.add_request` or :meth:`.add_async_request`
+    """
+    req_size = param.reqsize
+    for i in range(param.expected_requests):
+      if i * req_size + req_size > param.retmax:
+        req_size = param.retmax % param.reqsize
+      add_request(entrezpy.efetch.efetch_request.EfetchRequest(
+        self.eutil, param, (i*param.reqsize), req_size), analyzer)
@@ -23,8 +23,6 @@
 
 
 import sys
-import json
-import xml.etree.ElementTree
 
 
 import entrezpy.base.analyzer
@@ -62,6 +60,18 @@ class ElinkAnalyzer(entrezpy.base.analyzer.EutilsAnalyzer):
                  not in JSON.
   """
 
+  stream_response = True
+  """Responses are parsed while downloaded, see
+  :attr:`entrezpy.base.analyzer.EutilsAnalyzer.stream_response`"""
+
+  inline_error_check = True
+  """Errors in 'llinkslib' XML responses are detected while parsing, see
+  :attr:`entrezpy.base.analyzer.EutilsAnalyzer.inline_error_check`"""
+
+  process_parse = True
+  """Responses can be parsed in worker processes, see
+  :attr:`entrezpy.base.analyzer.EutilsAnalyzer.process_parse`"""
+
   def __init__(self):
     """:ivar result: :class:`entrezpy.elink.elink_result.ElinkResult`"""
     super().__init__()
@@ -75,7 +85,16 @@ class ElinkAnalyzer(entrezpy.base.analyzer.EutilsAnalyzer):
 
   def analyze_error(self, response, request):
     """Implements virtual function :func:`entrezpy.base.analyzer.analyze_error`."""
-    self.logger.debug(json.dumps({'response':response, 'request-dump':request.dump_internals()}))
+    if request.retmode != 'json':
+      response = response.getvalue()
+    self.logger.debug(lambda: {'response':response, 'request-dump':request.dump_internals()})
+
+  def merge_result(self, result, request):
+    """Implements :meth:`entrezpy.base.analyzer.EutilsAnalyzer.merge_result`
+    by adding the linksets parsed in a worker process."""
+    self.init_result(None, request)
+    for i in result.linksets:
+      self.result.add_linkset(i)
 
   def get_linkset_unit(self, elink_cmd):
     if elink_cmd == 'neighbor':
@@ -106,13 +125,14 @@ class ElinkAnalyzer(entrezpy.base.analyzer.EutilsAnalyzer):
     """
     self.init_result(response, request)
     if request.cmd != 'llinkslib' and request.retmode != 'json':
-      sys.exit(self.logger.error(json.dumps({'unknown cmd':request.cmd,
-                                             'format':request.retmode,
-                                             'action':abort})))
+      sys.exit(self.logger.error({'unknown cmd':request.cmd,
+                                  'format':request.retmode,
+                                  'action':'abort'}))
     if request.retmode == 'json':
-      self.logger.debug(json.dumps({'response':response}))
+      self.logger.debug({'response':response})
     else:
-      self.logger.debug(json.dumps({'response':response.getvalue()}))
+      self.logger.debug({'response':{'retmode':request.retmode,
+                                     'cmd':request.cmd}})
 
     lset_unit = self.get_linkset_unit(request.cmd)
     if request.cmd == 'llinkslib':  # only available as XML, groan
@@ -122,8 +142,8 @@ class ElinkAnalyzer(entrezpy.base.analyzer.EutilsAnalyzer):
     elif self.isLinkList:
       self.analyze_linklist(response['linksets'], lset_unit)
     else:
-      sys.exit(self.logger.error(json.dumps({'unknown elink cmd':request.cmd,
-                                             'action':'abort'})))
+      sys.exit(self.logger.error({'unknown elink cmd':request.cmd,
+                                  'action':'abort'}))
 
   def analyze_linklist(self, linksets, lset_unit):
     """
@@ -136,30 +156,30 @@ class ElinkAnalyzer(entrezpy.base.analyzer.EutilsAnalyzer):
       if 'idurllist' in i:
         for j in i.get('idurllist'):
           lset = entrezpy.elink.linkset.linked.LinkedLinkset(j['id'], i['dbfrom'], canLink=False)
-          self.logger.debug(json.dumps({'created':lset.dump()}))
+          self.logger.debug(lambda: {'created':lset.dump()})
           for k in j['objurls']:
             lset.add_linkunit(lset_unit.new(k))
-            self.logger.debug(json.dumps({'added':lset.linkunits[-1].dump()}))
+            self.logger.debug(lambda: {'added':lset.linkunits[-1].dump()})
           self.result.add_linkset(lset)
       elif 'idlinksets' in i['idchecklist']:
         for j in i['idchecklist'].get('idlinksets'):
           lset = entrezpy.elink.linkset.linked.LinkedLinkset(j['id'], i['dbfrom'], canLink=False)
-          self.logger.debug(json.dumps({'created':lset.dump()}))
+          self.logger.debug(lambda: {'created':lset.dump()})
           for k in j['linkinfos']:
             lset.add_linkunit(lset_unit.new(k['dbto'], k['linkname'], k.get('menutag'),
                                             k.get('htmltag'), k.get('priority')))
-            self.logger.debug(json.dumps({'added':lset.linkunits[-1].dump()}))
+            self.logger.debug(lambda: {'added':lset.linkunits[-1].dump()})
           self.result.add_linkset(lset)
       elif 'ids' in i['idchecklist']:
         for j in i['idchecklist'].get('ids'):
           lset = entrezpy.elink.linkset.linked.LinkedLinkset(j['value'], i['dbfrom'], canLink=False)
-          self.logger.debug(json.dumps({'created':lset.dump()}))
+          self.logger.debug(lambda: {'created':lset.dump()})
           if 'hasneighbor' in j:
             lset.add_linkunit(lset_unit.new(i['dbfrom'], j['hasneighbor']))
-            self.logger.debug(json.dumps({'added':lset.linkunits[-1].dump()}))
+            self.logger.debug(lambda: {'added':lset.linkunits[-1].dump()})
           if 'haslinkout' in j:
             lset.add_linkunit(lset_unit.new(i['dbfrom'], j['haslinkout']))
-            self.logger.debug(json.dumps({'added':lset.linkunits[-1].dump()}))
+            self.logger.debug(lambda: {'added':lset.linkunits[-1].dump()})
           self.result.add_linkset(lset)
 
   def analyze_links(self, linksets, lset_unit):
@@ -174,20 +194,20 @@ class ElinkAnalyzer(entrezpy.base.analyzer.EutilsAnalyzer):
       lset = entrezpy.elink.linkset.linked.LinkedLinkset(i['ids'][0], i['dbfrom'])
       if len(i['ids']) > 1: # OK, it's many-to-many
         lset = entrezpy.elink.linkset.relaxed.RelaxedLinkset(i['ids'], i['dbfrom'])
-      self.logger.debug(json.dumps({'created':lset.dump()}))
+      self.logger.debug(lambda: {'created':lset.dump()})
       if 'linksetdbs' in i:
         for j in i['linksetdbs']:
           if 'ERROR' in j:
-            self.logger.error(json.dumps({'response':j['ERROR']}))
+            self.logger.error({'response':j['ERROR']})
             self.hasErrorResponse = True
           if 'links' in j:
             for k in j['links']:
               lset.add_linkunit(lset_unit.new(k, j['dbto'], j['linkname']))
-              self.logger.debug(json.dumps({'added':lset.linkunits[-1].dump()}))
+              self.logger.debug(lambda: {'added':lset.linkunits[-1].dump()})
       elif 'linksetdbhistories' in i:
         for j in i['linksetdbhistories']:
           lset.add_linkunit(lset_unit.new(j['dbto'], j['linkname'], i['webenv'], j['querykey']))
-          self.logger.debug(json.dumps({'added':lset.linkunits[-1].dump()}))
+          self.logger.debug(lambda: {'added':lset.linkunits[-1].dump()})
       else:
         self.logger.warning("Empty linkset")
         continue
@@ -210,7 +230,7 @@ class ElinkAnalyzer(entrezpy.base.analyzer.EutilsAnalyzer):
     isLinkset = False
     isObjurl = False
     isProvider = False
-    for event, elem in xml.etree.ElementTree.iterparse(response, events=['start','end']):
+    for event, elem in self.iterparse(response, events=('start', 'end')):
       if event == 'start':
         if elem.tag == 'LinkSet':
           isLinkset = True
@@ -224,7 +244,7 @@ class ElinkAnalyzer(entrezpy.base.analyzer.EutilsAnalyzer):
         if elem.tag == 'ObjUrl':
           isObjurl = False
           lset.add_linkunit(lset_unit.new(unit))
-          self.logger.debug(json.dumps({'added':lset.linkunits[-1].dump()}))
+          self.logger.debug(lambda: {'added':lset.linkunits[-1].dump()})
         if elem.tag == 'IdUrlSet':
           self.result.add_linkset(lset)
 
@@ -233,7 +253,7 @@ class ElinkAnalyzer(entrezpy.base.analyzer.EutilsAnalyzer):
           dbfrom = elem.text
         if elem.tag == 'Id' and not isObjurl:
           lset = entrezpy.elink.linkset.linked.LinkedLinkset(int(elem.text), dbfrom, canLink=False)
-          self.logger.debug(json.dumps({'created':lset.dump()}))
+          self.logger.debug(lambda: {'created':lset.dump()})
 
       if isLinkset and isObjurl:
         if elem.tag == 'Provider':
@@ -24,7 +24,6 @@
 
 
 import sys
-import json
 
 
 import entrezpy.base.parameter
@@ -75,7 +74,7 @@ class ElinkParameter(entrezpy.base.parameter.EutilsParameter):
     self.expected_requests = 1
     self.check()
     self.logger = entrezpy.log.logger.get_class_logger(ElinkParameter)
-    self.logger.debug(json.dumps({'init':self.dump()}))
+    self.logger.debug(lambda: {'init':self.dump()})
 
   def check(self):
     """
@@ -83,17 +82,17 @@ class ElinkParameter(entrezpy.base.parameter.EutilsParameter):
     parameters  are missing.
     """
     if self.cmd not in ElinkParameter.nodb_cmds and not self.haveDb():
-      sys.exit(self.logger.error(json.dumps({'Missing required parameters':'db/cmd',
-                                             'action':'abort'})))
+      sys.exit(self.logger.error({'Missing required parameters':'db/cmd',
+                                  'action':'abort'}))
     if not self.dbfrom:
-      sys.exit(self.logger.error(json.dumps({'Missing required parameter':'dbfrom',
-                                             'action':'abort'})))
+      sys.exit(self.logger.error({'Missing required parameter':'dbfrom',
+                                  'action':'abort'}))
 
     if not self.uids and not self.haveWebenv and not self.haveQuerykey:
-      sys.exit(self.logger.error(json.dumps({'Missing required parameters': {'ids':self.uids,
-                                                                             'QueryKey':self.querykey,
-                                                                             'WebEnv':self.webenv},
-                                             'action':'abort'})))
+      sys.exit(self.logger.error({'Missing required parameters': {'ids':self.uids,
+                                                                  'QueryKey':self.querykey,
+                                                                  'WebEnv':self.webenv},
+                                  'action':'abort'}))
 
   def set_retmode(self, retmode):
     """Checks for valid and supported Elink retmodes
@@ -103,8 +102,8 @@ class ElinkParameter(entrezpy.base.parameter.EutilsParameter):
     :rtype: str
     """
     if retmode == 'ref':
-      self.logger.warning(json.dumps({'retmode ref':'not supported',
-                                        'using':ElinkParameter.def_retmode}))
+      self.logger.warning({'retmode ref':'not supported',
+                             'using':ElinkParameter.def_retmode})
       return ElinkParameter.def_retmode
     return ElinkParameter.retmodes.get(self.cmd, ElinkParameter.def_retmode)
 
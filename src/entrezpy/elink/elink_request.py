@@ -24,9 +24,6 @@
 """
 
 
-import json
-
-
 import entrezpy.base.request
 import entrezpy.log.logger
 
@@ -100,7 +97,7 @@ class ElinkRequest(entrezpy.base.request.EutilsRequest):
       qry.update({'maxdate':self.maxdate})
     if  not self.db:
       qry.pop('db')
-    self.logger.debug(json.dumps({'POST':self.dump()}))
+    self.logger.debug(lambda: {'POST':self.dump()})
     return qry
 
   def set_linkname(self, qry):
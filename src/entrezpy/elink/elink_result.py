@@ -23,7 +23,6 @@
 
 
 import sys
-import json
 
 
 import entrezpy.base.result
@@ -50,7 +49,7 @@ class ElinkResult(entrezpy.base.result.EutilsResult):
     self.linksets = []
     self.cmd = cmd
     self.logger = entrezpy.log.logger.get_class_logger(ElinkResult)
-    self.logger.debug(json.dumps({'init':self.dump()}))
+    self.logger.debug(lambda: {'init':self.dump()})
 
   def size(self):
     """Implements :meth:`entrezpy.base.result.EutilsResult.size`.
@@ -115,11 +114,11 @@ class ElinkResult(entrezpy.base.result.EutilsResult):
     self.check_unexpected_dbnum(dbs)
     if len(query_keys) > 1:
       term = ' OR '.join(str("#{0}".format(x)) for x in query_keys)
-      self.logger.debug(json.dumps({'history':{'follow-up term':term}}))
+      self.logger.debug({'history':{'follow-up term':term}})
       return {'WebEnv' : self.linksets[0].linkunits[0].webenv,
               'db' : self.linksets[0].linkunits[0].db,
               'term' : term}
-    self.logger.debug(json.dumps({'history':{'follow-up querykey':query_keys[0]}}))
+    self.logger.debug({'history':{'follow-up querykey':query_keys[0]}})
     return {'WebEnv' : self.linksets[0].linkunits[0].webenv,
             'db' : self.linksets[0].linkunits[0].db,
             'query_key' : query_keys[0]}
@@ -154,9 +153,9 @@ class ElinkResult(entrezpy.base.result.EutilsResult):
     :param dbs dbs: unique database names encountered in all LinkSets
     """
     if len(dbs) > 1:
-      sys.exit(self.logger.error(json.dumps(
+      sys.exit(self.logger.error(
        {'Unexpected':'more than 1 dbto in history linking parameter',
-        'dbs':[x for x in dbs], 'cmd':self.cmd, 'action':'abort'})))
+        'dbs':[x for x in dbs], 'cmd':self.cmd, 'action':'abort'}))
 
   def canLink(self, lset):
     """
@@ -169,5 +168,5 @@ class ElinkResult(entrezpy.base.result.EutilsResult):
     """
     if lset.canLink:
       return True
-    self.logger.warning(json.dumps({f'linkset {lset.category}':'no direct follow-up parameters'}))
+    self.logger.warning({f'linkset {lset.category}':'no direct follow-up parameters'})
     return False
@@ -22,9 +22,6 @@
 """
 
 
-import json
-
-
 import entrezpy.base.query
 import entrezpy.elink.elink_parameter
 import entrezpy.elink.elink_request
@@ -46,12 +43,16 @@ class Elinker(entrezpy.base.query.EutilsQuery):
   :param str apikey_var: enviroment variable storing NCBI apikey
   :param int threads: set threads for multithreading
   :param str qid: unique query id
+  :param session: session providing shared query setup
+  :type  session: :class:`entrezpy.session.Session`
   """
 
-  def __init__(self, tool, email, apikey=None, apikey_var=None, threads=None, qid=None):
-    super().__init__('elink.fcgi', tool, email, apikey=apikey, threads=threads, qid=qid)
+  def __init__(self, tool, email, apikey=None, apikey_var=None, threads=None, qid=None,
+               session=None):
+    super().__init__('elink.fcgi', tool, email, apikey=apikey, threads=threads, qid=qid,
+                     session=session)
     self.logger = entrezpy.log.logger.get_class_logger(Elinker)
-    self.logger.debug(json.dumps({'init':self.dump()}))
+    self.logger.debug(lambda: {'init':self.dump()})
 
   def inquire(self, parameter, analyzer=entrezpy.elink.elink_analyzer.ElinkAnalyzer()):
     """ Implements virtual function inquire()
@@ -69,7 +70,7 @@ class Elinker(entrezpy.base.query.EutilsQuery):
     :rtype: :class:`entrezpy.base.analyzer.EntrezpyAnalyzer` instance or None
     """
     p = entrezpy.elink.elink_parameter.ElinkParameter(parameter)
-    self.logger.debug(json.dumps({'parameter':p.dump()}))
+    self.logger.debug(lambda: {'parameter':p.dump()})
     self.monitor_start(p)
     self.add_request(entrezpy.elink.elink_request.ElinkRequest(self.eutil, p), analyzer)
     self.request_pool.drain()
@@ -77,3 +78,25 @@ class Elinker(entrezpy.base.query.EutilsQuery):
     if self.isGoodQuery():
       return analyzer
     return None
+
+  async def ainquire(self, parameter, analyzer=None):
+    """Implements :meth:`entrezpy.base.query.EutilsQuery.ainquire`. Asyncio
+    variant of :meth:`.inquire`.
+
+    :param dict parameter: ELink parameter
+    :param analyzer analyzer: analyzer for Elink Results, default is a new
+      :class:`entrezpy.elink.elink_analyzer.ElinkAnalyzer`
+    :return: analyzer  or None if request errors have been encountered
+    :rtype: :class:`entrezpy.base.analyzer.EntrezpyAnalyzer` instance or None
+    """
+    if analyzer is None:
+      analyzer = entrezpy.elink.elink_analyzer.ElinkAnalyzer()
+    p = entrezpy.elink.elink_parameter.ElinkParameter(parameter)
+    self.logger.debug(lambda: {'parameter':p.dump()})
+    self.monitor_start(p)
+    self.add_async_request(entrezpy.elink.elink_request.ElinkRequest(self.eutil, p), analyzer)
+    await self.get_async_request_pool().drain()
+    self.monitor_stop()
+    if self.isGoodQuery():
+      return analyzer
+    return None
@@ -23,7 +23,6 @@
 """
 
 
-import json
 import xml.etree.ElementTree
 
 import entrezpy.base.analyzer
@@ -39,6 +38,14 @@ class EpostAnalyzer(entrezpy.base.analyzer.EutilsAnalyzer):
   :class:`entrezpy.epost.epost_result.EpostResult`
   """
 
+  stream_response = True
+  """Responses are parsed while downloaded, see
+  :attr:`entrezpy.base.analyzer.EutilsAnalyzer.stream_response`"""
+
+  inline_error_check = True
+  """Errors are detected while parsing, see
+  :attr:`entrezpy.base.analyzer.EutilsAnalyzer.inline_error_check`"""
+
   def __init__(self):
     super().__init__()
     self.logger = entrezpy.log.logger.get_class_logger(EpostAnalyzer)
@@ -59,7 +66,7 @@ class EpostAnalyzer(entrezpy.base.analyzer.EutilsAnalyzer):
       :param request: entrezpy request
     """
     epost_res = {}
-    for event, elem in xml.etree.ElementTree.iterparse(response, events=["end"]):
+    for event, elem in self.iterparse(response, events=["end"]):
       if event == 'end' and elem.tag == 'QueryKey':
         epost_res['querykey'] = int(elem.text)
       if event == 'end' and elem.tag == 'WebEnv':
@@ -79,6 +86,6 @@ class EpostAnalyzer(entrezpy.base.analyzer.EutilsAnalyzer):
         error = elem.text
         break
       elem.clear()
-    self.logger.error(json.dumps({'tool':request.tool, 'error':error,
-                                  'requestid':request.id, 'queryid':request.query_id,
-                                  'request-dump':request.dump_internals()}))
+    self.logger.error({'tool':request.tool, 'error':error,
+                       'requestid':request.id, 'queryid':request.query_id,
+                       'request-dump':request.dump_internals()})
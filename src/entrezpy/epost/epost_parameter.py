@@ -23,7 +23,6 @@
 
 
 import sys
-import json
 import logging
 
 import entrezpy.base.parameter
@@ -54,17 +53,17 @@ class EpostParameter(entrezpy.base.parameter.EutilsParameter):
     self.expected_requests = 1
     self.check()
     self.logger = entrezpy.log.logger.get_class_logger(EpostParameter)
-    self.logger.debug(json.dumps({'init':self.dump()}))
+    self.logger.debug(lambda: {'init':self.dump()})
 
   def check(self):
     """Implements :meth:`entrezpy.base.parameter.EutilsParameter.check`
     by checking for missing database parameter and UIDs.
     """
     if not self.haveDb():
-      sys.exit(self.logger.error(json.dumps({'Missing db parameter':'abort'})))
+      sys.exit(self.logger.error({'Missing db parameter':'abort'}))
     if self.query_size == 0:
-      sys.exit(self.logger.error(json.dumps({'Missing uids':self.uids,
-                                             'action':'abort'})))
+      sys.exit(self.logger.error({'Missing uids':self.uids,
+                                  'action':'abort'}))
 
   def dump(self):
     """Dump instance variables
@@ -23,8 +23,6 @@
 """
 
 
-import json
-
 import entrezpy.base.request
 import entrezpy.log.logger
 
@@ -46,7 +44,7 @@ class EpostRequest(entrezpy.base.request.EutilsRequest):
     self.webenv = parameter.webenv
     self.retmode = parameter.retmode
     self.logger = entrezpy.log.logger.get_class_logger(EpostRequest)
-    self.logger.debug(json.dumps({'init': self.dump()}))
+    self.logger.debug(lambda: {'init': self.dump()})
 
   def get_post_parameter(self):
     """Implements :meth:`entrezpy.base.request.EutilsRequest.get_post_parameter`"""
@@ -22,7 +22,6 @@
 """
 
 
-import json
 import logging
 
 import entrezpy.base.query
@@ -40,7 +39,8 @@ class Eposter(entrezpy.base.query.EutilsQuery):
   [0]: https://www.ncbi.nlm.nih.gov/books/NBK25499/#chapter4.EPost
   """
 
-  def __init__(self, tool, email, apikey=None, apikey_var=None, threads=None, qid=None):
+  def __init__(self, tool, email, apikey=None, apikey_var=None, threads=None, qid=None,
+               session=None):
     """Inits Eposter instance with given attributes.
 
       :param str tool: tool name
@@ -49,10 +49,12 @@ class Eposter(entrezpy.base.query.EutilsQuery):
       :param str apikey_var: enviroment variable storing NCBI apikey
       :param int threads: set threads for multithreading
       :param str qid: unique query id
+      :param session: session providing shared query setup
+      :type  session: :class:`entrezpy.session.Session`
     """
-    super().__init__('epost.fcgi', tool, email, apikey, apikey_var, threads, qid)
+    super().__init__('epost.fcgi', tool, email, apikey, apikey_var, threads, qid, session)
     self.logger = entrezpy.log.logger.get_class_logger(Eposter)
-    self.logger.debug({'init':self.dump()})
+    self.logger.debug(lambda: {'init':self.dump()})
 
   def inquire(self, parameter, analyzer=entrezpy.epost.epost_analyzer.EpostAnalyzer()):
     """Implements :meth:`entrezpy.base.query.inquire` and posts UIDs to Entrez.
@@ -66,10 +68,32 @@ class Eposter(entrezpy.base.query.EutilsQuery):
     """
     p = entrezpy.epost.epost_parameter.EpostParameter(parameter)
     self.monitor_start(p)
-    self.logger.debug(json.dumps({'parameter':p.dump()}))
+    self.logger.debug(lambda: {'parameter':p.dump()})
     self.add_request(entrezpy.epost.epost_request.EpostRequest(self.eutil, p), analyzer)
     self.request_pool.drain()
     self.monitor_stop()
     if self.isGoodQuery():
       return analyzer
     return None
+
+  async def ainquire(self, parameter, analyzer=None):
+    """Implements :meth:`entrezpy.base.query.EutilsQuery.ainquire`. Asyncio
+    variant of :meth:`.inquire`.
+
+    :param dict parameter: Epost parameter
+    :param analyzer analyzer: analyzer for Epost results, default is a new
+        :class:`entrezpy.epost.epost_analyzer.EpostAnalyzer`
+    :return: analyzer or None if request errors have been encountered
+    :rtype: :class:`entrezpy.base.analyzer.EntrezpyAnalyzer` instance or None
+    """
+    if analyzer is None:
+      analyzer = entrezpy.epost.epost_analyzer.EpostAnalyzer()
+    p = entrezpy.epost.epost_parameter.EpostParameter(parameter)
+    self.monitor_start(p)
+    self.logger.debug(lambda: {'parameter':p.dump()})
+    self.add_async_request(entrezpy.epost.epost_request.EpostRequest(self.eutil, p), analyzer)
+    await self.get_async_request_pool().drain()
+    self.monitor_stop()
+    if self.isGoodQuery():
+      return analyzer
+    return None
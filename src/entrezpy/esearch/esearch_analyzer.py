@@ -24,8 +24,6 @@
 """
 
 
-import json
-
 import entrezpy.base.analyzer
 import entrezpy.esearch.esearch_result
 import entrezpy.log.logger
@@ -37,10 +35,17 @@ class EsearchAnalyzer(entrezpy.base.analyzer.EutilsAnalyzer):
   :class:`entrezpy.esearch.esearch_result.EsearchResult` instance.
   """
 
+  stream_response = True
+  """JSON is decoded directly from the response stream, see
+  :attr:`entrezpy.base.analyzer.EutilsAnalyzer.stream_response`"""
+
   def __init__(self):
-    """:ivar result: :class:`entrezpy.esearch.esearch_result.EsearchResult`"""
+    """:ivar result: :class:`entrezpy.esearch.esearch_result.EsearchResult`
+       :ivar list uid_listeners: callables receiving the UIDs of each response
+    """
     super().__init__()
     self.result = None
+    self.uid_listeners = []
     self.logger = entrezpy.log.logger.get_class_logger(EsearchAnalyzer)
 
   def init_result(self, response, request):
@@ -63,8 +68,27 @@ class EsearchAnalyzer(entrezpy.base.analyzer.EutilsAnalyzer):
     :param request: Esearch request
     :type request: :class:`entrezpy.esearch.esearch_request.EsearchRequest`
     """
+    uids = list(response['esearchresult'].get('idlist', []))
     if not self.init_result(response['esearchresult'], request):
       self.result.add_response(response.pop('esearchresult'))
+    for i in self.uid_listeners:
+      i(uids)
+
+  def add_uid_listener(self, listener):
+    """Adds a callable receiving the UIDs of each analyzed response, e.g. to
+    stream them to downstream queries while follow-up requests are running.
+    Responses of threaded queries are passed in order of arrival.
+
+    :param callable listener: called with the list of UIDs of one response
+    """
+    self.uid_listeners.append(listener)
+
+  def remove_uid_listener(self, listener):
+    """Removes a callable added with :meth:`.add_uid_listener`
+
+    :param callable listener: listener to remove
+    """
+    self.uid_listeners.remove(listener)
 
   def analyze_error(self, response, request):
     """
@@ -74,9 +98,9 @@ class EsearchAnalyzer(entrezpy.base.analyzer.EutilsAnalyzer):
       :param request: Esearch request
       :type request: :class:`entrezpy.esearch.esearch_request.EsearchRequest`
     """
-    self.logger.error(json.dumps({'tool':request.tool, 'request':request.id,
+    self.logger.error({'tool':request.tool, 'request':request.id,
       'query':request.query_id, 'error':response['esearchresult'],
-      'request-dump':request.dump_internals()}))
+      'request-dump':request.dump_internals()})
 
   def size(self):
     """
@@ -25,7 +25,6 @@
 
 import sys
 import math
-import json
 
 import entrezpy.base.parameter
 import entrezpy.log.logger
@@ -61,7 +60,7 @@ class EsearchParameter(entrezpy.base.parameter.EutilsParameter):
     self.maxdate = parameter.get('maxdate')
     self.idtype = parameter.get('idtype')
     self.logger = entrezpy.log.logger.get_class_logger(EsearchParameter)
-    self.logger.debug(json.dumps({'init':self.dump()}))
+    self.logger.debug(lambda: {'init':self.dump()})
     self.check()
 
   def goodDateparam(self):
@@ -69,14 +68,14 @@ class EsearchParameter(entrezpy.base.parameter.EutilsParameter):
     useDate = False
     if self.useMinMaxDate():
       if self.reldate:
-        self.logger.error(json.dumps({'reldate and Min/Max dates':'not used together',
-                                      'parameters':self.dump()}))
+        self.logger.error({'reldate and Min/Max dates':'not used together',
+                           'parameters':self.dump()})
         return False
       useDate = True
     if self.reldate:
       useDate = True
     if useDate and (not self.datetype):
-      self.logger.error(json.dumps({'dates':'requires datetype', 'parameters':self.dump()}))
+      self.logger.error({'dates':'requires datetype', 'parameters':self.dump()})
       return False
     return True
 
@@ -85,7 +84,7 @@ class EsearchParameter(entrezpy.base.parameter.EutilsParameter):
     if self.mindate or self.maxdate: # Intend to use max/min dates
       if self.mindate and self.maxdate: # Require both
         return True
-      self.logger.error(json.dumps({'min/max date':'both required', 'parameters':self.dump()}))
+      self.logger.error({'min/max date':'both required', 'parameters':self.dump()})
     return False
 
   def set_uilist(self, rettype):
@@ -139,17 +138,17 @@ class EsearchParameter(entrezpy.base.parameter.EutilsParameter):
     check for the minumum required parameters. Aborts if any check fails.
     """
     if not self.haveDb():
-      sys.exit(self.logger.error(json.dumps({'Missing db parameter':'abort'})))
+      sys.exit(self.logger.error({'Missing db parameter':'abort'}))
 
     if not self.haveExpectedRequets():
-      sys.exit(self.logger.error(json.dumps({'No expected requests':self.expected_requests,
-                                             'action':'abort'})))
+      sys.exit(self.logger.error({'No expected requests':self.expected_requests,
+                                  'action':'abort'}))
 
     if not self.goodDateparam():
-      sys.exit(self.logger.error(json.dumps({'Bad date parameter':'abort'})))
+      sys.exit(self.logger.error({'Bad date parameter':'abort'}))
 
     if not self.term and not self.webenv:
-      sys.exit(self.logger.error(json.dumps({'Missing term and/or WebEnv parameters':'abort'})))
+      sys.exit(self.logger.error({'Missing term and/or WebEnv parameters':'abort'}))
 
   def dump(self):
     return {'db':self.db, 'webenv':self.webenv, 'querykey':self.querykey,
@@ -24,8 +24,6 @@
 """
 
 
-import json
-
 import entrezpy.base.request
 import entrezpy.log.logger
 
@@ -63,7 +61,7 @@ class EsearchRequest(entrezpy.base.request.EutilsRequest):
     self.mindate = parameter.mindate
     self.maxdate = parameter.maxdate
     self.logger = entrezpy.log.logger.get_class_logger(EsearchRequest)
-    self.logger.debug(json.dumps({'init': self.dump()}))
+    self.logger.debug(lambda: {'init': self.dump()})
 
   def get_post_parameter(self):
     qry = self.prepare_base_qry()
@@ -95,7 +93,7 @@ class EsearchRequest(entrezpy.base.request.EutilsRequest):
       qry.update({'maxdate' : self.maxdate})
     if self.idtype:
       qry.update({'idtype' : self.idtype})
-    self.logger.debug(json.dumps({'POST': self.dump()}))
+    self.logger.debug(lambda: {'POST': self.dump()})
     return qry
 
   def dump(self):
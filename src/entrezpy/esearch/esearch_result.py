@@ -24,8 +24,6 @@
 """
 
 
-import json
-
 import entrezpy.base.result
 import entrezpy.log.logger
 
@@ -50,7 +48,7 @@ class EsearchResult(entrezpy.base.result.EutilsResult):
     self.retstart = int(response.pop('retstart'))
     self.uids = response.pop('idlist', [])
     self.logger = entrezpy.log.logger.get_class_logger(EsearchResult)
-    self.logger.debug(json.dumps({'init':self.dump()}))
+    self.logger.debug(lambda: {'init':self.dump()})
 
   def dump(self):
     """:rtype: dict"""
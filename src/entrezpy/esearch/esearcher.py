@@ -23,7 +23,6 @@
 """
 
 import sys
-import json
 
 import entrezpy.base.query
 import entrezpy.esearch.esearch_parameter
@@ -41,10 +40,12 @@ class Esearcher(entrezpy.base.query.EutilsQuery):
   get all queried UIDs if required.
   """
 
-  def __init__(self, tool, email, apikey=None, apikey_var=None, threads=None, qid=None):
-    super().__init__('esearch.fcgi', tool, email, apikey=apikey, threads=threads, qid=qid)
+  def __init__(self, tool, email, apikey=None, apikey_var=None, threads=None, qid=None,
+               session=None):
+    super().__init__('esearch.fcgi', tool, email, apikey=apikey, threads=threads, qid=qid,
+                     session=session)
     self.logger = entrezpy.log.logger.get_class_logger(Esearcher)
-    self.logger.debug(json.dumps({'init':self.dump()}))
+    self.logger.debug(lambda: {'init':self.dump()})
 
   def inquire(self, parameter, analyzer=entrezpy.esearch.esearch_analyzer.EsearchAnalyzer()):
     """Implements :meth:`entrezpy.base.query.EutilsQuery.inquire` and configures
@@ -57,7 +58,7 @@ class Esearcher(entrezpy.base.query.EutilsQuery):
     :rtype: :class:`entrezpy.esearch.esearch_analyzer.EsearchAnalyzer` or None
     """
     p = entrezpy.esearch.esearch_parameter.EsearchParameter(parameter)
-    self.logger.debug(json.dumps({'parameter':p.dump()}))
+    self.logger.debug(lambda: {'parameter':p.dump()})
     self.monitor_start(p)
     follow_up = self.initial_search(p, analyzer)
     if not follow_up:
@@ -65,28 +66,74 @@ class Esearcher(entrezpy.base.query.EutilsQuery):
       if not analyzer.isSuccess():
         return None
       return analyzer
-    self.logger.debug(json.dumps({'Follow-up': follow_up.dump()}))
+    self.logger.debug(lambda: {'Follow-up': follow_up.dump()})
     self.monitor_update(follow_up)
+    self.add_follow_ups(follow_up, analyzer, self.add_request)
+    self.request_pool.drain()
+    self.monitor_stop()
+    if not self.isGoodQuery():
+      self.logger.error({'follow-up':'failed'})
+      return None
+    return analyzer
+
+  async def ainquire(self, parameter, analyzer=None):
+    """Implements :meth:`entrezpy.base.query.EutilsQuery.ainquire`. Asyncio
+    variant of :meth:`.inquire`.
+
+    :param dict parameter: ESearch parameter
+    :param analyzer analyzer: analyzer for ESearch results, default is a new
+      :class:`entrezpy.esearch.esearch_analyzer.EsearchAnalyzer`
+    :return: analyzer instance or None if request errors have been encountered
+    :rtype: :class:`entrezpy.esearch.esearch_analyzer.EsearchAnalyzer` or None
+    """
+    if analyzer is None:
+      analyzer = entrezpy.esearch.esearch_analyzer.EsearchAnalyzer()
+    p = entrezpy.esearch.esearch_parameter.EsearchParameter(parameter)
+    self.logger.debug(lambda: {'parameter':p.dump()})
+    self.monitor_start(p)
+    self.add_async_request(entrezpy.esearch.esearch_request.EsearchRequest(self.eutil,
+                                                                           p,
+                                                                           p.retstart,
+                                                                           p.reqsize), analyzer)
+    await self.get_async_request_pool().drain()
+    follow_up = self.check_initial_search(p, analyzer)
+    if not follow_up:
+      self.monitor_stop()
+      if not analyzer.isSuccess():
+        return None
+      return analyzer
+    self.logger.debug(lambda: {'Follow-up': follow_up.dump()})
+    self.monitor_update(follow_up)
+    self.add_follow_ups(follow_up, analyzer, self.add_async_request)
+    await self.get_async_request_pool().drain()
+    self.monitor_stop()
+    if not self.isGoodQuery():
+      self.logger.error({'follow-up':'failed'})
+      return None
+    return analyzer
+
+  def add_follow_ups(self, follow_up, analyzer, add_request):
+    """Adds the follow-up requests fetching the remaining UIDs.
+
+    :param follow_up: follow-up parameter from :func:`configure_follow_up`
+    :type  follow_up: :class:`entrezpy.esearch.esearch_parameter.EsearchParamater`
+    :param analyzer: Esearch analyzer instance
+    :param add_request: :meth:`.add_request` or :meth:`.add_async_request`
+    """
     req_size = follow_up.reqsize
     for i in range(1, follow_up.expected_requests):
       if (i * req_size + req_size) > follow_up.retmax:
-        self.logger.debug(json.dumps({'adjust-reqsize':
+        self.logger.debug(lambda: {'adjust-reqsize':
           {'request':i, 'start':(i*follow_up.reqsize), 'end':i*req_size+req_size,
-           'query_size':follow_up.reqsize, 'adjusted-reqsize':follow_up.retmax%req_size}}))
+           'query_size':follow_up.reqsize, 'adjusted-reqsize':follow_up.retmax%req_size}})
         req_size = follow_up.retmax % req_size
-      self.add_request(entrezpy.esearch.esearch_request.EsearchRequest(self.eutil,
-                                                                       follow_up,
-                                                                       (i*follow_up.reqsize),
-                                                                       req_size), analyzer)
-      self.logger.debug(json.dumps({'added request':i, 'reqsize':req_size,
+      add_request(entrezpy.esearch.esearch_request.EsearchRequest(self.eutil,
+                                                                  follow_up,
+                                                                  (i*follow_up.reqsize),
+                                                                  req_size), analyzer)
+      self.logger.debug(lambda: {'added request':i, 'reqsize':req_size,
         'expected':follow_up.expected_requests,'start':(i*follow_up.reqsize),
-        'end':(i*follow_up.reqsize)+req_size}))
-    self.request_pool.drain()
-    self.monitor_stop()
-    if not self.isGoodQuery():
-      self.logger.error(json.dumps({'follow-up':failed}))
-      return None
-    return analyzer
+        'end':(i*follow_up.reqsize)+req_size})
 
   def initial_search(self, parameter, analyzer):
     """Does first request and triggers follow-up if required or possible.
@@ -103,22 +150,35 @@ class Esearcher(entrezpy.base.query.EutilsQuery):
                                                                      parameter.retstart,
                                                                      parameter.reqsize), analyzer)
     self.request_pool.drain()
+    return self.check_initial_search(parameter, analyzer)
+
+  def check_initial_search(self, parameter, analyzer):
+    """Checks the first response and configures follow-up if required or
+    possible.
+
+    :param parameter: Esearch parameter instances
+    :type  parameter: :class:`entrezpy.esearch.esearch_parameter.EsearchParamater`
+    :param analyzer: Esearch analyzer instance
+    :type  analyzer: :class:`entrezpy.esearch.esearch_analyzer.EsearchAnalyzer`
+    :return: follow-up parameter or None
+    :rtype: :class:`entrezpy.esearch.esearch_parameter.EsearchParamater` or None
+    """
     if not self.isGoodQuery():
-      self.logger.error(json.dumps({'initial request':'failed'}))
+      self.logger.error({'initial request':'failed'})
       return None
     if not analyzer.isSuccess():
-      self.logger.error(json.dumps({'initial response':'failed'}))
+      self.logger.error({'initial response':'failed'})
       return None
     if not parameter.uilist: # we care only about count
-      self.logger.debug(json.dumps({'initial response':'no uilist'}))
+      self.logger.debug({'initial response':'no uilist'})
       return None
     if parameter.retmax == 0: # synonym for uilist
-      self.logger.debug(json.dumps({'initial response':'retmax == 0'}))
+      self.logger.debug({'initial response':'retmax == 0'})
       return None
     if reachedLimit(parameter, analyzer):# reached limit in first search
-      self.logger.debug(json.dumps({'initial response':'fetched whole query'}))
+      self.logger.debug({'initial response':'fetched whole query'})
       return None
-    self.logger.debug(json.dumps({'initial response': 'follow-up required'}))
+    self.logger.debug({'initial response': 'follow-up required'})
     return configure_follow_up(parameter, analyzer) # We need mooaahhr
 
   def isGoodQuery(self):
@@ -128,11 +188,11 @@ class Esearcher(entrezpy.base.query.EutilsQuery):
       :rtype: bool
     """
     if not self.failed_requests:
-      self.logger.info(json.dumps({'query': self.id, 'status' : 'OK'}))
+      self.logger.info({'query': self.id, 'status' : 'OK'})
       return True
-    self.logger.warning(json.dumps({'query': self.id, 'status' : 'failed'}))
-    self.logger.debug(json.dumps({'query': self.id, 'status' : 'failed',
-      'request-dumps' : [x.dump_internals() for x in self.failed_requests]}))
+    self.logger.warning({'query': self.id, 'status' : 'failed'})
+    self.logger.debug(lambda: {'query': self.id, 'status' : 'failed',
+      'request-dumps' : [x.dump_internals() for x in self.failed_requests]})
     return False
 
 def configure_follow_up(parameter, analyzer):
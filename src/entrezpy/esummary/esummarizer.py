@@ -23,6 +23,7 @@
 """
 
 
+import copy
 import json
 
 import entrezpy.base.query
@@ -37,12 +38,30 @@ class Esummarizer(entrezpy.base.query.EutilsQuery):
   summaries for given UIDs or Webenv and query_key references.
   Esummary can consist of several queries, depending on the format requested.
   # [0]: https://www.ncbi.nlm.nih.gov/books/NBK25499/#chapter4.ESummary
+
+  Summaries for UIDs can be cached in memory by setting :attr:`summary_cache`
+  to a :class:`entrezpy.requester.memorycache.MemoryCache` shared by all
+  Esummary queries:
+
+    Esummarizer.summary_cache = entrezpy.requester.memorycache.MemoryCache(max_entries=100000)
+
+  Queries for UIDs request only UIDs without cached summary and merge cached
+  and received summaries into one
+  :class:`entrezpy.esummary.esummary_result.EsummaryResult` ordered by the
+  requested UIDs. Queries using WebEnv are not cached. Summaries are keyed
+  by database and UID string and copied when stored and when added to a
+  result, i.e. changing a result does not change the cache.
   """
 
-  def __init__(self, tool, email, apikey=None, apikey_var=None, threads=None, qid=None):
-    super().__init__('esummary.fcgi', tool, email, apikey, apikey_var, threads, qid)
+  summary_cache = None
+  """Summaries by database and UID for all Esummary queries, disabled if
+  None"""
+
+  def __init__(self, tool, email, apikey=None, apikey_var=None, threads=None, qid=None,
+               session=None):
+    super().__init__('esummary.fcgi', tool, email, apikey, apikey_var, threads, qid, session)
     self.logger = entrezpy.log.logger.get_class_logger(Esummarizer)
-    self.logger.debug(json.dumps({'init':self.dump()}))
+    self.logger.debug(lambda: {'init':self.dump()})
 
   def inquire(self, parameter, analyzer=entrezpy.esummary.esummary_analyzer.EsummaryAnalyzer()):
     """
@@ -56,16 +75,115 @@ class Esummarizer(entrezpy.base.query.EutilsQuery):
       None
     """
     param = entrezpy.esummary.esummary_parameter.EsummaryParameter(parameter)
-    self.logger.debug(json.dumps({'parameter':param.dump()}))
+    self.logger.debug(lambda: {'parameter':param.dump()})
+    uncached_param = self.apply_summary_cache(param, parameter, analyzer)
+    if uncached_param is not None:
+      self.monitor_start(uncached_param)
+      self.add_requests(uncached_param, analyzer, self.add_request)
+      self.request_pool.drain()
+      self.monitor_stop()
+    self.update_summary_cache(param, analyzer)
+    if self.isGoodQuery():
+      return analyzer
+    return None
+
+  async def ainquire(self, parameter, analyzer=None):
+    """
+    Implements :meth:`entrezpy.base.query.EutilsQuery.ainquire`. Asyncio
+    variant of :meth:`.inquire`.
+
+    :param dict parameter: Esummary parameter
+    :param analyzer: Esummary analyzer, default is a new
+      :class:`entrezpy.esummary.esummary_analyzer.EsummaryAnalyzer`
+    :return: analyzer instance or None if request errors have been encountered
+    :rtype: :class:`entrezpy.esummary.esummary_analyzer.EsummaryAnalyzer` or
+      None
+    """
+    if analyzer is None:
+      analyzer = entrezpy.esummary.esummary_analyzer.EsummaryAnalyzer()
+    param = entrezpy.esummary.esummary_parameter.EsummaryParameter(parameter)
+    self.logger.debug(lambda: {'parameter':param.dump()})
+    uncached_param = self.apply_summary_cache(param, parameter, analyzer)
+    if uncached_param is not None:
+      self.monitor_start(uncached_param)
+      self.add_requests(uncached_param, analyzer, self.add_async_request)
+      await self.get_async_request_pool().drain()
+      self.monitor_stop()
+    self.update_summary_cache(param, analyzer)
+    if self.isGoodQuery():
+      return analyzer
+    return None
+
+  def add_requests(self, param, analyzer, add_request):
+    """Splits the query into requests of the request size.
+
+    :param param: Esummary parameter
+    :type  param: :class:`entrezpy.esummary.esummary_parameter.EsummaryParameter`
+    :param analyzer: Esummary analyzer
+    :param add_request: :meth:`.add_request` or :meth:`.add_async_request`
+    """
     req_size = param.reqsize
-    self.monitor_start(param)
     for i in range(param.expected_requests):
       if i * req_size + req_size > param.retmax:
         req_size = param.retmax % param.reqsize
-      self.add_request(entrezpy.esummary.esummary_request.EsummaryRequest(
+      add_request(entrezpy.esummary.esummary_request.EsummaryRequest(
         self.eutil, param, (i*param.reqsize), req_size), analyzer)
-    self.request_pool.drain()
-    self.monitor_stop()
-    if self.isGoodQuery():
-      return analyzer
-    return None
+
+  def isSummaryCached(self, param, analyzer):
+    """Tests if summaries of a query can be taken from and stored in
+    :attr:`summary_cache`. Requires UIDs and an
+    :class:`entrezpy.esummary.esummary_analyzer.EsummaryAnalyzer` storing
+    summaries in its result.
+
+    :param param: Esummary parameter
+    :type  param: :class:`entrezpy.esummary.esummary_parameter.EsummaryParameter`
+    :rtype: bool
+    """
+    if Esummarizer.summary_cache is None or not param.uids:
+      return False
+    return isinstance(analyzer, entrezpy.esummary.esummary_analyzer.EsummaryAnalyzer)
+
+  def apply_summary_cache(self, param, parameter, analyzer):
+    """Adds cached summaries to the analyzer and returns the parameter for
+    the UIDs without cached summary.
+
+    :param param: Esummary parameter
+    :type  param: :class:`entrezpy.esummary.esummary_parameter.EsummaryParameter`
+    :param dict parameter: Esummary parameter as passed to :meth:`.inquire`
+    :param analyzer: Esummary analyzer
+    :return: parameter for uncached UIDs or None if all summaries are cached
+    :rtype: :class:`entrezpy.esummary.esummary_parameter.EsummaryParameter`
+      or None
+    """
+    if not self.isSummaryCached(param, analyzer):
+      return param
+    cached = Esummarizer.summary_cache.get_many([(param.db, str(x)) for x in param.uids])
+    self.logger.debug({'summary cache':{'uids':len(param.uids), 'cached':len(cached)}})
+    if not cached:
+      return param
+    request = self.prepare_request(
+      entrezpy.esummary.esummary_request.EsummaryRequest(self.eutil, param, 0, 0))
+    request.cached = True
+    analyzer.add_cached_summaries({x[1]:copy.deepcopy(cached[x]) for x in cached}, request)
+    missing = [x for x in param.uids if (param.db, str(x)) not in cached]
+    if not missing:
+      return None
+    return entrezpy.esummary.esummary_parameter.EsummaryParameter(dict(parameter, id=missing))
+
+  def update_summary_cache(self, param, analyzer):
+    """Stores received summaries in :attr:`summary_cache` and orders the
+    summaries in the result by the requested UIDs.
+
+    :param param: Esummary parameter
+    :type  param: :class:`entrezpy.esummary.esummary_parameter.EsummaryParameter`
+    :param analyzer: Esummary analyzer
+    """
+    if not self.isSummaryCached(param, analyzer) or analyzer.result is None:
+      return
+    summaries = analyzer.result.summaries
+    for i in param.uids:
+      key = (param.db, str(i))
+      summary = summaries.get(analyzer.result.get_key(i))
+      if summary is not None and key not in Esummarizer.summary_cache:
+        Esummarizer.summary_cache.put(key, copy.deepcopy(summary), len(json.dumps(summary)))
+    analyzer.result.order_summaries(param.uids)
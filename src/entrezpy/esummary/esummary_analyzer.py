@@ -23,8 +23,6 @@
 """
 
 
-import json
-
 import entrezpy.base.analyzer
 import entrezpy.esummary.esummary_result
 import entrezpy.log.logger
@@ -37,6 +35,10 @@ class EsummaryAnalyzer(entrezpy.base.analyzer.EutilsAnalyzer):
   :class:`entrezpy.esummary.esummary_result.EsummaryResult` instance.
   """
 
+  stream_response = True
+  """JSON is decoded directly from the response stream, see
+  :attr:`entrezpy.base.analyzer.EutilsAnalyzer.stream_response`"""
+
   def __init__(self):
     """:ivar result: Esummary results
        :type result: :class:`entrezpy.esummary.esummary_result.EsummaryResult`
@@ -62,11 +64,23 @@ class EsummaryAnalyzer(entrezpy.base.analyzer.EutilsAnalyzer):
     if not self.init_result(response, request):
       self.result.add_summaries(response.pop('result', None))
 
+  def add_cached_summaries(self, summaries, request):
+    """Adds summaries taken from
+    :attr:`entrezpy.esummary.esummarizer.Esummarizer.summary_cache`.
+
+    :param dict summaries: summaries by UID
+    :param request: unsent request representing the cached summaries
+    :type  request: :class:`entrezpy.esummary.esummary_request.EsummaryRequest`
+    """
+    self.init_result(None, request)
+    for i in summaries:
+      self.result.add_summary(i, summaries[i])
+
   def analyze_error(self, response, request):
     log_msg = {'tool':request.tool, 'request':request.id, 'query':request.query_id}
     if 'error' in response:
       log_msg.update({'error' : response.pop('error')})
     if 'esummaryresult' in response:
       log_msg.update({'error' : response.pop('esummaryresult')})
-    self.logger.error(json.dumps(
-      {'response':log_msg, 'dump':request.dump_internals()}))
+    self.logger.error(
+      {'response':log_msg, 'dump':request.dump_internals()})
@@ -24,7 +24,6 @@
 
 import sys
 import math
-import json
 
 import entrezpy.base.parameter
 import entrezpy.log.logger
@@ -83,8 +82,8 @@ class EsummaryParameter(entrezpy.base.parameter.EutilsParameter):
     if self.uids:           # we got UIDs to fetch
       return len(self.uids)
     if retmax is None:      # we have no clue what to expect, e.g. WebEnv
-      EsummaryParameter.logger.info(json.dumps(
-        {'No retmax':'fetching 1 request limited by retmode and retmax'}))
+      EsummaryParameter.logger.info(
+        {'No retmax':'fetching 1 request limited by retmode and retmax'})
       return None
     return int(retmax)      # we set a limitation
 
@@ -105,16 +104,15 @@ class EsummaryParameter(entrezpy.base.parameter.EutilsParameter):
 
   def check(self):
     if not self.haveDb():
-      sys.exit(EsummaryParameter.logger.error(
-        json.dumps({'Missing parameter':'db', 'action':'abort'})))
+      sys.exit(EsummaryParameter.logger.error({'Missing parameter':'db', 'action':'abort'}))
 
     if not self.haveExpectedRequets():
-      sys.exit(EsummaryParameter.logger.error(json.dumps(
-        {'Bad expected requests':self.expected_requests, 'action':'abort'})))
+      sys.exit(EsummaryParameter.logger.error(
+        {'Bad expected requests':self.expected_requests, 'action':'abort'}))
     if not self.uids and not self.haveQuerykey() and not self.haveWebenv():
-      sys.exit(EsummaryParameter.logger.error(json.dumps(
+      sys.exit(EsummaryParameter.logger.error(
         {'Missing required parameters':{'ids':self.uids, 'WebEnv':self.webenv,
-          'QueryKey':self.querykey}, 'action':'abort'})))
+          'QueryKey':self.querykey}, 'action':'abort'}))
     EsummaryParameter.logger.debug({'init':self.dump()})
 
   def dump(self):
@@ -23,8 +23,6 @@
 """
 
 
-import json
-
 import entrezpy.base.request
 import entrezpy.log.logger
 
@@ -53,7 +51,7 @@ class EsummaryRequest(entrezpy.base.request.EutilsRequest):
     self.webenv = parameter.webenv
     self.querykey = parameter.querykey
     self.logger = entrezpy.log.logger.get_class_logger(EsummaryRequest)
-    self.logger.debug(json.dumps({'init':self.dump()}))
+    self.logger.debug(lambda: {'init':self.dump()})
 
   def get_post_parameter(self):
     qry = self.prepare_base_qry(extend={'retmode':self.retmode})
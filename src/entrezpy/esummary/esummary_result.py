@@ -23,8 +23,6 @@
 """
 
 
-import json
-
 import entrezpy.base.result
 import entrezpy.log.logger
 
@@ -40,7 +38,7 @@ class EsummaryResult(entrezpy.base.result.EutilsResult):
     if response:
       self.add_summaries(response['result'])
     self.logger = entrezpy.log.logger.get_class_logger(EsummaryResult)
-    self.logger.debug(json.dumps({'init':self.dump()}))
+    self.logger.debug(lambda: {'init':self.dump()})
 
   def dump(self):
     """:rtype: dict"""
@@ -71,5 +69,44 @@ class EsummaryResult(entrezpy.base.result.EutilsResult):
     """
     if results:
       for i in results['uids']:
-        if int(i) not in self.summaries:
-          self.summaries[int(i)] = results.get(i)
+        self.add_summary(i, results.get(i))
+
+  def add_summary(self, uid, summary):
+    """
+    Adds one summary unless the UID has a summary already.
+
+    :param uid: UID
+    :type  uid: int or str
+    :param dict summary: Esummary for UID
+    """
+    key = EsummaryResult.get_key(uid)
+    if key not in self.summaries:
+      self.summaries[key] = summary
+
+  @staticmethod
+  def get_key(uid):
+    """Returns the key of a UID in :attr:`summaries`, i.e. an int for
+    numerical UIDs and the string otherwise, e.g. for accessions.
+
+    :param uid: UID
+    :type  uid: int or str
+    :rtype: int or str
+    """
+    return int(uid) if str(uid).isdigit() else str(uid)
+
+  def order_summaries(self, uids):
+    """
+    Orders summaries by UIDs. Summaries for other UIDs follow in their
+    current order.
+
+    :param list uids: UIDs
+    """
+    ordered = {}
+    for i in uids:
+      key = EsummaryResult.get_key(i)
+      if key in self.summaries:
+        ordered[key] = self.summaries[key]
+    for i in self.summaries:
+      if i not in ordered:
+        ordered[i] = self.summaries[i]
+    self.summaries = ordered
@@ -23,6 +23,7 @@
 
 
 import os
+import json
 import time
 import logging
 import logging.config
@@ -31,9 +32,53 @@ import logging.config
 import entrezpy.log.conf
 
 
-CONFIG = {'level':'INFO', 'quiet':True, 'propagate':True}
+CONFIG = {'level':'INFO', 'quiet':True, 'propagate':True, 'configured':False}
 """Store logger settings"""
 
+LOGGERS = {}
+"""Configured loggers by class, cleared when settings change"""
+
+
+def format_message(message):
+  """Formats a log message. Dictionaries are serialized as JSON.
+
+  :param message: log message
+  :type  message: str or dict
+  :rtype: str
+  """
+  if isinstance(message, str):
+    return message
+  return json.dumps(message, default=str)
+
+
+class StructuredLogger(logging.LoggerAdapter):
+  """StructuredLogger logs structured messages, i.e. dictionaries, serialized
+  as JSON only if the level is enabled. Messages which are expensive to
+  build, e.g. dumps of results, are passed as callables and are only called
+  if the level is enabled. Disabled levels cost a single level check:
+
+    logger.debug({'request':request.id})
+    logger.debug(lambda: {'init':self.dump()})
+
+  Enabled messages are built and serialized when logged, not when a handler
+  formats the record, i.e. buffering handlers like
+  :class:`logging.handlers.QueueHandler` log the state at the call.
+
+  :param logger: logger
+  :type  logger: :class:`logging.Logger`
+  """
+
+  def __init__(self, logger):
+    super().__init__(logger, None)
+
+  def log(self, level, msg, *args, **kwargs):
+    """Builds and logs a message if level is enabled"""
+    if self.logger.isEnabledFor(level):
+      if callable(msg):
+        msg = msg()
+      self.logger.log(level, format_message(msg), *args, **kwargs)
+
+
 def get_root():
   """Returns the module root"""
   return 'entrezpy'
@@ -43,17 +88,36 @@ def resolve_class_namespace(cls):
   return f"{cls.__module__}.{cls.__qualname__}"
 
 def get_class_logger(cls):
-  """Prepares logger for given class """
-  logger = logging.getLogger(f"{cls.__module__}.{cls.__qualname__}")
+  """Prepares logger for given class. Handlers are configured only once and
+  loggers are reused until :func:`set_level` changes the settings.
+
+  :rtype: :class:`StructuredLogger`
+  """
+  if cls in LOGGERS:
+    return LOGGERS[cls]
+  LOGGERS[cls] = configure_class_logger(cls)
+  return LOGGERS[cls]
+
+def configure_class_logger(cls):
+  """Configures the logger for given class.
+
+  :rtype: :class:`StructuredLogger`
+  """
+  logger = logging.getLogger(resolve_class_namespace(cls))
   logger.propagate = CONFIG['propagate']
   if CONFIG['quiet'] is True:
-    logger.addHandler(logging.NullHandler())
-    return logger
-  logging.config.dictConfig(entrezpy.log.conf.default_config)
+    if not logger.handlers:
+      logger.addHandler(logging.NullHandler())
+    return StructuredLogger(logger)
+  if not CONFIG['configured']:
+    logging.config.dictConfig(entrezpy.log.conf.default_config)
+    CONFIG['configured'] = True
   logger.setLevel(CONFIG['level'])
-  return logger
+  return StructuredLogger(logger)
 
 def set_level(level):
   """Sets logging level for applications using entrezpy."""
   CONFIG['level'] = level
   CONFIG['quiet'] = False
+  CONFIG['configured'] = False
+  LOGGERS.clear()
@@ -0,0 +1,237 @@
+"""
+..
+  Copyright 2020 The University of Sydney
+  This file is part of entrezpy.
+
+  Entrezpy is free software: you can redistribute it and/or modify it under the
+  terms of the GNU Lesser General Public License as published by the Free
+  Software Foundation, either version 3 of the License, or (at your option) any
+  later version.
+
+  Entrezpy is distributed in the hope that it will be useful, but WITHOUT ANY
+  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+  A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with entrezpy.  If not, see <https://www.gnu.org/licenses/>.
+
+.. module:: entrezpy.registry
+  :synopsis: Exports class AnalyzerRegistry storing the analyzers of Conduit
+    queries with explicit release and spilling to disk.
+"""
+
+
+import os
+import gzip
+import pickle
+import hashlib
+import threading
+import collections
+
+import entrezpy.log.logger
+
+
+class AnalyzerRegistry:
+  """AnalyzerRegistry stores the analyzers of :class:`entrezpy.conduit.Conduit`
+  queries by query id and is used like a dictionary. Analyzers are kept until
+  they are released with :meth:`.release`. A query retains the analyzer of
+  its dependency with :meth:`.retain` until it completed, and a retained
+  analyzer released meanwhile is only removed once the last retaining query
+  called :meth:`.unretain`.
+
+  If `spill_dir` is set, at most `max_analyzers` analyzers are kept in
+  memory. Analyzers of completed queries, see :meth:`.complete`, which are
+  not retained are spilled least recently used first, i.e. pickled and gzip
+  compressed into `spill_dir`, and reloaded when accessed, e.g. by
+  :meth:`entrezpy.conduit.Conduit.get_result`. Analyzers which cannot be
+  pickled stay in memory.
+
+  :param int max_analyzers: maximum number of analyzers in memory if
+    spilling
+  :param str spill_dir: directory for spilled analyzers, spilling is
+    disabled if None
+  """
+
+  def __init__(self, max_analyzers=64, spill_dir=None):
+    self.max_analyzers = max_analyzers
+    self.spill_dir = spill_dir
+    self.analyzers = collections.OrderedDict()
+    self.spilled = {}
+    self.completed = set()
+    self.unpicklable = set()
+    self.retained = collections.Counter()
+    self.released = set()
+    self.spills = 0
+    self.reloads = 0
+    self.lock = threading.RLock()
+    self.logger = entrezpy.log.logger.get_class_logger(AnalyzerRegistry)
+    if self.spill_dir is not None:
+      os.makedirs(self.spill_dir, exist_ok=True)
+
+  def __setitem__(self, query_id, analyzer):
+    with self.lock:
+      self.remove_spilled(query_id)
+      self.completed.discard(query_id)
+      self.unpicklable.discard(query_id)
+      self.analyzers[query_id] = analyzer
+      self.analyzers.move_to_end(query_id)
+
+  def __getitem__(self, query_id):
+    with self.lock:
+      if query_id in self.analyzers:
+        self.analyzers.move_to_end(query_id)
+        return self.analyzers[query_id]
+      if query_id not in self.spilled:
+        raise KeyError(query_id)
+      with gzip.open(self.spilled[query_id], 'rb') as fh:
+        analyzer = pickle.load(fh)
+      self.reloads += 1
+      self.analyzers[query_id] = analyzer
+      self.spill()
+      return analyzer
+
+  def __delitem__(self, query_id):
+    if not self.drop(query_id):
+      raise KeyError(query_id)
+
+  def __contains__(self, query_id):
+    return query_id in self.analyzers or query_id in self.spilled
+
+  def __len__(self):
+    with self.lock:
+      return len(self.analyzers) + len(set(self.spilled) - set(self.analyzers))
+
+  def __iter__(self):
+    with self.lock:
+      return iter(list(self.analyzers) + [x for x in self.spilled if x not in self.analyzers])
+
+  def get(self, query_id, default=None):
+    """Returns the analyzer of a query, reloaded if spilled, or `default`
+
+    :param str query_id: query id
+    :rtype: :class:`entrezpy.base.analyzer.EutilsAnalyzer`
+    """
+    try:
+      return self[query_id]
+    except KeyError:
+      return default
+
+  def complete(self, query_id):
+    """Marks the analyzer of a query as complete, i.e. it is no longer
+    updated by its query and can be spilled
+
+    :param str query_id: query id
+    """
+    with self.lock:
+      if query_id in self:
+        self.completed.add(query_id)
+        self.spill()
+
+  def retain(self, query_id):
+    """Retains the analyzer of a query needed by a pending query
+
+    :param str query_id: query id
+    """
+    with self.lock:
+      self.retained[query_id] += 1
+
+  def unretain(self, query_id):
+    """Removes one retention and removes a released analyzer once it is no
+    longer retained
+
+    :param str query_id: query id
+    """
+    with self.lock:
+      self.retained[query_id] -= 1
+      if self.retained[query_id] > 0:
+        return
+      del self.retained[query_id]
+      if query_id in self.released:
+        self.drop(query_id)
+      else:
+        self.spill()
+
+  def release(self, query_id):
+    """Releases the analyzer of a query. Retained analyzers are removed once
+    the last retaining query completed.
+
+    :param str query_id: query id
+    :return: True if the analyzer was removed
+    :rtype: bool
+    """
+    with self.lock:
+      if self.retained[query_id] > 0:
+        self.released.add(query_id)
+        return False
+      return self.drop(query_id)
+
+  def drop(self, query_id):
+    """Removes the analyzer of a query from memory and disk
+
+    :param str query_id: query id
+    :return: True if the analyzer was stored
+    :rtype: bool
+    """
+    with self.lock:
+      isStored = query_id in self
+      self.analyzers.pop(query_id, None)
+      self.remove_spilled(query_id)
+      self.completed.discard(query_id)
+      self.unpicklable.discard(query_id)
+      self.released.discard(query_id)
+      self.retained.pop(query_id, None)
+      return isStored
+
+  def remove_spilled(self, query_id):
+    """Removes the spilled analyzer of a query
+
+    :param str query_id: query id
+    """
+    path = self.spilled.pop(query_id, None)
+    if path is not None and os.path.exists(path):
+      os.remove(path)
+
+  def spill(self):
+    """Spills the least recently used analyzers of completed and not
+    retained queries until at most :attr:`max_analyzers` are in memory"""
+    if self.spill_dir is None:
+      return
+    candidates = [x for x in self.analyzers if x in self.completed and x not in self.retained
+                  and x not in self.unpicklable]
+    for query_id in candidates:
+      if len(self.analyzers) <= self.max_analyzers:
+        return
+      if query_id not in self.spilled and not self.write(query_id):
+        continue
+      del self.analyzers[query_id]
+
+  def write(self, query_id):
+    """Writes the analyzer of a query to :attr:`spill_dir`
+
+    :param str query_id: query id
+    :return: True if the analyzer was written
+    :rtype: bool
+    """
+    name = hashlib.sha256(query_id.encode('utf-8')).hexdigest() + '.pickle.gz'
+    path = os.path.join(self.spill_dir, name)
+    try:
+      with gzip.open(path, 'wb', compresslevel=1) as fh:
+        pickle.dump(self.analyzers[query_id], fh, protocol=pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, TypeError, AttributeError) as err:
+      self.logger.debug({'query':query_id, 'not spilled':str(err)})
+      self.unpicklable.add(query_id)
+      if os.path.exists(path):
+        os.remove(path)
+      return False
+    self.spilled[query_id] = path
+    self.spills += 1
+    return True
+
+  def dump(self):
+    """:rtype: dict"""
+    with self.lock:
+      return {'analyzers':len(self), 'in_memory':len(self.analyzers),
+              'spilled':len(self.spilled), 'retained':len(self.retained),
+              'released':len(self.released), 'spills':self.spills,
+              'reloads':self.reloads, 'max_analyzers':self.max_analyzers,
+              'spill_dir':self.spill_dir}
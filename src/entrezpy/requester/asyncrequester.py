@@ -0,0 +1,450 @@
+"""
+..
+  Copyright 2020 The University of Sydney
+  This file is part of entrezpy.
+
+  Entrezpy is free software: you can redistribute it and/or modify it under the
+  terms of the GNU Lesser General Public License as published by the Free
+  Software Foundation, either version 3 of the License, or (at your option) any
+  later version.
+
+  Entrezpy is distributed in the hope that it will be useful, but WITHOUT ANY
+  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+  A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with entrezpy.  If not, see <https://www.gnu.org/licenses/>.
+
+.. module:: entrezpy.requester.asyncrequester
+  :synopsis: Exports class AsyncRequester handling HTTP requests for entrezpy
+    on an asyncio event loop.
+"""
+
+
+import sys
+import ssl
+import time
+import zlib
+import asyncio
+import weakref
+import http.client
+import urllib.error
+import urllib.parse
+
+import entrezpy.requester.ratelimiter
+import entrezpy.requester.concurrency
+import entrezpy.requester.hedging
+import entrezpy.requester.responsestream
+import entrezpy.requester.retrypolicy
+import entrezpy.requester.singleflight
+import entrezpy.log.logger
+
+
+class AsyncRequester:
+  """AsyncRequester sends HTTP POST requests using :mod:`asyncio` streams and
+  implements the same retry and timeout handling as
+  :class:`entrezpy.requester.requester.Requester`. Many requests can be in
+  flight on one event loop. They are admitted by the shared
+  :class:`entrezpy.requester.ratelimiter.RateLimiter` without blocking the
+  loop.
+
+  Responses are requested with gzip or deflate content encoding and are
+  decompressed before parsing. Connections use HTTP/1.1 keep-alive. Idle connections are stored per event
+  loop and host and reused by later requests, including requests from other
+  queries on the same loop.
+
+  :param float wait: minimum time in seconds between requests if no rate
+    limiter is given
+  :param int max_retries: number of rertries before giving up.
+  :param int init_timeout: number of seconds before the initial request is
+    considered a timeout error
+  :param int timeout_max: maximum requet timeout before giving up
+  :param int timeout_steps: increase value for timeout errors
+  :param ratelimiter: shared rate limiter
+  :type  ratelimiter: :class:`entrezpy.requester.ratelimiter.RateLimiter`
+  :param cache: response cache looked up before the rate limiter
+  :type  cache: :class:`entrezpy.requester.cache.ResponseCache`
+  :param cache_stats: cache statistics of the query using this requester
+  :type  cache_stats: :class:`entrezpy.requester.cache.CacheStats`
+  :param cassette: cassette recording all tries or replaying responses
+    instead of sending requests
+  :type  cassette: :class:`entrezpy.requester.cassette.Cassette`
+  :param retry_policy: backoff, retry limits and circuit breakers, default is
+    a policy with `max_retries`
+  :type  retry_policy: :class:`entrezpy.requester.retrypolicy.RetryPolicy`
+  :param concurrency: adaptive limit of tries in flight for the API key
+  :type  concurrency: :class:`entrezpy.requester.concurrency.ConcurrencyController`
+  :param hedge_policy: hedging of small idempotent requests, disabled if None
+  :type  hedge_policy: :class:`entrezpy.requester.hedging.HedgePolicy`
+  :param single_flight: coalescing of identical requests in flight, disabled
+    if None or with a cassette
+  :type  single_flight: :class:`entrezpy.requester.singleflight.SingleFlight`
+  """
+
+  idle_connections = weakref.WeakKeyDictionary()
+  """Idle connections by event loop and host"""
+
+  ssl_context = ssl.create_default_context()
+
+  slot_poll = 0.01
+  """Seconds between polls for a free concurrency slot"""
+
+  def __init__(self, wait, max_retries=20, init_timeout=90, timeout_max=180,
+               timeout_step=5, ratelimiter=None, cache=None, cache_stats=None,
+               cassette=None, retry_policy=None, concurrency=None, hedge_policy=None,
+               single_flight=None):
+    self.wait = wait
+    self.retry_policy = retry_policy
+    if self.retry_policy is None:
+      self.retry_policy = entrezpy.requester.retrypolicy.RetryPolicy(max_retries)
+    self.max_retries = self.retry_policy.max_retries
+    self.concurrency = concurrency
+    self.hedge_policy = hedge_policy
+    self.single_flight = single_flight
+    self.init_timeout = init_timeout
+    self.timeout_max = timeout_max
+    self.timeout_step = timeout_step
+    self.ratelimiter = ratelimiter
+    if self.ratelimiter is None:
+      self.ratelimiter = entrezpy.requester.ratelimiter.RateLimiter(1/self.wait)
+    self.cache = cache
+    self.cache_stats = cache_stats
+    self.cassette = cassette
+    self.logger = entrezpy.log.logger.get_class_logger(AsyncRequester)
+
+  async def request(self, req):
+    """Request the request. With :attr:`single_flight`, requests identical
+    to a request in flight wait for its response instead of being sent.
+
+    :param req: entrezpy request
+    :type  req: :class:`entrezpy.base.request.EutilsRequest`
+    :return: decoded response or None if the request failed
+    :rtype: str or None
+    """
+    parameter = req.get_post_parameter()
+    if self.single_flight is None or self.cassette is not None or \
+       not self.single_flight.isCoalescable(req, parameter):
+      return await self.send(req, parameter)
+    return await self.single_flight.acall(req, parameter, self.send, req, parameter)
+
+  async def send(self, req, parameter):
+    """Sends a request, retrying failed tries, unless its response is cached
+    or replayed
+
+    :param req: entrezpy request
+    :type  req: :class:`entrezpy.base.request.EutilsRequest`
+    :param dict parameter: POST parameters
+    :return: decoded response or None if the request failed
+    :rtype: str or None
+    """
+    retries = 0
+    req_timeout = self.init_timeout
+    data = urllib.parse.urlencode(parameter, doseq=req.doseq).encode('utf-8')
+    req.qry_url = data.decode()
+    if self.cassette is not None and self.cassette.isReplaying():
+      tries = self.cassette.take(req, parameter)
+      await asyncio.sleep(self.cassette.delay(tries))
+      return self.cassette.respond(req, tries)
+    cache_key = None
+    if self.cache is not None:
+      cache_key, body = self.cache.lookup(req, parameter, self.cache_stats)
+      if body is not None:
+        req.set_status_success()
+        req.set_transfer_size(0, len(body))
+        req.cached = True
+        if self.cassette is not None:
+          self.cassette.record_try(req, parameter, 200, None, body, time.time(), 0)
+        return body.decode('utf-8')
+    isHedged = self.hedge_policy is not None and self.cassette is None and \
+               self.hedge_policy.isHedgeable(req, parameter)
+    breaker = self.retry_policy.get_breaker(req.url)
+    while retries < self.max_retries:
+      retry_after = None
+      outcome = entrezpy.requester.concurrency.ConcurrencyController.overload
+      if breaker is not None:
+        wait = breaker.admit()
+        while wait > 0:
+          await asyncio.sleep(wait)
+          wait = breaker.admit()
+      if self.concurrency is not None:
+        while not self.concurrency.try_acquire():
+          await asyncio.sleep(AsyncRequester.slot_poll)
+      await asyncio.sleep(self.ratelimiter.reserve())
+      start = time.monotonic()
+      try:
+        self.logger.debug({'request':{'qry-url':req.qry_url,
+                                      'req-id':req.id,
+                                      'req-query':req.query_id,
+                                      'req-url':req.url,
+                                      'try' : retries}})
+        req.set_status_success()
+        if isHedged:
+          response = await self.hedged_post(req, parameter, data, req_timeout)
+        else:
+          response = await self.record_post(req, parameter, data, req_timeout)
+        if cache_key is not None:
+          self.cache.store(cache_key, response, self.cache_stats)
+      except urllib.error.HTTPError as http_err:
+        log_msg = {'code' : http_err.code, 'reason' : http_err.reason}
+        req.set_request_error(http_err.reason)
+        if http_err.code == 400: # Bad request form, stop right now
+          log_msg.update({'action':'abort'})
+          self.record_try(breaker, start,
+                          entrezpy.requester.concurrency.ConcurrencyController.neutral)
+          sys.exit(self.logger.error({'HTTP-error':log_msg}))
+        retry_after = self.retry_policy.get_retry_after(http_err)
+        if http_err.code < 500 and http_err.code != 429:
+          outcome = entrezpy.requester.concurrency.ConcurrencyController.neutral
+        log_msg.update({'action' : 'retry', 'retry-after':retry_after})
+        self.logger.warning({'HTTP-error':log_msg})
+        retries += 1
+      except asyncio.TimeoutError:
+        req_timeout += self.timeout_step
+        self.logger.warning({'timeout':{'action':'retry'}})
+        retries += 1
+        if req_timeout > self.timeout_max:
+          self.record_try(breaker, start,
+                          entrezpy.requester.concurrency.ConcurrencyController.overload)
+          self.logger.warning({'maxTimeout':{'action':'giving up request'}})
+          req.set_request_error("maxTimeout")
+          return None
+      except (http.client.HTTPException, asyncio.IncompleteReadError, ssl.SSLError,
+              zlib.error) as err:
+        self.logger.warning({type(err).__name__:{'action':'retry'}})
+        retries += 1
+      except OSError as os_err:
+        req.set_request_error("urllib.error.URLError")
+        self.logger.error({'urllib.error.URLError':{'error':str(os_err),
+                                                    'action':'retry'}})
+        retries += 1
+      else:
+        self.record_try(breaker, start,
+                        entrezpy.requester.concurrency.ConcurrencyController.success)
+        return response.decode('utf-8')
+      self.record_try(breaker, start, outcome)
+      if retries < self.max_retries:
+        if not self.spend_retry(req):
+          return None
+        await asyncio.sleep(self.retry_policy.backoff(retries, retry_after))
+    self.logger.error({'maxRetry':{'action':'giving up request'}})
+    req.set_request_error("maxRetry")
+    return None
+
+  def record_try(self, breaker, start, outcome):
+    """Reports a try to the circuit breaker and the concurrency controller,
+    see :meth:`entrezpy.requester.requester.Requester.record_try`"""
+    if self.concurrency is not None:
+      self.concurrency.release(start, outcome)
+    if breaker is None:
+      return
+    if outcome == entrezpy.requester.concurrency.ConcurrencyController.overload:
+      breaker.record_failure()
+    else:
+      breaker.record_success()
+
+  def spend_retry(self, req):
+    """Spends one retry from the budget of the query of a request, see
+    :meth:`entrezpy.requester.requester.Requester.spend_retry`
+
+    :rtype: bool
+    """
+    if req.retry_budget is None or req.retry_budget.spend():
+      return True
+    self.logger.error({'retryBudget':{'action':'giving up request', 'query':req.query_id,
+                                      'budget':req.retry_budget.dump()}})
+    req.set_request_error("retryBudget")
+    return False
+
+  async def hedged_post(self, req, parameter, data, timeout):
+    """Sends one try of a hedged request and a duplicate try if no response
+    arrived within the hedge delay, see
+    :meth:`entrezpy.requester.requester.Requester.hedged_post`. The losing
+    try is cancelled, which closes its connection. The duplicate try takes a
+    slot of the concurrency controller, if any, and is not sent if none is
+    free.
+
+    :return: decompressed response body
+    :rtype: bytes
+    :raises: error of the first try if both tries failed
+    """
+    starts = {}
+    primary = asyncio.ensure_future(self.record_post(req, parameter, data, timeout))
+    starts[primary] = time.monotonic()
+    await asyncio.wait([primary], timeout=self.hedge_policy.get_delay(req.eutil))
+    hedge = None
+    if not primary.done() and (self.concurrency is None or self.concurrency.try_acquire()):
+      await asyncio.sleep(self.ratelimiter.reserve())
+      if not primary.done():
+        hedge = asyncio.ensure_future(self.record_post(req, parameter, data, timeout))
+        starts[hedge] = time.monotonic()
+        self.hedge_policy.count(hedged=1)
+        self.logger.debug(lambda: {'hedge':{'req-id':req.id, 'req-query':req.query_id,
+                                            'delay':self.hedge_policy.get_delay(req.eutil)}})
+      elif self.concurrency is not None:
+        self.concurrency.release(time.monotonic(),
+                                 entrezpy.requester.concurrency.ConcurrencyController.neutral)
+    pending = set(starts)
+    winner = None
+    try:
+      while pending and winner is None:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for i in done:
+          if winner is None and i.exception() is None:
+            winner = i
+    finally:
+      for i in pending:
+        i.cancel()
+      if hedge is not None and self.concurrency is not None:
+        outcome = entrezpy.requester.concurrency.ConcurrencyController.neutral
+        if hedge.done() and not hedge.cancelled():
+          outcome = entrezpy.requester.concurrency.ConcurrencyController.get_outcome(
+            hedge.exception())
+        self.concurrency.release(starts[hedge], outcome)
+    self.hedge_policy.count(wins=int(winner is not None and winner is not primary),
+                            cancelled=len(pending))
+    if winner is None:
+      return primary.result()
+    self.hedge_policy.record_latency(req.eutil, time.monotonic()-starts[winner])
+    return winner.result()
+
+  async def record_post(self, req, parameter, data, timeout):
+    """Sends one try of a request, decompresses the response and records
+    the try if a recording :attr:`cassette` is set.
+
+    :param req: entrezpy request
+    :type  req: :class:`entrezpy.base.request.EutilsRequest`
+    :param dict parameter: POST parameters
+    :param bytes data: urlencoded POST parameters
+    :param float timeout: request timeout
+    :return: decompressed response body
+    :rtype: bytes
+    """
+    start = time.time()
+    try:
+      body, headers = await asyncio.wait_for(self.post(req.url, data), timeout)
+      decoder = entrezpy.requester.responsestream.ContentDecoder(headers.get('Content-Encoding'))
+      response = decoder.decode(body) + decoder.flush()
+      req.set_transfer_size(decoder.bytes_in, decoder.bytes_out)
+    except urllib.error.HTTPError as http_err:
+      if self.cassette is not None:
+        self.cassette.record_try(req, parameter, http_err.code, http_err.headers, None,
+                                 start, time.time()-start, http_err.reason)
+      raise
+    except Exception as err:
+      if self.cassette is not None:
+        self.cassette.record_try(req, parameter, None, None, None, start,
+                                 time.time()-start, type(err).__name__)
+      raise
+    if self.cassette is not None:
+      self.cassette.record_try(req, parameter, 200, headers, response, start, time.time()-start)
+    return response
+
+  async def post(self, url, data):
+    """Sends one POST request. A reused connection closed by the server is
+    reopened once.
+
+    :param str url: request URL
+    :param bytes data: urlencoded POST data
+    :return: encoded response body and response headers
+    :rtype: tuple(bytes, :class:`http.client.HTTPMessage`)
+    :raises urllib.error.HTTPError: if response status is not 200
+    """
+    url_parts = urllib.parse.urlsplit(url)
+    host = (url_parts.scheme, url_parts.hostname, url_parts.port)
+    reader, writer = self.get_idle_connection(host)
+    if reader is None:
+      return await self.exchange(host, url, url_parts, data, *(await self.connect(host)))
+    try:
+      return await self.exchange(host, url, url_parts, data, reader, writer)
+    except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError,
+            asyncio.IncompleteReadError) as err:
+      self.logger.debug({'reconnect':{'host':url_parts.netloc, 'error':type(err).__name__}})
+    return await self.exchange(host, url, url_parts, data, *(await self.connect(host)))
+
+  async def connect(self, host):
+    """Opens a new connection to host
+
+    :param tuple host: scheme, hostname and port
+    :rtype: tuple(:class:`asyncio.StreamReader`, :class:`asyncio.StreamWriter`)
+    """
+    scheme, hostname, port = host
+    if scheme == 'https':
+      return await asyncio.open_connection(hostname, port if port else 443,
+                                           ssl=AsyncRequester.ssl_context)
+    return await asyncio.open_connection(hostname, port if port else 80)
+
+  def get_idle_connection(self, host):
+    """Returns an idle connection to host on the running loop or (None, None)"""
+    loop_connections = AsyncRequester.idle_connections.get(asyncio.get_running_loop(), {})
+    connections = loop_connections.get(host, [])
+    while connections:
+      reader, writer = connections.pop()
+      if not writer.is_closing() and not reader.at_eof():
+        return reader, writer
+      writer.close()
+    return None, None
+
+  def release_connection(self, host, reader, writer):
+    """Stores an idle connection for reuse"""
+    loop_connections = AsyncRequester.idle_connections.setdefault(asyncio.get_running_loop(), {})
+    loop_connections.setdefault(host, []).append((reader, writer))
+
+  async def exchange(self, host, url, url_parts, data, reader, writer):
+    """Writes a POST request and reads the response from one connection.
+
+    :return: encoded response body and response headers
+    :rtype: tuple(bytes, :class:`http.client.HTTPMessage`)
+    """
+    try:
+      path = url_parts.path if url_parts.path else '/'
+      writer.write('\r\n'.join(['POST {} HTTP/1.1'.format(path),
+                                'Host: {}'.format(url_parts.netloc),
+                                'User-Agent: entrezpy',
+                                'Accept-Encoding: {}'.format(entrezpy.requester.responsestream.ContentDecoder.encodings),
+                                'Content-Type: application/x-www-form-urlencoded',
+                                'Content-Length: {}'.format(len(data)),
+                                'Connection: keep-alive', '', '']).encode('latin-1') + data)
+      await writer.drain()
+      status_line = await reader.readline()
+      if not status_line:
+        raise http.client.RemoteDisconnected('Remote end closed connection without response')
+      version, status, reason = (status_line.decode('latin-1').rstrip('\r\n').split(' ', 2) + [''])[:3]
+      headers = http.client.HTTPMessage()
+      while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+          break
+        name, value = line.decode('latin-1').split(':', 1)
+        headers[name.strip()] = value.strip()
+      body = await self.read_body(reader, headers)
+    except BaseException:
+      writer.close()
+      raise
+    if version == 'HTTP/1.0' or headers.get('Connection', '').lower() == 'close':
+      writer.close()
+    else:
+      self.release_connection(host, reader, writer)
+    if int(status) != 200:
+      raise urllib.error.HTTPError(url, int(status), reason, headers, None)
+    return body, headers
+
+  async def read_body(self, reader, headers):
+    """Reads a response body with fixed length, chunked encoding or until the
+    server closes the connection.
+
+    :rtype: bytes
+    """
+    if headers.get('Transfer-Encoding', '').lower() == 'chunked':
+      chunks = []
+      while True:
+        size = int((await reader.readline()).split(b';', 1)[0], 16)
+        if size == 0:
+          while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+            pass
+          return b''.join(chunks)
+        chunks.append(await reader.readexactly(size))
+        await reader.readexactly(2)
+    if 'Content-Length' in headers:
+      return await reader.readexactly(int(headers['Content-Length']))
+    headers['Connection'] = 'close'
+    return await reader.read()
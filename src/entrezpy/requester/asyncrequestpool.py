@@ -0,0 +1,99 @@
+"""
+..
+  Copyright 2020 The University of Sydney
+
+.. module:: entrezpy.requester.asyncrequestpool
+  :synopsis: Exports class AsyncRequestPool running entrezpy requests on an
+    asyncio event loop.
+"""
+
+
+import asyncio
+
+import entrezpy.requester.journal
+import entrezpy.log.logger
+
+
+class AsyncRequestPool:
+  """AsyncRequestPool is the :mod:`asyncio` counterpart of
+  :class:`entrezpy.requester.requestpool.RequestPool`. Added requests are
+  stored as **tuple**\\ (`request`, `analyzer`) and sent concurrently by
+  :meth:`.drain`. Responses are parsed on the event loop as they arrive,
+  i.e. analyzers need no locks. The number of concurrent requests is only
+  limited by :attr:`max_inflight` and the rate limiter of the requester.
+
+  :param reference failed_requests:
+    :attr:`entrezpy.base.query.EutilsQuery.failed_requests`
+  :param monitor: query monitor
+  :type  monitor: :class:`entrezpy.requester.monitor.QueryMonitor`
+  :param requester: asynchronous requester
+  :type  requester: :class:`entrezpy.requester.asyncrequester.AsyncRequester`
+  :param int max_inflight: maximum number of concurrent requests
+  """
+
+  def __init__(self, failed_requests, monitor, requester, max_inflight=100):
+    self.requests = []
+    self.failed_requests = failed_requests
+    self.monitor = monitor
+    self.requester = requester
+    self.max_inflight = max_inflight
+    self.logger = entrezpy.log.logger.get_class_logger(AsyncRequestPool)
+
+  def add_request(self, request, analyzer):
+    """Adds one request into the pool as **tuple**\\ (`request`, `analzyer`).
+
+    :param  request: entrezpy request instance
+    :type   request: :class:`entrezpy.base.request.EutilsRequest`
+    :param analyzer: entrezpy analyzer instance
+    :type  analyzer: :class:`entrezpy.base.analyzer.EutilsAnalyzer`
+    """
+    self.requests.append((request, analyzer))
+
+  async def drain(self):
+    """Sends all added requests and waits until they are parsed"""
+    requests = self.requests
+    self.requests = []
+    self.logger.debug(lambda: {'draining async request pool':len(requests)})
+    inflight = asyncio.Semaphore(self.max_inflight)
+    await asyncio.gather(*[self.run_one_request(i, j, inflight) for i, j in requests])
+
+  async def run_one_request(self, request, analyzer, inflight):
+    """
+    Sends one request, parses its response and logs its progress.
+
+    :param request: single entrezpy request
+    :type  request: :class:`entrezpy.base.request.EutilsRequest`
+    :param analyzer: entrezpy analyzer instance
+    :type  analyzer: :class:`entrezpy.base.analyzer.EutilsAnalyzer`
+    :param inflight: semaphore limiting concurrent requests
+    :type  inflight: :class:`asyncio.Semaphore`
+    """
+    o = self.monitor.get_observer(request.query_id)
+    try:
+      async with inflight:
+        request.start_stopwatch()
+        o.observe(request)
+        response = await self.requester.request(request)
+        request.calc_duration()
+      if response:
+        analyzer.parse(response, request)
+        entrezpy.requester.journal.record_request(analyzer, request)
+      else:
+        self.failed_requests.append(request)
+    except Exception as err:
+      self.logger.error({'query':request.query_id, 'request':request.id, 'failed':repr(err)})
+      self.fail_request(request, err)
+    finally:
+      o.complete(request)
+
+  def fail_request(self, request, err):
+    """Marks a request as failed after an error, e.g. a failing analyzer,
+    and stores it in the failed requests of the query.
+
+    :param request: entrezpy request
+    :type  request: :class:`entrezpy.base.request.EutilsRequest`
+    :param err: error raised while sending or parsing the request
+    :type  err: Exception
+    """
+    request.set_request_error(repr(err))
+    self.failed_requests.append(request)
@@ -0,0 +1,379 @@
+"""
+..
+  Copyright 2020 The University of Sydney
+  This file is part of entrezpy.
+
+  Entrezpy is free software: you can redistribute it and/or modify it under the
+  terms of the GNU Lesser General Public License as published by the Free
+  Software Foundation, either version 3 of the License, or (at your option) any
+  later version.
+
+  Entrezpy is distributed in the hope that it will be useful, but WITHOUT ANY
+  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+  A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with entrezpy.  If not, see <https://www.gnu.org/licenses/>.
+
+.. module:: entrezpy.requester.cache
+  :synopsis: Exports class ResponseCache storing E-Utility responses on disk,
+    its base class BaseResponseCache and class CacheStats counting cache
+    usage.
+"""
+
+
+import os
+import gzip
+import time
+import threading
+import tempfile
+
+import entrezpy.base.request
+import entrezpy.log.logger
+
+
+class CacheStats:
+  """CacheStats counts cache lookups of one query or of a whole cache.
+
+  :ivar int hits: responses served from the cache
+  :ivar int misses: cacheable responses not in the cache or expired
+  :ivar int bypassed: requests not looked up, e.g. using WebEnv
+  :ivar int stored: responses written into the cache
+  :ivar int bytes_read: decompressed bytes served from the cache
+  :ivar int bytes_written: compressed bytes written into the cache
+  """
+
+  def __init__(self):
+    self.hits = 0
+    self.misses = 0
+    self.bypassed = 0
+    self.stored = 0
+    self.bytes_read = 0
+    self.bytes_written = 0
+    self.lock = threading.Lock()
+
+  def count(self, counter, nbytes=0):
+    """Increases a counter and its byte counter
+
+    :param str counter: hits, misses, bypassed or stored
+    :param int nbytes: read bytes for hits, written bytes for stored
+    """
+    with self.lock:
+      setattr(self, counter, getattr(self, counter) + 1)
+      if counter == 'hits':
+        self.bytes_read += nbytes
+      if counter == 'stored':
+        self.bytes_written += nbytes
+
+  def hit_rate(self):
+    """Returns the fraction of cacheable requests served from the cache
+
+    :rtype: float
+    """
+    if self.hits + self.misses == 0:
+      return 0.0
+    return self.hits / (self.hits + self.misses)
+
+  def dump(self):
+    """:rtype: dict"""
+    return {'hits':self.hits, 'misses':self.misses, 'bypassed':self.bypassed,
+            'stored':self.stored, 'bytes_read':self.bytes_read,
+            'bytes_written':self.bytes_written, 'hit_rate':self.hit_rate()}
+
+
+class BaseResponseCache:
+  """BaseResponseCache implements the lookup of responses for requests
+  shared by all response caches. It decides which requests are cacheable
+  and which responses are storable and counts lookups. Subclasses implement
+  the storage in :meth:`get` and :meth:`put`.
+
+  Responses expire after the time to live of their E-Utility in `ttl`.
+  E-Utilities with a time to live of 0, e.g. epost, are never cached.
+  Requests depending on the Entrez history server, i.e. using WebEnv or
+  storing results on it, see
+  :meth:`entrezpy.base.request.EutilsRequest.isHistoryStoring`, are bypassed
+  if `bypass_history` is set because WebEnvs expire at NCBI. Responses are
+  keyed by URL, i.e. responses of a stand-in server are not served for
+  NCBI requests.
+
+  :param dict ttl: time to live in seconds by E-Utility, updating
+    :attr:`default_ttl`
+  :param bool bypass_history: do not cache requests using the history server
+  :ivar stats: usage of this cache by all queries
+  :type stats: :class:`CacheStats`
+  """
+
+  default_ttl = {'esearch.fcgi':86400, 'esummary.fcgi':604800, 'efetch.fcgi':604800,
+                 'elink.fcgi':604800, 'epost.fcgi':0}
+  """Default time to live in seconds by E-Utility"""
+
+  error_markers = (b'"ERROR"', b'<ERROR>', b'<ERROR/>')
+  """Markers of E-Utility error messages in responses with HTTP status 200"""
+
+  def __init__(self, ttl=None, bypass_history=True):
+    self.ttl = dict(BaseResponseCache.default_ttl, **(ttl if ttl else {}))
+    self.bypass_history = bypass_history
+    self.stats = CacheStats()
+
+  def get(self, key, eutil):
+    """Virtual function returning a cached response body or None if not
+    cached or expired.
+
+    :param str key: cache key
+    :param str eutil: E-Utility of the request
+    :rtype: bytes or None
+    """
+    raise NotImplementedError("{} requires get() implementation".format(__name__))
+
+  def put(self, key, body):
+    """Virtual function storing a response body.
+
+    :param str key: cache key
+    :param bytes body: response body
+    :return: number of stored bytes
+    :rtype: int
+    """
+    raise NotImplementedError("{} requires put() implementation".format(__name__))
+
+  def isExpired(self, eutil, age):
+    """Tests if a response of an E-Utility has expired
+
+    :param str eutil: E-Utility
+    :param float age: age of the response in seconds
+    :rtype: bool
+    """
+    return age > self.ttl.get(eutil, 0)
+
+  def isCacheable(self, eutil, parameter):
+    """Tests if the response of a request can be cached
+
+    :param str eutil: E-Utility, e.g. esummary.fcgi
+    :param dict parameter: POST parameters
+    :rtype: bool
+    """
+    if self.ttl.get(eutil, 0) <= 0:
+      return False
+    if self.bypass_history and ('WebEnv' in parameter or
+                                entrezpy.base.request.EutilsRequest.isHistoryStoring(eutil,
+                                                                                    parameter)):
+      return False
+    return True
+
+  def isStorable(self, body):
+    """Tests if a response body can be stored. E-Utilities report some
+    errors, e.g. backend failures, in responses with HTTP status 200. These
+    are transient and not stored. Only the start and end of a body are
+    inspected.
+
+    :param bytes body: response body
+    :rtype: bool
+    """
+    for i in (body[:1024], body[-1024:]):
+      for j in BaseResponseCache.error_markers:
+        if j in i:
+          return False
+    return True
+
+  def lookup(self, request, parameter, stats=None):
+    """Looks up the response for a request and counts the lookup in
+    :attr:`stats` and `stats`.
+
+    :param request: entrezpy request
+    :type  request: :class:`entrezpy.base.request.EutilsRequest`
+    :param dict parameter: POST parameters of the request
+    :param stats: statistics of the requesting query
+    :type  stats: :class:`CacheStats`
+    :return: cache key, or None if not cacheable, and the cached body or None
+    :rtype: tuple
+    """
+    if not self.isCacheable(request.eutil, parameter):
+      self.count(stats, 'bypassed')
+      return None, None
+    key = request.get_cache_key(parameter)
+    body = self.get(key, request.eutil)
+    if body is None:
+      self.count(stats, 'misses')
+      return key, None
+    self.count(stats, 'hits', len(body))
+    return key, body
+
+  def store(self, key, body, stats=None):
+    """Stores a response body after a cache miss if it is storable
+
+    :param str key: cache key from :meth:`lookup`
+    :param bytes body: response body
+    :param stats: statistics of the requesting query
+    :type  stats: :class:`CacheStats`
+    """
+    if key is None or not self.isStorable(body):
+      return
+    size = self.put(key, body)
+    if size:
+      self.count(stats, 'stored', size)
+
+  def count(self, stats, counter, nbytes=0):
+    """Counts in cache statistics and, if given, query statistics"""
+    self.stats.count(counter, nbytes)
+    if stats is not None:
+      stats.count(counter, nbytes)
+
+
+class ResponseCache(BaseResponseCache):
+  """ResponseCache stores response bodies of E-Utility requests on disk. It
+  is consulted by :class:`entrezpy.requester.requester.Requester` before a
+  request is sent, and cache hits do not pass the rate limiter. Set
+  :attr:`entrezpy.base.query.EutilsQuery.cache` to use one cache for all
+  queries:
+
+    entrezpy.base.query.EutilsQuery.cache = entrezpy.requester.cache.ResponseCache()
+
+  Responses are content addressed by
+  :meth:`entrezpy.base.request.EutilsRequest.get_cache_key`, i.e. the
+  normalized POST parameters without email, tool and api_key, and stored
+  gzip compressed in one file each. The modification time of a file is its
+  creation time and used for expiry, its access time is updated on every hit
+  and used for least recently used eviction once the cache exceeds
+  :attr:`max_bytes`. Expiry and bypassed requests are described in
+  :class:`BaseResponseCache`.
+
+  The cache can be shared by threads and processes. Files are written
+  atomically.
+
+  :param str directory: cache directory, default `$XDG_CACHE_HOME/entrezpy`
+  :param int max_bytes: maximum size of stored files
+  :param dict ttl: time to live in seconds by E-Utility
+  :param bool bypass_history: do not cache requests using the history server
+  """
+
+  suffix = '.gz'
+
+  def __init__(self, directory=None, max_bytes=1024**3, ttl=None, bypass_history=True):
+    super().__init__(ttl, bypass_history)
+    if directory is None:
+      directory = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+                               'entrezpy')
+    self.directory = os.path.expanduser(directory)
+    self.max_bytes = max_bytes
+    self.lock = threading.Lock()
+    self.logger = entrezpy.log.logger.get_class_logger(ResponseCache)
+    os.makedirs(self.directory, exist_ok=True)
+    self.size = sum(os.path.getsize(i) for i in self.list_files())
+    self.logger.debug(lambda: {'init':self.dump()})
+
+  def path(self, key):
+    """Returns the file storing the response for a key
+
+    :param str key: cache key
+    :rtype: str
+    """
+    return os.path.join(self.directory, key[:2], key + ResponseCache.suffix)
+
+  def get(self, key, eutil):
+    """Implements :meth:`BaseResponseCache.get`. Expired responses are
+    removed.
+
+    :param str key: cache key
+    :param str eutil: E-Utility of the request
+    :rtype: bytes or None
+    """
+    path = self.path(key)
+    try:
+      stat = os.stat(path)
+      if self.isExpired(eutil, time.time() - stat.st_mtime):
+        self.remove(path)
+        return None
+      with gzip.open(path, 'rb') as fh:
+        body = fh.read()
+      os.utime(path, (time.time(), stat.st_mtime))
+    except (OSError, EOFError):
+      return None
+    return body
+
+  def put(self, key, body):
+    """Implements :meth:`BaseResponseCache.put`. Evicts least recently
+    used responses if the cache exceeds :attr:`max_bytes`.
+
+    :param str key: cache key
+    :param bytes body: response body
+    :return: number of written bytes
+    :rtype: int
+    """
+    path = self.path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+      with os.fdopen(fd, 'wb') as fh:
+        fh.write(gzip.compress(body, compresslevel=6))
+      size = os.path.getsize(tmp)
+      replaced = os.path.getsize(path) if os.path.exists(path) else 0
+      os.replace(tmp, path)
+    except OSError as err:
+      self.logger.warning({'cache write':str(err), 'key':key})
+      if os.path.exists(tmp):
+        os.remove(tmp)
+      return 0
+    with self.lock:
+      self.size += size - replaced
+      isFull = self.size > self.max_bytes
+    if isFull:
+      self.evict()
+    return size
+
+  def remove(self, path):
+    """Removes one cached response"""
+    try:
+      size = os.path.getsize(path)
+      os.remove(path)
+    except OSError:
+      return
+    with self.lock:
+      self.size -= size
+
+  def list_files(self):
+    """Returns all cached response files
+
+    :rtype: list
+    """
+    files = []
+    for i in os.scandir(self.directory):
+      if i.is_dir():
+        files += [j.path for j in os.scandir(i.path) if j.name.endswith(ResponseCache.suffix)]
+    return files
+
+  def evict(self, target=0.9):
+    """Removes least recently used responses until the cache is below
+    `target` of :attr:`max_bytes`. The size is recounted from disk since
+    other processes can share the cache.
+
+    :param float target: fraction of :attr:`max_bytes` to keep
+    """
+    with self.lock:
+      files = []
+      for i in self.list_files():
+        try:
+          stat = os.stat(i)
+          files.append((stat.st_atime, stat.st_size, i))
+        except OSError:
+          continue
+      self.size = sum(i[1] for i in files)
+      evicted = 0
+      for _, size, path in sorted(files):
+        if self.size <= self.max_bytes * target:
+          break
+        try:
+          os.remove(path)
+        except OSError:
+          continue
+        self.size -= size
+        evicted += 1
+    self.logger.debug({'evicted':evicted, 'size':self.size})
+
+  def clear(self):
+    """Removes all cached responses"""
+    for i in self.list_files():
+      self.remove(i)
+
+  def dump(self):
+    """:rtype: dict"""
+    return {'directory':self.directory, 'size':self.size, 'max_bytes':self.max_bytes,
+            'ttl':self.ttl, 'bypass_history':self.bypass_history, 'stats':self.stats.dump()}
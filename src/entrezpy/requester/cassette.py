@@ -0,0 +1,241 @@
+"""
+..
+  Copyright 2020 The University of Sydney
+  This file is part of entrezpy.
+
+  Entrezpy is free software: you can redistribute it and/or modify it under the
+  terms of the GNU Lesser General Public License as published by the Free
+  Software Foundation, either version 3 of the License, or (at your option) any
+  later version.
+
+  Entrezpy is distributed in the hope that it will be useful, but WITHOUT ANY
+  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+  A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with entrezpy.  If not, see <https://www.gnu.org/licenses/>.
+
+.. module:: entrezpy.requester.cassette
+  :synopsis: Exports class Cassette recording E-Utility requests and responses
+    and replaying them without network access.
+"""
+
+
+import json
+import time
+import gzip
+import atexit
+import threading
+import collections
+
+import entrezpy.log.logger
+
+
+class Cassette:
+  """Cassette records every try of every request sent by
+  :class:`entrezpy.requester.requester.Requester` and
+  :class:`entrezpy.requester.asyncrequester.AsyncRequester`: E-Utility, POST
+  parameters, HTTP status, response headers, response body and timing. In
+  replay mode the requesters serve recorded responses instead of sending
+  requests. Set :attr:`entrezpy.base.query.EutilsQuery.cassette` to record
+  or replay all queries:
+
+    entrezpy.base.query.EutilsQuery.cassette = Cassette('run.cassette', Cassette.record)
+    ...
+    entrezpy.base.query.EutilsQuery.cassette = Cassette('run.cassette', Cassette.replay)
+
+  Requests are matched by
+  :meth:`entrezpy.base.request.EutilsRequest.get_cache_key` without URL,
+  i.e. the host, email, tool and api_key may differ between recording and
+  replay. Identical requests are
+  replayed in recorded order. A replayed request receives the response of
+  its first successful recorded try. A request without successful try fails
+  with the recorded error, and a request not in the cassette fails.
+
+  Replays are not rate limited. With timing `fast` responses are served
+  immediately, with timing `original` each response is served at its
+  recorded time relative to the first replayed request, reproducing the
+  inter-arrival times and latencies of the recording.
+
+  A cassette file is a gzip stream of one JSON header line per try, each
+  followed by the decompressed response body of the length given in the
+  header. Email, tool and api_key are not recorded. Recorded cassettes are
+  closed at exit.
+
+  :param str path: cassette file
+  :param str mode: :attr:`record` or :attr:`replay`
+  :param str timing: replay timing, `fast` or `original`
+  """
+
+  record = 'record'
+  replay = 'replay'
+  version = 1
+
+  def __init__(self, path, mode=replay, timing='fast'):
+    if mode not in (Cassette.record, Cassette.replay):
+      raise ValueError("Unknown cassette mode: {}".format(mode))
+    if timing not in ('fast', 'original'):
+      raise ValueError("Unknown cassette timing: {}".format(timing))
+    self.path = path
+    self.mode = mode
+    self.timing = timing
+    self.tracks = {}
+    self.recorded = 0
+    self.replayed = 0
+    self.unmatched = 0
+    self.origin = None
+    self.replay_start = None
+    self.fh = None
+    self.lock = threading.Lock()
+    self.logger = entrezpy.log.logger.get_class_logger(Cassette)
+    if self.isRecording():
+      self.fh = gzip.open(self.path, 'wb')
+      self.write_entry({'cassette':Cassette.version, 'created':time.time()})
+      atexit.register(self.close)
+    else:
+      self.load()
+    self.logger.debug(lambda: {'init':self.dump()})
+
+  def isRecording(self):
+    """:rtype: bool"""
+    return self.mode == Cassette.record
+
+  def isReplaying(self):
+    """:rtype: bool"""
+    return self.mode == Cassette.replay
+
+  def write_entry(self, header, body=b''):
+    """Writes one header line and body"""
+    header['length'] = len(body)
+    with self.lock:
+      self.fh.write(json.dumps(header, separators=(',', ':')).encode('utf-8') + b'\n')
+      self.fh.write(body)
+
+  def record_try(self, request, parameter, status, headers, body, start, elapsed, error=None):
+    """Records one try of a request
+
+    :param request: entrezpy request
+    :type  request: :class:`entrezpy.base.request.EutilsRequest`
+    :param dict parameter: POST parameters
+    :param int status: HTTP status or None if no response was received
+    :param headers: response headers
+    :type  headers: dict or :class:`http.client.HTTPMessage`
+    :param bytes body: decompressed response body
+    :param float start: start of the try in seconds since epoch
+    :param float elapsed: duration of the try in seconds
+    :param str error: error of a failed try
+    """
+    parameter = {k:v for k, v in parameter.items() if k not in request.uncached_parameters}
+    self.write_entry({'key':request.get_cache_key(parameter, False), 'eutil':request.eutil,
+                      'parameter':parameter, 'status':status,
+                      'headers':dict(headers.items()) if headers else {},
+                      'start':start, 'elapsed':elapsed, 'error':error,
+                      'bytes_received':request.bytes_received}, body if body else b'')
+    with self.lock:
+      self.recorded += 1
+
+  def load(self):
+    """Reads all tries from the cassette file into :attr:`tracks`, the tries
+    by request key in recorded order.
+    """
+    with gzip.open(self.path, 'rb') as fh:
+      header = json.loads(fh.readline())
+      if header.get('cassette') != Cassette.version:
+        raise ValueError("Unsupported cassette: {}".format(self.path))
+      for line in iter(fh.readline, b''):
+        entry = json.loads(line)
+        entry['body'] = fh.read(entry['length'])
+        if self.origin is None or entry['start'] < self.origin:
+          self.origin = entry['start']
+        self.tracks.setdefault(entry['key'], collections.deque()).append(entry)
+
+  def take(self, request, parameter):
+    """Takes the recorded tries of the next replay of a request, i.e. the
+    tries up to and including the first successful one.
+
+    :param request: entrezpy request
+    :type  request: :class:`entrezpy.base.request.EutilsRequest`
+    :param dict parameter: POST parameters
+    :return: recorded tries, empty if the request is not in the cassette
+    :rtype: list
+    """
+    tries = []
+    with self.lock:
+      if self.replay_start is None:
+        self.replay_start = time.time()
+      track = self.tracks.get(request.get_cache_key(parameter, False))
+      while track:
+        tries.append(track.popleft())
+        if tries[-1]['status'] == 200:
+          break
+      if tries:
+        self.replayed += 1
+      else:
+        self.unmatched += 1
+    return tries
+
+  def delay(self, tries):
+    """Returns the time in seconds until recorded tries are served
+
+    :param list tries: recorded tries from :meth:`take`
+    :rtype: float
+    """
+    if self.timing == 'fast' or not tries:
+      return 0
+    served = self.replay_start + tries[-1]['start'] - self.origin + tries[-1]['elapsed']
+    return max(0, served - time.time())
+
+  def respond(self, request, tries):
+    """Sets the request status and returns the replayed response
+
+    :param request: entrezpy request
+    :type  request: :class:`entrezpy.base.request.EutilsRequest`
+    :param list tries: recorded tries from :meth:`take`
+    :return: decoded response body or None if the request failed
+    :rtype: str or None
+    """
+    if not tries:
+      self.logger.error({'cassette':'request not recorded', 'query':request.query_id,
+                         'request':request.id, 'qry-url':request.qry_url})
+      request.set_request_error('notRecorded')
+      return None
+    last = tries[-1]
+    if last['status'] != 200:
+      request.set_request_error(last['error'])
+      return None
+    request.set_status_success()
+    request.set_transfer_size(last['bytes_received'], len(last['body']))
+    return last['body'].decode('utf-8')
+
+  def play(self, request, parameter):
+    """Replays one request, waiting for its recorded time if timing is
+    `original`.
+
+    :param request: entrezpy request
+    :type  request: :class:`entrezpy.base.request.EutilsRequest`
+    :param dict parameter: POST parameters
+    :return: decoded response body or None if the request failed
+    :rtype: str or None
+    """
+    tries = self.take(request, parameter)
+    time.sleep(self.delay(tries))
+    return self.respond(request, tries)
+
+  def close(self):
+    """Finishes recording"""
+    with self.lock:
+      if self.fh is not None:
+        self.fh.close()
+        self.fh = None
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.close()
+
+  def dump(self):
+    """:rtype: dict"""
+    return {'path':self.path, 'mode':self.mode, 'timing':self.timing,
+            'recorded':self.recorded, 'replayed':self.replayed, 'unmatched':self.unmatched,
+            'requests':len(self.tracks)}
@@ -0,0 +1,228 @@
+"""
+..
+  Copyright 2020 The University of Sydney
+  This file is part of entrezpy.
+
+  Entrezpy is free software: you can redistribute it and/or modify it under the
+  terms of the GNU Lesser General Public License as published by the Free
+  Software Foundation, either version 3 of the License, or (at your option) any
+  later version.
+
+  Entrezpy is distributed in the hope that it will be useful, but WITHOUT ANY
+  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+  A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with entrezpy.  If not, see <https://www.gnu.org/licenses/>.
+
+.. module:: entrezpy.requester.concurrency
+  :synopsis: Exports class ConcurrencyController adapting the number of
+    requests in flight per NCBI API key.
+"""
+
+
+import math
+import time
+import threading
+import collections
+import urllib.error
+
+import entrezpy.log.logger
+
+
+class ConcurrencyController:
+  """ConcurrencyController limits the requests in flight for one NCBI API key
+  to an adaptive window using additive increase and multiplicative decrease
+  (AIMD). Each successful try completing while the window is in full use
+  grows it by `increase` / window, i.e. by about `increase` per window of
+  completed tries, while latency stays healthy. The window shrinks by the factor `decrease` after a 429, a 5xx or
+  a transport error, or if the 95th latency percentile of the last
+  `latency_window` tries exceeds `latency_factor` times its baseline, the
+  lowest recent p95. Decreases are applied at most once per p95 latency,
+  since tries failing together report the same overload.
+
+  The controller only limits concurrency. Requests are still admitted by
+  the :class:`entrezpy.requester.ratelimiter.RateLimiter` of the key, i.e.
+  the window never raises the request rate above the allowed rate.
+
+  One controller exists per API key, see :meth:`get_controller`. The window
+  is published by :meth:`dump` and passed to listeners added with
+  :meth:`add_listener` whenever it changes.
+
+  :param float initial: initial window
+  :param int minimum: minimum window
+  :param int maximum: maximum window
+  :param float increase: additive increase per window of successful tries
+  :param float decrease: multiplicative decrease factor
+  :param int latency_window: number of latencies used for the p95
+  :param float latency_factor: p95 increase over the baseline treated as
+    overload
+  """
+
+  success = 'success'
+  """Try succeeded, latency is recorded"""
+
+  overload = 'overload'
+  """Try failed with 429, 5xx or a transport error"""
+
+  neutral = 'neutral'
+  """Try failed for reasons unrelated to load, e.g. 404"""
+
+  controllers = {}
+  """Controllers by API key"""
+
+  registry_lock = threading.Lock()
+
+  anonymous = 'anonymous'
+  """Key for requests without API key"""
+
+  def __init__(self, initial=2, minimum=1, maximum=16, increase=1.0, decrease=0.5,
+               latency_window=100, latency_factor=2.0):
+    self.window = float(initial)
+    self.minimum = minimum
+    self.maximum = maximum
+    self.increase = increase
+    self.decrease = decrease
+    self.latency_factor = latency_factor
+    self.latencies = collections.deque(maxlen=latency_window)
+    self.samples = 0
+    self.p95 = None
+    self.baseline = None
+    self.last_decrease = 0
+    self.inflight = 0
+    self.increases = 0
+    self.decreases = 0
+    self.listeners = []
+    self.condition = threading.Condition(threading.Lock())
+    self.logger = entrezpy.log.logger.get_class_logger(ConcurrencyController)
+
+  @classmethod
+  def get_controller(cls, apikey):
+    """Returns the process-wide controller for an API key and creates it if
+    required.
+
+    :param str apikey: NCBI API key or None for anonymous requests
+    :rtype: :class:`ConcurrencyController`
+    """
+    key = apikey if apikey else cls.anonymous
+    with cls.registry_lock:
+      if key not in cls.controllers:
+        cls.controllers[key] = cls()
+      return cls.controllers[key]
+
+  @staticmethod
+  def get_outcome(error):
+    """Returns the outcome of a try from the error it raised
+
+    :param error: error raised by the try or None if it succeeded
+    :type  error: Exception
+    :return: :attr:`success`, :attr:`overload` or :attr:`neutral`
+    :rtype: str
+    """
+    if error is None:
+      return ConcurrencyController.success
+    if isinstance(error, urllib.error.HTTPError) and error.code < 500 and error.code != 429:
+      return ConcurrencyController.neutral
+    return ConcurrencyController.overload
+
+  def limit(self):
+    """Returns the current number of admitted requests in flight
+
+    :rtype: int
+    """
+    return max(self.minimum, min(self.maximum, math.floor(self.window)))
+
+  def try_acquire(self):
+    """Takes a slot if one is free
+
+    :return: True if a slot was taken
+    :rtype: bool
+    """
+    with self.condition:
+      if self.inflight >= self.limit():
+        return False
+      self.inflight += 1
+      return True
+
+  def acquire(self):
+    """Blocks until a slot is free and takes it
+
+    :return: start time of the try for :meth:`release`
+    :rtype: float
+    """
+    with self.condition:
+      self.condition.wait_for(lambda: self.inflight < self.limit())
+      self.inflight += 1
+    return time.monotonic()
+
+  def release(self, start, outcome):
+    """Frees a slot and adapts the window to the outcome of the try
+
+    :param float start: start of the try as returned by :meth:`acquire`
+    :param str outcome: :attr:`success`, :attr:`overload` or :attr:`neutral`
+    """
+    now = time.monotonic()
+    with self.condition:
+      isSaturated = self.inflight >= self.limit()
+      self.inflight -= 1
+      window = self.window
+      if outcome == ConcurrencyController.success:
+        self.latencies.append(now - start)
+        self.samples += 1
+        if self.isLatencyRising():
+          self.shrink(now)
+        elif isSaturated:
+          self.window = min(self.maximum, self.window + self.increase / self.window)
+          self.increases += 1
+      elif outcome == ConcurrencyController.overload:
+        self.shrink(now)
+      self.condition.notify_all()
+      isChanged = math.floor(window) != math.floor(self.window)
+    if isChanged:
+      self.publish()
+
+  def isLatencyRising(self):
+    """Updates p95 and baseline every tenth latency and tests if the p95
+    exceeds :attr:`latency_factor` times the baseline. The baseline follows
+    rising latencies slowly to adapt to lasting changes. Requires the lock.
+
+    :rtype: bool
+    """
+    if self.samples < 20 or self.samples % 10 != 0:
+      return False
+    self.p95 = sorted(self.latencies)[int(0.95 * (len(self.latencies)-1))]
+    if self.baseline is None or self.p95 < self.baseline:
+      self.baseline = self.p95
+      return False
+    self.baseline += 0.05 * (self.p95 - self.baseline)
+    return self.p95 > self.latency_factor * self.baseline
+
+  def shrink(self, now):
+    """Decreases the window unless decreased within the last p95 latency.
+    Requires the lock."""
+    if now - self.last_decrease < (self.p95 if self.p95 else 0):
+      return
+    self.window = max(self.minimum, self.window * self.decrease)
+    self.last_decrease = now
+    self.decreases += 1
+
+  def add_listener(self, listener):
+    """Adds a callable receiving the new limit whenever it changes, e.g. to
+    export it as a metric
+
+    :param callable listener: called with the limit as int
+    """
+    self.listeners.append(listener)
+
+  def publish(self):
+    """Logs the current limit and passes it to the listeners"""
+    limit = self.limit()
+    self.logger.debug(lambda: {'concurrency':self.dump()})
+    for i in self.listeners:
+      i(limit)
+
+  def dump(self):
+    """:rtype: dict"""
+    return {'window':self.window, 'limit':self.limit(), 'inflight':self.inflight,
+            'p95':self.p95, 'baseline':self.baseline, 'increases':self.increases,
+            'decreases':self.decreases, 'minimum':self.minimum, 'maximum':self.maximum}
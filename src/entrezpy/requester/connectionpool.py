@@ -0,0 +1,225 @@
+"""
+..
+  Copyright 2020 The University of Sydney
+  This file is part of entrezpy.
+
+  Entrezpy is free software: you can redistribute it and/or modify it under the
+  terms of the GNU Lesser General Public License as published by the Free
+  Software Foundation, either version 3 of the License, or (at your option) any
+  later version.
+
+  Entrezpy is distributed in the hope that it will be useful, but WITHOUT ANY
+  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+  A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with entrezpy.  If not, see <https://www.gnu.org/licenses/>.
+
+.. module:: entrezpy.requester.connectionpool
+  :synopsis: Exports class ConnectionPool keeping persistent HTTP/1.1
+    connections to E-Utilities servers.
+"""
+
+
+import socket
+import ssl
+import threading
+import urllib.error
+import urllib.parse
+import http.client
+
+import entrezpy.requester.responsestream
+import entrezpy.log.logger
+
+
+class ConnectionPool:
+  """ConnectionPool keeps HTTP/1.1 keep-alive connections open and reuses them
+  for consecutive POST requests. Connections are stored per host and per
+  thread, i.e. each worker thread has its own connection to a host and no
+  locking is required while a request is in flight.
+
+  A reused connection can be closed by the server at any time. If sending a
+  request over a reused connection fails with
+  :class:`http.client.RemoteDisconnected` or :class:`http.client.IncompleteRead`,
+  the connection is reopened and the request is sent once more before the
+  error is passed to :class:`entrezpy.requester.requester.Requester`.
+
+  Responses are requested with gzip or deflate content encoding and are
+  decompressed by :class:`entrezpy.requester.responsestream.ResponseStream`.
+
+  Non-200 responses raise :class:`urllib.error.HTTPError` and connection
+  errors :class:`urllib.error.URLError` to mimic :func:`urllib.request.urlopen`.
+
+  :ivar int requests: number of sent requests
+  :ivar int reused: number of requests sent over an already open connection
+  :ivar int opened: number of opened connections
+  :ivar int reconnects: number of reopened connections after server disconnect
+  """
+
+  shared = None
+  """Process-wide pool used by all requesters without their own pool"""
+
+  shared_lock = threading.Lock()
+
+  reconnect_errors = (http.client.RemoteDisconnected, http.client.IncompleteRead,
+                      ConnectionResetError, BrokenPipeError)
+  """Errors on reused connections which trigger a reconnect"""
+
+  def __init__(self):
+    self.local = threading.local()
+    self.lock = threading.Lock()
+    self.ssl_context = ssl.create_default_context()
+    self.requests = 0
+    self.reused = 0
+    self.opened = 0
+    self.reconnects = 0
+    self.logger = entrezpy.log.logger.get_class_logger(ConnectionPool)
+
+  @classmethod
+  def get_shared(cls):
+    """Returns the process-wide connection pool and creates it if required.
+
+    :rtype: :class:`ConnectionPool`
+    """
+    with cls.shared_lock:
+      if cls.shared is None:
+        cls.shared = cls()
+      return cls.shared
+
+  def get_connection(self, scheme, netloc, timeout):
+    """Returns the open connection for host of the calling thread or creates
+    a new one.
+
+    :param str scheme: URL scheme, http or https
+    :param str netloc: host and optional port
+    :param float timeout: socket timeout in seconds
+    :rtype: :class:`http.client.HTTPConnection`
+    """
+    if not hasattr(self.local, 'connections'):
+      self.local.connections = {}
+    conn = self.local.connections.get((scheme, netloc))
+    if conn is None:
+      if scheme == 'https':
+        conn = http.client.HTTPSConnection(netloc, timeout=timeout, context=self.ssl_context)
+      else:
+        conn = http.client.HTTPConnection(netloc, timeout=timeout)
+      self.local.connections[(scheme, netloc)] = conn
+    conn.timeout = timeout
+    if conn.sock is not None:
+      conn.sock.settimeout(timeout)
+    return conn
+
+  def send(self, conn, path, data, headers, stream=False):
+    """Sends one POST request over a connection and reads the response. The
+    body of successful responses is not read if streamed.
+
+    :return: HTTP response and its body or None if streamed
+    :rtype: tuple
+    """
+    conn.request('POST', path, body=data, headers=headers)
+    response = conn.getresponse()
+    if stream and response.status == 200:
+      return response, None
+    return response, response.read()
+
+  def post(self, url, data, timeout, headers=None, stream=False, hedged_try=None):
+    """Sends a POST request over a persistent connection.
+
+    :param str url: full request URL
+    :param bytes data: urlencoded POST data
+    :param float timeout: socket timeout in seconds
+    :param dict headers: additional request headers
+    :param bool stream: read the body while parsing instead of reading it
+      completely before returning
+    :param hedged_try: hedged try registering the connection to allow
+      cancelling it from another thread
+    :type  hedged_try: :class:`entrezpy.requester.hedging.HedgedTry`
+    :return: response body, decompressed while reading
+    :rtype: :class:`entrezpy.requester.responsestream.ResponseStream`
+    :raises urllib.error.HTTPError: if response status is not 200
+    :raises urllib.error.URLError: if connecting to host fails
+    """
+    url_parts = urllib.parse.urlsplit(url)
+    path = url_parts.path if url_parts.path else '/'
+    req_headers = {'Content-Type' : 'application/x-www-form-urlencoded',
+                   'Connection' : 'keep-alive', 'User-Agent' : 'entrezpy',
+                   'Accept-Encoding' : entrezpy.requester.responsestream.ContentDecoder.encodings}
+    if headers:
+      req_headers.update(headers)
+    conn = self.get_connection(url_parts.scheme, url_parts.netloc, timeout)
+    if hedged_try is not None and not hedged_try.attach(conn):
+      raise urllib.error.URLError('hedged try cancelled')
+    isReused = conn.sock is not None
+    self.count(isReused)
+    try:
+      response, body = self.send(conn, path, data, req_headers, stream)
+    except ConnectionPool.reconnect_errors as err:
+      conn.close()
+      if not isReused or (hedged_try is not None and hedged_try.isCancelled):
+        raise_connection_error(err)
+      self.logger.debug({'reconnect':{'host':url_parts.netloc, 'error':type(err).__name__}})
+      with self.lock:
+        self.reused -= 1
+        self.reconnects += 1
+        self.opened += 1
+      try:
+        response, body = self.send(conn, path, data, req_headers, stream)
+      except Exception as retry_err:
+        conn.close()
+        raise_connection_error(retry_err)
+    except Exception as err:
+      conn.close()
+      raise_connection_error(err)
+    if response.status != 200:
+      raise urllib.error.HTTPError(url, response.status, response.reason,
+                                   response.headers, None)
+    return entrezpy.requester.responsestream.ResponseStream(response, conn, body)
+
+  def count(self, isReused):
+    """Updates connection counters for one request.
+
+    :param bool isReused: request uses an already open connection
+    """
+    with self.lock:
+      self.requests += 1
+      if isReused:
+        self.reused += 1
+      else:
+        self.opened += 1
+
+  def hit_rate(self):
+    """Returns the fraction of requests sent over reused connections.
+
+    :rtype: float
+    """
+    if self.requests == 0:
+      return 0.0
+    return self.reused / self.requests
+
+  def close(self):
+    """Closes all connections opened by the calling thread."""
+    for i in getattr(self.local, 'connections', {}).values():
+      i.close()
+    self.local.connections = {}
+
+  def dump(self):
+    """:rtype: dict"""
+    return {'requests':self.requests, 'reused':self.reused, 'opened':self.opened,
+            'reconnects':self.reconnects, 'hit_rate':self.hit_rate()}
+
+
+def raise_connection_error(err):
+  """Raises connection errors as expected by
+  :class:`entrezpy.requester.requester.Requester`. OS errors not handled by
+  the requester are raised as :class:`urllib.error.URLError`, similar to
+  :func:`urllib.request.urlopen`.
+
+  :param Exception err: error raised while sending a request
+  :raises: err or :class:`urllib.error.URLError`
+  """
+  if isinstance(err, (socket.timeout, socket.gaierror, ssl.SSLError,
+                      http.client.RemoteDisconnected)):
+    raise err
+  if isinstance(err, OSError):
+    raise urllib.error.URLError(err) from err
+  raise err
@@ -0,0 +1,186 @@
+"""
+..
+  Copyright 2020 The University of Sydney
+  This file is part of entrezpy.
+
+  Entrezpy is free software: you can redistribute it and/or modify it under the
+  terms of the GNU Lesser General Public License as published by the Free
+  Software Foundation, either version 3 of the License, or (at your option) any
+  later version.
+
+  Entrezpy is distributed in the hope that it will be useful, but WITHOUT ANY
+  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+  A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with entrezpy.  If not, see <https://www.gnu.org/licenses/>.
+
+.. module:: entrezpy.requester.hedging
+  :synopsis: Exports class HedgePolicy deciding when to send a duplicate try
+    of slow requests and class HedgedTry, one try of a hedged request.
+"""
+
+
+import socket
+import threading
+import collections
+
+import entrezpy.base.request
+
+
+class HedgedTry:
+  """HedgedTry is one try of a hedged request running on a worker thread of
+  :class:`entrezpy.requester.requester.Requester`. The connection of the try
+  is registered by :meth:`entrezpy.requester.connectionpool.ConnectionPool.post`
+  so that a losing try can be cancelled by shutting down its socket.
+
+  :ivar body: response body or None
+  :ivar error: exception raised by the try or None
+  :ivar float duration: seconds until the try completed
+  """
+
+  def __init__(self):
+    self.connection = None
+    self.body = None
+    self.error = None
+    self.duration = None
+    self.isDone = False
+    self.isCancelled = False
+    self.lock = threading.Lock()
+
+  def attach(self, connection):
+    """Registers the connection used by this try
+
+    :param connection: connection of the worker thread
+    :type  connection: :class:`http.client.HTTPConnection`
+    :return: False if the try has already been cancelled
+    :rtype: bool
+    """
+    with self.lock:
+      self.connection = connection
+      return not self.isCancelled
+
+  def complete(self, body, error, duration):
+    """Stores the result of the try"""
+    with self.lock:
+      self.body = body
+      self.error = error
+      self.duration = duration
+      self.isDone = True
+
+  def cancel(self):
+    """Cancels the try if still in flight. Shutting down the socket makes
+    the blocked read of the worker thread fail, which closes the connection.
+
+    :return: True if a try in flight was cancelled
+    :rtype: bool
+    """
+    with self.lock:
+      if self.isDone or self.isCancelled:
+        return False
+      self.isCancelled = True
+      connection = self.connection
+    if connection is not None and connection.sock is not None:
+      try:
+        connection.sock.shutdown(socket.SHUT_RDWR)
+      except OSError:
+        pass
+    return True
+
+
+class HedgePolicy:
+  """HedgePolicy decides which requests are hedged and how long to wait
+  before hedging. A hedged request sends a duplicate try if the first try
+  did not respond within the hedge delay of its E-Utility, uses whichever
+  response arrives first and cancels the other try. Both tries are admitted
+  by the rate limiter. Hedging cuts the tail latency of small lookups caused
+  by stalled connections, which otherwise wait for the request timeout.
+
+  Only idempotent E-Utilities are hedged, i.e. requests neither storing
+  results on the history server, like epost, Esearch with `usehistory` or
+  Elink `*_history` commands, nor larger than `max_size` UIDs. The hedge delay
+  is the `quantile` of the last `latency_window` completed tries of an
+  E-Utility, e.g. its p95, and `initial_delay` until 20 tries completed.
+
+  :param int max_size: maximum request size, e.g. UIDs, of hedged requests
+  :param float quantile: latency quantile used as hedge delay
+  :param float initial_delay: hedge delay in seconds before latencies are
+    known
+  :param float min_delay: minimum hedge delay in seconds
+  :param int latency_window: number of latencies per E-Utility
+  """
+
+  eutils = frozenset(['esearch.fcgi', 'esummary.fcgi', 'elink.fcgi', 'efetch.fcgi'])
+  """Idempotent E-Utilities"""
+
+  def __init__(self, max_size=20, quantile=0.95, initial_delay=1.0, min_delay=0.01,
+               latency_window=100):
+    self.max_size = max_size
+    self.quantile = quantile
+    self.initial_delay = initial_delay
+    self.min_delay = min_delay
+    self.latency_window = latency_window
+    self.latencies = {}
+    self.delays = {}
+    self.samples = collections.Counter()
+    self.hedged = 0
+    self.wins = 0
+    self.cancelled = 0
+    self.lock = threading.Lock()
+
+  def isHedgeable(self, request, parameter):
+    """Tests if a request can be hedged
+
+    :param request: entrezpy request
+    :type  request: :class:`entrezpy.base.request.EutilsRequest`
+    :param dict parameter: POST parameters
+    :rtype: bool
+    """
+    if request.eutil not in HedgePolicy.eutils or request.size > self.max_size:
+      return False
+    return not entrezpy.base.request.EutilsRequest.isHistoryStoring(request.eutil, parameter)
+
+  def get_delay(self, eutil):
+    """Returns the hedge delay of an E-Utility in seconds
+
+    :param str eutil: E-Utility, e.g. esummary.fcgi
+    :rtype: float
+    """
+    return self.delays.get(eutil, self.initial_delay)
+
+  def record_latency(self, eutil, latency):
+    """Records the latency of a completed try and updates the hedge delay
+    every tenth latency
+
+    :param str eutil: E-Utility, e.g. esummary.fcgi
+    :param float latency: try duration in seconds
+    """
+    with self.lock:
+      if eutil not in self.latencies:
+        self.latencies[eutil] = collections.deque(maxlen=self.latency_window)
+      latencies = self.latencies[eutil]
+      latencies.append(latency)
+      self.samples[eutil] += 1
+      if self.samples[eutil] < 20 or self.samples[eutil] % 10 != 0:
+        return
+      delay = sorted(latencies)[int(self.quantile * (len(latencies)-1))]
+      self.delays[eutil] = max(self.min_delay, delay)
+
+  def count(self, hedged=0, wins=0, cancelled=0):
+    """Updates the hedging statistics
+
+    :param int hedged: sent duplicate tries
+    :param int wins: requests answered by the duplicate try
+    :param int cancelled: cancelled losing tries
+    """
+    with self.lock:
+      self.hedged += hedged
+      self.wins += wins
+      self.cancelled += cancelled
+
+  def dump(self):
+    """:rtype: dict"""
+    return {'max_size':self.max_size, 'quantile':self.quantile,
+            'initial_delay':self.initial_delay, 'min_delay':self.min_delay,
+            'delays':dict(self.delays), 'hedged':self.hedged, 'wins':self.wins,
+            'cancelled':self.cancelled}
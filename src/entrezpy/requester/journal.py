@@ -0,0 +1,243 @@
+"""
+..
+  Copyright 2020 The University of Sydney
+  This file is part of entrezpy.
+
+  Entrezpy is free software: you can redistribute it and/or modify it under the
+  terms of the GNU Lesser General Public License as published by the Free
+  Software Foundation, either version 3 of the License, or (at your option) any
+  later version.
+
+  Entrezpy is distributed in the hope that it will be useful, but WITHOUT ANY
+  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+  A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with entrezpy.  If not, see <https://www.gnu.org/licenses/>.
+
+.. module:: entrezpy.requester.journal
+  :synopsis: Exports class Journal recording completed requests and pipeline
+    stages to resume interrupted queries and function record_request.
+"""
+
+
+import os
+import json
+import threading
+
+import entrezpy.log.logger
+
+
+class Journal:
+  """Journal records completed requests and Conduit pipeline stages in an
+  append-only file of JSON lines. Each record is flushed once written, so a
+  killed process loses at most the requests in flight. Opening an existing
+  journal loads its records and a restarted query skips the requests
+  recorded by the earlier run, see
+  :attr:`entrezpy.base.query.EutilsQuery.journal`. Only loaded records are
+  resumable, records written by the current run are not. Each scope and
+  stage is resumed once, i.e. running the same query or pipeline again in
+  the same process sends its requests again.
+
+  Request records are only written for analyzers setting
+  :attr:`entrezpy.base.analyzer.EutilsAnalyzer.resumable`. They hold the key
+  of the request, i.e. its normalized parameters as in
+  :meth:`entrezpy.base.request.EutilsRequest.get_cache_key`, its range, e.g.
+  retstart and retmax or the number of UIDs, the WebEnv and query_key it
+  refers to and the analyzer state from
+  :meth:`entrezpy.base.analyzer.EutilsAnalyzer.checkpoint`, e.g. an output
+  file offset. Requests are grouped by scope, which is the query id passed
+  to the query or the pipeline stage of a Conduit query. Queries without
+  query id have a new scope and do not resume.
+
+  Stage records hold the follow-up parameters, including WebEnv and
+  query_key, and size of a completed :class:`entrezpy.conduit.Conduit`
+  query. History server references expire after some hours of inactivity,
+  which limits how late a pipeline can be resumed.
+
+  :param str path: journal file, created if missing
+  :param bool sync: sync each record to disk, not only flush it
+  """
+
+  def __init__(self, path, sync=False):
+    self.path = path
+    self.sync = sync
+    self.requests = {}
+    self.states = {}
+    self.stages = {}
+    self.claimed = {}
+    self.written = 0
+    self.resumed = 0
+    self.lock = threading.Lock()
+    self.logger = entrezpy.log.logger.get_class_logger(Journal)
+    isTruncated = self.load()
+    self.file = open(path, 'a', encoding='utf-8')
+    if isTruncated:
+      self.file.write('\n')
+      self.file.flush()
+
+  def __getstate__(self):
+    """Requests passed to worker processes carry a detached journal which
+    writes nothing. Only the process which opened the journal writes it."""
+    return {'path':self.path}
+
+  def __setstate__(self, state):
+    self.path = state['path']
+    self.sync = False
+    self.requests = {}
+    self.states = {}
+    self.stages = {}
+    self.claimed = {}
+    self.written = 0
+    self.resumed = 0
+    self.lock = threading.Lock()
+    self.logger = entrezpy.log.logger.get_class_logger(Journal)
+    self.file = None
+
+  def load(self):
+    """Loads the records of an existing journal. A last line truncated by
+    killing the writing process is ignored.
+
+    :return: True if the journal does not end with a complete line
+    :rtype: bool
+    """
+    if not os.path.exists(self.path):
+      return False
+    line = ''
+    with open(self.path, 'r', encoding='utf-8') as fh:
+      for line in fh:
+        try:
+          record = json.loads(line)
+        except ValueError:
+          self.logger.warning({'journal':self.path, 'skip record':line[:80]})
+          continue
+        self.add_record(record)
+    self.logger.debug(lambda: {'loaded journal':self.dump()})
+    return bool(line) and not line.endswith('\n')
+
+  def add_record(self, record):
+    """Adds a loaded record to the journal lookups
+
+    :param dict record: journal record
+    """
+    if record['type'] == 'request':
+      self.requests[(record['scope'], record['key'])] = record['state']
+      self.states[record['scope']] = record['state']
+    elif record['type'] == 'stage':
+      self.stages[record['key']] = record
+
+  def write(self, record):
+    """Appends and flushes one record
+
+    :param dict record: journal record
+    """
+    if self.file is None:
+      return
+    line = json.dumps(record, separators=(',', ':')) + '\n'
+    with self.lock:
+      self.file.write(line)
+      self.file.flush()
+      if self.sync:
+        os.fsync(self.file.fileno())
+      self.written += 1
+
+  def claim(self, scope, owner):
+    """Claims the loaded requests of a scope for one query. Claims of the
+    same scope by other owners fail, i.e. only the first query of a scope in
+    a process resumes.
+
+    :param str scope: query scope
+    :param str owner: unique id of the claiming query
+    :return: True if the scope is claimed by owner
+    :rtype: bool
+    """
+    with self.lock:
+      return self.claimed.setdefault(scope, owner) == owner
+
+  def isDone(self, scope, key):
+    """Tests if a request completed in an earlier run
+
+    :param str scope: query scope
+    :param str key: request key
+    :rtype: bool
+    """
+    return (scope, key) in self.requests
+
+  def get_state(self, scope):
+    """Returns the analyzer state of the last completed request of a scope
+
+    :param str scope: query scope
+    :return: analyzer state or None
+    """
+    return self.states.get(scope)
+
+  def count_resumed(self):
+    """Counts one request skipped since it completed in an earlier run"""
+    with self.lock:
+      self.resumed += 1
+
+  def record_request(self, request, state=None):
+    """Records a completed request
+
+    :param request: parsed request
+    :type  request: :class:`entrezpy.base.request.EutilsRequest`
+    :param state: analyzer state, JSON serializable
+    """
+    parameter = request.get_post_parameter()
+    reqrange = {}
+    for i in ('retstart', 'retmax', 'WebEnv', 'query_key'):
+      if parameter.get(i) is not None:
+        reqrange[i] = parameter[i]
+    if parameter.get('id'):
+      reqrange['uids'] = len(parameter['id']) if isinstance(parameter['id'], (list, tuple)) else 1
+    self.write({'type':'request', 'scope':request.journal_scope, 'key':request.journal_key,
+                'eutil':request.eutil, 'request':request.id, 'range':reqrange, 'state':state})
+
+  def take_stage(self, key):
+    """Returns the record of a pipeline stage completed in an earlier run and
+    removes it, i.e. a stage is restored once.
+
+    :param str key: stage key
+    :rtype: dict or None
+    """
+    with self.lock:
+      return self.stages.pop(key, None)
+
+  def record_stage(self, key, function, link, size, isEmpty):
+    """Records a completed pipeline stage
+
+    :param str key: stage key, see :attr:`entrezpy.conduit.Conduit.Query.key`
+    :param str function: Eutils function
+    :param dict link: follow-up parameters of the stage or None
+    :param int size: result size
+    :param bool isEmpty: stage had an empty result
+    """
+    self.write({'type':'stage', 'key':key, 'function':function, 'link':link, 'size':size,
+                'empty':isEmpty})
+
+  def close(self):
+    """Closes the journal file"""
+    with self.lock:
+      if self.file is not None:
+        self.file.close()
+        self.file = None
+
+  def dump(self):
+    """:rtype: dict"""
+    return {'path':self.path, 'requests':len(self.requests), 'stages':len(self.stages),
+            'written':self.written, 'resumed':self.resumed}
+
+
+def record_request(analyzer, request):
+  """Records a parsed request in the journal of its query if it succeeded
+  and its analyzer is resumable. Called while holding the analyzer lock, so
+  the analyzer state matches the parsed responses.
+
+  :param analyzer: entrezpy analyzer instance
+  :type  analyzer: :class:`entrezpy.base.analyzer.EutilsAnalyzer`
+  :param request: parsed request
+  :type  request: :class:`entrezpy.base.request.EutilsRequest`
+  """
+  if request.journal is None or request.status != 0 or analyzer.hasErrorResponse:
+    return
+  request.journal.record_request(request, analyzer.checkpoint())
@@ -0,0 +1,203 @@
+"""
+..
+  Copyright 2020 The University of Sydney
+  This file is part of entrezpy.
+
+  Entrezpy is free software: you can redistribute it and/or modify it under the
+  terms of the GNU Lesser General Public License as published by the Free
+  Software Foundation, either version 3 of the License, or (at your option) any
+  later version.
+
+  Entrezpy is distributed in the hope that it will be useful, but WITHOUT ANY
+  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+  A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with entrezpy.  If not, see <https://www.gnu.org/licenses/>.
+
+.. module:: entrezpy.requester.memorycache
+  :synopsis: Exports class MemoryCache, a bounded thread-safe LRU cache, and
+    class MemoryResponseCache keeping E-Utility responses in memory.
+"""
+
+
+import time
+import threading
+import collections
+
+import entrezpy.requester.cache
+import entrezpy.log.logger
+
+
+class MemoryCache:
+  """MemoryCache is a thread-safe least recently used cache bounded by the
+  number of entries and their total size. Entries are evicted least recently
+  used first once either bound is exceeded. Entries older than `ttl` seconds
+  are expired on access.
+
+  Values are stored as given and returned without copying, i.e. cached
+  objects are shared by all users of the cache and must not be modified.
+
+  :param int max_entries: maximum number of entries
+  :param int max_bytes: maximum total size of entries as given to :meth:`put`
+  :param float ttl: time to live of entries in seconds, None for no expiry
+  :ivar stats: usage of this cache
+  :type stats: :class:`entrezpy.requester.cache.CacheStats`
+  """
+
+  def __init__(self, max_entries=10000, max_bytes=64*1024**2, ttl=None):
+    self.max_entries = max_entries
+    self.max_bytes = max_bytes
+    self.ttl = ttl
+    self.entries = collections.OrderedDict()
+    self.size = 0
+    self.evicted = 0
+    self.stats = entrezpy.requester.cache.CacheStats()
+    self.lock = threading.Lock()
+
+  def get(self, key, ttl=None):
+    """Returns a cached value and marks it as most recently used
+
+    :param key: hashable key
+    :param float ttl: time to live overriding :attr:`ttl`
+    :return: value or None if not cached or expired
+    """
+    ttl = self.ttl if ttl is None else ttl
+    with self.lock:
+      entry = self.entries.get(key)
+      if entry is None:
+        return None
+      value, size, created = entry
+      if ttl is not None and time.monotonic() - created > ttl:
+        del self.entries[key]
+        self.size -= size
+        return None
+      self.entries.move_to_end(key)
+      return value
+
+  def get_many(self, keys):
+    """Returns cached values for several keys and counts hits and misses per
+    key in :attr:`stats`.
+
+    :param list keys: hashable keys
+    :return: cached values by key, missing keys are omitted
+    :rtype: dict
+    """
+    values = {}
+    for i in keys:
+      value = self.get(i)
+      if value is None:
+        self.stats.count('misses')
+        continue
+      self.stats.count('hits')
+      values[i] = value
+    return values
+
+  def put(self, key, value, size=1):
+    """Stores a value as most recently used and evicts least recently used
+    entries exceeding the bounds. Values larger than :attr:`max_bytes` are not
+    stored.
+
+    :param key: hashable key
+    :param value: value
+    :param int size: size of value in bytes
+    """
+    if size > self.max_bytes:
+      return
+    with self.lock:
+      if key in self.entries:
+        self.size -= self.entries.pop(key)[1]
+      self.entries[key] = (value, size, time.monotonic())
+      self.size += size
+      while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+        self.size -= self.entries.popitem(last=False)[1][1]
+        self.evicted += 1
+    self.stats.count('stored', size)
+
+  def remove(self, key):
+    """Removes one entry if cached"""
+    with self.lock:
+      entry = self.entries.pop(key, None)
+      if entry is not None:
+        self.size -= entry[1]
+
+  def clear(self):
+    """Removes all entries"""
+    with self.lock:
+      self.entries.clear()
+      self.size = 0
+
+  def __len__(self):
+    return len(self.entries)
+
+  def __contains__(self, key):
+    return key in self.entries
+
+  def dump(self):
+    """:rtype: dict"""
+    return {'entries':len(self.entries), 'max_entries':self.max_entries,
+            'size':self.size, 'max_bytes':self.max_bytes, 'ttl':self.ttl,
+            'evicted':self.evicted, 'stats':self.stats.dump()}
+
+
+class MemoryResponseCache(entrezpy.requester.cache.BaseResponseCache):
+  """MemoryResponseCache keeps response bodies of E-Utility requests in a
+  :class:`MemoryCache`. It is used like
+  :class:`entrezpy.requester.cache.ResponseCache` by setting
+  :attr:`entrezpy.base.query.EutilsQuery.cache`. If `backend` is given, e.g.
+  a :class:`entrezpy.requester.cache.ResponseCache`, responses missing in
+  memory are looked up in the backend and promoted into memory, and stored
+  responses are written to both.
+
+    disk = entrezpy.requester.cache.ResponseCache()
+    entrezpy.base.query.EutilsQuery.cache = MemoryResponseCache(backend=disk)
+
+  :param int max_entries: maximum number of responses in memory
+  :param int max_bytes: maximum size of responses in memory
+  :param dict ttl: time to live in seconds by E-Utility
+  :param bool bypass_history: do not cache requests using the history server
+  :param backend: second level cache
+  :type  backend: :class:`entrezpy.requester.cache.BaseResponseCache`
+  """
+
+  def __init__(self, max_entries=1000, max_bytes=256*1024**2, ttl=None,
+               bypass_history=True, backend=None):
+    super().__init__(ttl, bypass_history)
+    self.memory = MemoryCache(max_entries, max_bytes)
+    self.backend = backend
+    self.logger = entrezpy.log.logger.get_class_logger(MemoryResponseCache)
+    self.logger.debug(lambda: {'init':self.dump()})
+
+  def get(self, key, eutil):
+    """Implements :meth:`entrezpy.requester.cache.BaseResponseCache.get`"""
+    entry = self.memory.get(key, self.ttl.get(eutil, 0))
+    if entry is not None:
+      return entry
+    if self.backend is None:
+      return None
+    body = self.backend.get(key, eutil)
+    if body is not None:
+      self.memory.put(key, body, len(body))
+    return body
+
+  def put(self, key, body):
+    """Implements :meth:`entrezpy.requester.cache.BaseResponseCache.put`
+
+    :return: number of bytes stored in memory
+    :rtype: int
+    """
+    self.memory.put(key, body, len(body))
+    if self.backend is not None:
+      self.backend.put(key, body)
+    return len(body)
+
+  def clear(self):
+    """Removes all responses from memory and the backend"""
+    self.memory.clear()
+    if self.backend is not None:
+      self.backend.clear()
+
+  def dump(self):
+    """:rtype: dict"""
+    return {'memory':self.memory.dump(), 'ttl':self.ttl, 'bypass_history':self.bypass_history,
+            'backend':self.backend.dump() if self.backend else None, 'stats':self.stats.dump()}
@@ -23,7 +23,6 @@
 """
 
 
-import json
 import sys
 import threading
 import time
@@ -41,52 +40,89 @@ class QueryMonitor:
   logger = None
   observers = {}
 
-  class Observer(threading.Thread):
+  class Observer:
     """
-    The Observer class implements the observation of one entrezpy query. It
-    uses Python's multithreading deamon when using multithreading.
+    The Observer class implements the observation of one entrezpy query.
+    Observation is event driven: requests report their start via
+    :meth:`.observe` and their completion via :meth:`.complete`, which update
+    counters and log the request status once. Observers keep no reference to
+    observed requests and need no thread, i.e. recalling an observer returns
+    immediately.
+
+    :ivar int expected_requests: number of expected requests
+    :ivar int processed_requests: number of completed requests
+    :ivar int inflight_requests: number of started but not completed requests
+    :ivar int failed_requests: number of completed requests with errors
+    :ivar float duration: observation time in seconds after recall
     """
 
     def __init__(self):
-      super().__init__(daemon=True)
       self.expected_requests = 0
       self.processed_requests = 0
-      self.doObserve = True
-      self.requests = []
+      self.inflight_requests = 0
+      self.failed_requests = 0
+      self.doObserve = False
+      self.start_time = None
       self.duration = None
+      self.lock = threading.Lock()
 
     def recall(self):
-      """Stops an observation for a query"""
-      self.doObserve = False
-      for i in self.requests:
-        i.report_status(self.processed_requests, self.expected_requests)
-      self.join()
+      """Stops an observation for a query and logs its summary"""
+      with self.lock:
+        self.doObserve = False
+        if self.start_time is not None:
+          self.duration = time.time() - self.start_time
+        summary = self.dump()
+      QueryMonitor.logger.info({'observation':summary})
 
     def dispatch(self, parameter):
       """
-      Starts observation
+      Starts observation and resets the counters of previous observations
 
       :param parameter: query parameter
       """
-      self.expected_requests = parameter.expected_requests
-      if not self.is_alive():
-        self.start()
+      with self.lock:
+        self.expected_requests = parameter.expected_requests
+        self.processed_requests = 0
+        self.inflight_requests = 0
+        self.failed_requests = 0
+        self.doObserve = True
+        self.start_time = time.time()
+        self.duration = None
 
     def observe(self, request):
-      """Adds one query request for observation"""
-      self.requests.append(request)
-
-    def run(self):
-      """Observes requests from an entrezpy query"""
-      while self.doObserve:
-        for i in self.requests:
-          i.report_status(self.processed_requests, self.expected_requests)
-        time.sleep(1)
-
-  def __init__(self, query):
-    """Inits observer and registers query for monitoring."""
-    self.register_query(query)
+      """Registers the start of one query request"""
+      with self.lock:
+        self.inflight_requests += 1
+
+    def complete(self, request):
+      """Registers the completion of one query request and reports its status
+
+      :param request: completed request
+      :type  request: :class:`entrezpy.base.request.EutilsRequest`
+      """
+      with self.lock:
+        self.inflight_requests -= 1
+        self.processed_requests += 1
+        if request.status == 1:
+          self.failed_requests += 1
+        processed = self.processed_requests
+        expected = self.expected_requests
+      request.report_status(processed, expected)
+
+    def dump(self):
+      """:rtype: dict"""
+      return {'expected':self.expected_requests, 'processed':self.processed_requests,
+              'inflight':self.inflight_requests, 'failed':self.failed_requests,
+              'duration':self.duration}
+
+  def __init__(self, query=None):
+    """Inits observer and registers query for monitoring. Monitors shared
+    by several queries, e.g. by :class:`entrezpy.session.Session`, register
+    each query with :meth:`.register_query`."""
     QueryMonitor.logger = entrezpy.log.logger.get_class_logger(QueryMonitor)
+    if query is not None:
+      self.register_query(query)
     #self.locks = {}
 
   def register_query(self, query_id):
@@ -98,9 +134,18 @@ class QueryMonitor:
     """
     #self.locks[query_id] = threading.Lock()
     if query_id in QueryMonitor.observers:
-      sys.exit(QueryMonitor.logger.error(json.dumps({'Duplicate query_id':query_id})))
+      sys.exit(QueryMonitor.logger.error({'Duplicate query_id':query_id}))
     QueryMonitor.observers[query_id] = self.Observer()
 
+  def release_query(self, query_id):
+    """
+    Removes the observer of a query, e.g. once the query has been garbage
+    collected. Its query id can be registered again afterwards.
+
+    :param str query_id: entrezpy query id
+    """
+    QueryMonitor.observers.pop(query_id, None)
+
   def get_observer(self, query_id):
     """
     Returns an observer for a specific query.
@@ -110,7 +155,7 @@ class QueryMonitor:
     """
     if query_id in QueryMonitor.observers:
       return QueryMonitor.observers[query_id]
-    sys.exit(QueryMonitor.logger.error(json.dumps({'No observer for query_id':query_id})))
+    sys.exit(QueryMonitor.logger.error({'No observer for query_id':query_id}))
 
   def dispatch_observer(self, query_id, parameter):
     """
@@ -121,8 +166,8 @@ class QueryMonitor:
     :param parameter: query parameter
     :type  parameter: 'class':`entrezpy.base.EutilsParameter`
     """
-    QueryMonitor.logger.debug(json.dumps({'dispatching observer for':query_id,
-                                          'parameter':parameter.dump()}))
+    QueryMonitor.logger.debug(lambda: {'dispatching observer for':query_id,
+                                       'parameter':parameter.dump()})
     self.get_observer(query_id).dispatch(parameter)
 
   def recall_observer(self, query_id):
@@ -132,20 +177,20 @@ class QueryMonitor:
     :param query: entrezpy query
     :type  query: :class:`entrezpy.base.query.EutilsQuery`
     """
-    QueryMonitor.logger.debug(json.dumps({'recalling observer for':query_id}))
+    QueryMonitor.logger.debug({'recalling observer for':query_id})
     self.get_observer(query_id).recall()
 
   def update_observer(self, query_id, parameter):
     """
-    Function updating the settings for a thread. Honestly, I have no idea if
-    the lock is really required. It works without locks, just updating the
-    parameter.
+    Updates the expected number of requests for an observed query.
 
     :param query: entrezpy query
     :type  query: :class:`entrezpy.base.query.EutilsQuery`
     :param parameter: query parameter
     :type  parameter: 'class':`entrezpy.base.EutilsParameter`
     """
-    QueryMonitor.logger.debug(json.dumps({'updating observer for':query_id,
-                                          'parameter':parameter.dump()}))
-    self.get_observer(query_id).expected_requests = parameter.expected_requests
+    QueryMonitor.logger.debug(lambda: {'updating observer for':query_id,
+                                       'parameter':parameter.dump()})
+    observer = self.get_observer(query_id)
+    with observer.lock:
+      observer.expected_requests = parameter.expected_requests
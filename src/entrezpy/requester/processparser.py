@@ -0,0 +1,208 @@
+"""
+..
+  Copyright 2020 The University of Sydney
+  This file is part of entrezpy.
+
+  Entrezpy is free software: you can redistribute it and/or modify it under the
+  terms of the GNU Lesser General Public License as published by the Free
+  Software Foundation, either version 3 of the License, or (at your option) any
+  later version.
+
+  Entrezpy is distributed in the hope that it will be useful, but WITHOUT ANY
+  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+  A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with entrezpy.  If not, see <https://www.gnu.org/licenses/>.
+
+.. module:: entrezpy.requester.processparser
+  :synopsis: Exports class ProcessParser parsing responses in worker processes
+    and function parse_locked passing responses to analyzers.
+"""
+
+
+import sys
+import atexit
+import threading
+import multiprocessing
+import concurrent.futures
+
+import entrezpy.requester.journal
+import entrezpy.requester.responsestream
+import entrezpy.log.logger
+
+
+def get_shared_memory():
+  """Imports :mod:`multiprocessing.shared_memory` when first used, i.e. only
+  by queries parsing in processes.
+
+  :return: module or None if not available, i.e. before Python 3.8
+  """
+  try:
+    import multiprocessing.shared_memory
+  except ImportError:
+    return None
+  return multiprocessing.shared_memory
+
+
+def parse_partial(partial, request, body, shm_name=None, size=0):
+  """Parses one response in a worker process.
+
+  :param partial: empty analyzer from
+    :meth:`entrezpy.base.analyzer.EutilsAnalyzer.new_partial`
+  :param request: entrezpy request
+  :param bytes body: UTF-8 encoded response or None if passed in shared memory
+  :param str shm_name: name of the shared memory block holding the response
+  :param int size: response size in the shared memory block
+  :return: analyzer holding the partial result
+  """
+  if shm_name is not None:
+    shm = get_shared_memory().SharedMemory(name=shm_name)
+    try:
+      body = bytes(shm.buf[:size])
+    finally:
+      shm.close()
+  partial.parse(body.decode('utf-8'), request)
+  return partial
+
+
+class ProcessParser:
+  """ProcessParser parses responses in a pool of worker processes to use
+  several cores for CPU-heavy analyzers. Analyzers opt in by setting
+  :attr:`entrezpy.base.analyzer.EutilsAnalyzer.process_parse`. A worker
+  parses a response into an empty analyzer created by
+  :meth:`entrezpy.base.analyzer.EutilsAnalyzer.new_partial` and returns it,
+  and the analyzer of the query merges it with
+  :meth:`entrezpy.base.analyzer.EutilsAnalyzer.merge_partial`. Responses
+  larger than :attr:`shm_threshold` are passed to the worker in shared
+  memory instead of being pickled through the pipe, if available, i.e. since
+  Python 3.8.
+
+  Parsing blocks the calling thread until the worker returns. Threads of a
+  query therefore parse up to `processes` responses in parallel and hold the
+  analyzer lock only while merging.
+
+  Workers are started with the `forkserver` method where available, i.e.
+  analyzer classes must be importable by the workers.
+
+  :param int processes: number of worker processes
+  """
+
+  shared = {}
+  """Process-wide parsers by number of processes"""
+
+  shared_lock = threading.Lock()
+
+  shm_threshold = 64 * 1024
+  """Minimum response size in bytes passed in shared memory"""
+
+  def __init__(self, processes):
+    self.processes = processes
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    self.executor = concurrent.futures.ProcessPoolExecutor(
+      max_workers=processes, mp_context=multiprocessing.get_context(method))
+    self.parsed = 0
+    self.shared_bytes = 0
+    self.lock = threading.Lock()
+    self.logger = entrezpy.log.logger.get_class_logger(ProcessParser)
+    self.logger.debug(lambda: {'init':self.dump()})
+
+  @classmethod
+  def get_shared(cls, processes):
+    """Returns the process-wide parser with the given number of worker
+    processes and creates it if required. Parsers are shut down at exit.
+
+    :param int processes: number of worker processes
+    :rtype: :class:`ProcessParser`
+    """
+    with cls.shared_lock:
+      if processes not in cls.shared:
+        cls.shared[processes] = cls(processes)
+        atexit.register(cls.shared[processes].shutdown)
+      return cls.shared[processes]
+
+  def parse(self, analyzer, response, request):
+    """Parses a response in a worker process
+
+    :param analyzer: analyzer of the query
+    :type  analyzer: :class:`entrezpy.base.analyzer.EutilsAnalyzer`
+    :param str response: decoded response
+    :param request: entrezpy request
+    :type  request: :class:`entrezpy.base.request.EutilsRequest`
+    :return: analyzer holding the partial result
+    :rtype: :class:`entrezpy.base.analyzer.EutilsAnalyzer`
+    """
+    body = response.encode('utf-8')
+    shared_memory = get_shared_memory()
+    if shared_memory is None or len(body) < ProcessParser.shm_threshold:
+      partial = self.executor.submit(parse_partial, analyzer.new_partial(), request,
+                                     body).result()
+      self.count(0)
+      return partial
+    shm = shared_memory.SharedMemory(create=True, size=len(body))
+    try:
+      shm.buf[:len(body)] = body
+      partial = self.executor.submit(parse_partial, analyzer.new_partial(), request, None,
+                                     shm.name, len(body)).result()
+    finally:
+      shm.close()
+      shm.unlink()
+    self.count(len(body))
+    return partial
+
+  def count(self, shared_bytes):
+    """Counts one parsed response"""
+    with self.lock:
+      self.parsed += 1
+      self.shared_bytes += shared_bytes
+
+  def shutdown(self):
+    """Stops the worker processes. Queued responses are cancelled if
+    supported, i.e. since Python 3.9."""
+    if sys.version_info >= (3, 9):
+      self.executor.shutdown(wait=True, cancel_futures=True)
+    else:
+      self.executor.shutdown(wait=True)
+
+  def dump(self):
+    """:rtype: dict"""
+    return {'processes':self.processes, 'parsed':self.parsed,
+            'shared_bytes':self.shared_bytes}
+
+
+def parse_locked(analyzer, response, request, failed_requests, lock, process_parser=None):
+  """Passes a response to its analyzer while holding the analyzer lock. If
+  a process parser is given and the analyzer supports it, the response is
+  parsed in a worker process and the lock is held only while merging the
+  result. Parsed requests are recorded in their journal, if any.
+
+  :param analyzer: entrezpy analyzer instance
+  :type  analyzer: :class:`entrezpy.base.analyzer.EutilsAnalyzer`
+  :param response: response from :class:`entrezpy.requester.requester.Requester`
+  :type  response: str or :class:`entrezpy.requester.responsestream.ResponseStream`
+  :param request: entrezpy request
+  :type  request: :class:`entrezpy.base.request.EutilsRequest`
+  :param list failed_requests: failed requests of the query
+  :param lock: lock of the analyzer
+  :type  lock: :class:`threading.Lock`
+  :param process_parser: process parser or None
+  :type  process_parser: :class:`ProcessParser`
+  """
+  if not isProcessParsed(process_parser, analyzer) or not isinstance(response, str):
+    with lock:
+      entrezpy.requester.responsestream.parse_response(analyzer, response, request,
+                                                      failed_requests)
+      entrezpy.requester.journal.record_request(analyzer, request)
+    return
+  partial = process_parser.parse(analyzer, response, request)
+  with lock:
+    analyzer.merge_partial(partial, request)
+    entrezpy.requester.journal.record_request(analyzer, request)
+
+
+def isProcessParsed(process_parser, analyzer):
+  """Tests if responses for an analyzer are parsed in worker processes
+
+  :rtype: bool
+  """
+  return process_parser is not None and analyzer.process_parse
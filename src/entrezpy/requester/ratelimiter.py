@@ -0,0 +1,128 @@
+"""
+..
+  Copyright 2020 The University of Sydney
+  This file is part of entrezpy.
+
+  Entrezpy is free software: you can redistribute it and/or modify it under the
+  terms of the GNU Lesser General Public License as published by the Free
+  Software Foundation, either version 3 of the License, or (at your option) any
+  later version.
+
+  Entrezpy is distributed in the hope that it will be useful, but WITHOUT ANY
+  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+  A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with entrezpy.  If not, see <https://www.gnu.org/licenses/>.
+
+.. module:: entrezpy.requester.ratelimiter
+  :synopsis: Exports class RateLimiter implementing a token bucket shared by
+    all entrezpy queries using the same NCBI API key.
+"""
+
+
+import threading
+import time
+
+import entrezpy.log.logger
+
+
+class RateLimiter:
+  """RateLimiter implements a token bucket admitting requests at the rate
+  allowed by NCBI. One limiter exists per NCBI API key, or for anonymous
+  requests, and is shared by every query, request pool and Conduit in the
+  process. Use :meth:`.get_limiter` to obtain it.
+
+  A request takes one token. Tokens refill continuously at :attr:`rate` up to
+  :attr:`capacity`. If no token is available, the caller reserves the next
+  free one and waits until it is due. Reservations are handed out in order,
+  i.e. concurrent callers are spaced evenly at the allowed rate. A request
+  finding a token waits not at all.
+
+  :param float rate: admitted requests per second
+  :param int capacity: maximum number of stored tokens (burst size)
+  """
+
+  limiters = {}
+  """Limiters by API key"""
+
+  registry_lock = threading.Lock()
+
+  anonymous = 'anonymous'
+  """Key for requests without API key"""
+
+  def __init__(self, rate, capacity=1):
+    self.rate = rate
+    self.capacity = capacity
+    self.tokens = capacity
+    self.timestamp = time.monotonic()
+    self.lock = threading.Lock()
+    self.admitted = 0
+    self.delayed = 0
+    self.logger = entrezpy.log.logger.get_class_logger(RateLimiter)
+
+  @classmethod
+  def get_limiter(cls, apikey, rate):
+    """Returns the process-wide limiter for an API key and creates it if
+    required. An existing limiter adopts a changed rate, e.g. after
+    setting an API key.
+
+    :param str apikey: NCBI API key or None for anonymous requests
+    :param float rate: allowed requests per second for this key
+    :rtype: :class:`RateLimiter`
+    """
+    key = apikey if apikey else cls.anonymous
+    with cls.registry_lock:
+      if key not in cls.limiters:
+        cls.limiters[key] = cls(rate)
+      elif cls.limiters[key].rate != rate:
+        cls.limiters[key].set_rate(rate)
+      return cls.limiters[key]
+
+  def set_rate(self, rate):
+    """Changes the admitted requests per second.
+
+    :param float rate: requests per second
+    """
+    with self.lock:
+      self.refill()
+      self.rate = rate
+    self.logger.debug({'rate':rate})
+
+  def refill(self):
+    """Adds tokens accumulated since the last refill. Requires :attr:`lock`."""
+    now = time.monotonic()
+    self.tokens = min(self.capacity, self.tokens + (now - self.timestamp) * self.rate)
+    self.timestamp = now
+
+  def reserve(self):
+    """Takes one token and returns the time until it is due. A negative token
+    balance represents tokens reserved by waiting callers.
+
+    :return: wait time in seconds, 0 if a token was available
+    :rtype: float
+    """
+    with self.lock:
+      self.refill()
+      self.tokens -= 1
+      self.admitted += 1
+      if self.tokens >= 0:
+        return 0
+      self.delayed += 1
+      return -self.tokens / self.rate
+
+  def acquire(self):
+    """Blocks until a request is admitted.
+
+    :return: time waited in seconds
+    :rtype: float
+    """
+    wait = self.reserve()
+    if wait > 0:
+      time.sleep(wait)
+    return wait
+
+  def dump(self):
+    """:rtype: dict"""
+    return {'rate':self.rate, 'capacity':self.capacity,
+            'admitted':self.admitted, 'delayed':self.delayed}
@@ -24,9 +24,8 @@
 
 import http
 import sys
-import random
-import json
 import time
+import queue
 import socket
 import logging
 import urllib.parse
@@ -35,6 +34,14 @@ import urllib.error
 import http.client as httplib
 import ssl
 
+import entrezpy.requester.connectionpool
+import entrezpy.requester.ratelimiter
+import entrezpy.requester.concurrency
+import entrezpy.requester.hedging
+import entrezpy.requester.responsestream
+import entrezpy.requester.retrypolicy
+import entrezpy.requester.singleflight
+import entrezpy.requester.workerpool
 import entrezpy.log.logger
 
 
@@ -46,110 +53,404 @@ class Requester:
   due to timeout. The initial timeout is increased insteps until the maximum
   timeout has been reached.
 
-  :param float wait: wait time in seconds between requests
+  Requests are admitted by a :class:`entrezpy.requester.ratelimiter.RateLimiter`
+  before each try. Only failed tries wait additionally before retrying, as
+  given by the :class:`entrezpy.requester.retrypolicy.RetryPolicy`:
+  exponential backoff with jitter or the `Retry-After` of 429 and 503
+  responses. Retries are limited per request and by the
+  :class:`entrezpy.requester.retrypolicy.RetryBudget` of the query. Tries
+  wait while the :class:`entrezpy.requester.retrypolicy.CircuitBreaker` of
+  their endpoint is open.
+
+  :param float wait: minimum time in seconds between requests if no rate
+    limiter is given
   :param int max_retries: number of rertries before giving up.
   :param int init_timeout: number of seconds before the initial request is consid
                            considered a timeout error
   :param int timeout_max: maximum requet timeout before giving up
   :param int timeout_steps: increase value for timeout errors
+  :param connection_pool: persistent connections, default is the process-wide
+    pool :meth:`entrezpy.requester.connectionpool.ConnectionPool.get_shared`
+  :type  connection_pool: :class:`entrezpy.requester.connectionpool.ConnectionPool`
+  :param ratelimiter: shared rate limiter, see
+    :meth:`entrezpy.requester.ratelimiter.RateLimiter.get_limiter`
+  :type  ratelimiter: :class:`entrezpy.requester.ratelimiter.RateLimiter`
+  :param cache: response cache looked up before the rate limiter
+  :type  cache: :class:`entrezpy.requester.cache.ResponseCache`
+  :param cache_stats: cache statistics of the query using this requester
+  :type  cache_stats: :class:`entrezpy.requester.cache.CacheStats`
+  :param cassette: cassette recording all tries or replaying responses
+    instead of sending requests
+  :type  cassette: :class:`entrezpy.requester.cassette.Cassette`
+  :param retry_policy: backoff, retry limits and circuit breakers, default is
+    a policy with `max_retries`
+  :type  retry_policy: :class:`entrezpy.requester.retrypolicy.RetryPolicy`
+  :param concurrency: adaptive limit of tries in flight for the API key
+  :type  concurrency: :class:`entrezpy.requester.concurrency.ConcurrencyController`
+  :param hedge_policy: hedging of small idempotent requests, disabled if None.
+    Hedged tries run on `worker_pool` and are not recorded by a cassette.
+  :type  hedge_policy: :class:`entrezpy.requester.hedging.HedgePolicy`
+  :param single_flight: coalescing of identical requests in flight, disabled
+    if None or with a cassette
+  :type  single_flight: :class:`entrezpy.requester.singleflight.SingleFlight`
+  :param worker_pool: pool running hedged tries, default is the process-wide
+    pool
+  :type  worker_pool: :class:`entrezpy.requester.workerpool.WorkerPool`
   """
 
-  def __init__(self, wait, max_retries=20, init_timeout=90, timeout_max=180, timeout_step=5):
+  def __init__(self, wait, max_retries=20, init_timeout=90, timeout_max=180,
+               timeout_step=5, connection_pool=None, ratelimiter=None, cache=None,
+               cache_stats=None, cassette=None, retry_policy=None, concurrency=None,
+               hedge_policy=None, single_flight=None, worker_pool=None):
     self.wait = wait
-    self.max_retries = max_retries
+    self.retry_policy = retry_policy
+    if self.retry_policy is None:
+      self.retry_policy = entrezpy.requester.retrypolicy.RetryPolicy(max_retries)
+    self.max_retries = self.retry_policy.max_retries
+    self.concurrency = concurrency
+    self.hedge_policy = hedge_policy
+    self.single_flight = single_flight
+    self.worker_pool = worker_pool
     self.init_timeout = init_timeout
     self.timeout_max = timeout_max
     self.timeout_step = timeout_step
+    self.connection_pool = connection_pool
+    if self.connection_pool is None:
+      self.connection_pool = entrezpy.requester.connectionpool.ConnectionPool.get_shared()
+    self.ratelimiter = ratelimiter
+    if self.ratelimiter is None:
+      self.ratelimiter = entrezpy.requester.ratelimiter.RateLimiter(1/self.wait)
+    self.cache = cache
+    self.cache_stats = cache_stats
+    self.cassette = cassette
     self.logger = entrezpy.log.logger.get_class_logger(Requester)
-    self.logger.debug(json.dumps({'init':{'wait[s]':self.wait,
-                                          'timeout[s]':self.init_timeout,
-                                          'timeoutMax[s]':self.timeout_max,
-                                          'timeoutStep[s]':self.timeout_step,
-                                          'retries':self.max_retries}}))
+    self.logger.debug({'init':{'wait[s]':self.wait,
+                               'timeout[s]':self.init_timeout,
+                               'timeoutMax[s]':self.timeout_max,
+                               'timeoutStep[s]':self.timeout_step,
+                               'retries':self.max_retries}})
+
+  def request(self, req, stream=False):
+    """Request the request. With :attr:`single_flight`, requests identical
+    to a request in flight wait for its response instead of being sent.
+
+    :param req: entrezpy request
+    :type  req: :class:`entrezpy.base.request.EutilsRequest`
+    :param bool stream: return the response body as stream which is read while
+      parsing instead of downloading it completely. Cacheable, coalesced and
+      recorded responses are always downloaded completely.
+    :return: decoded response, response stream or None if request failed
+    :rtype: str or :class:`entrezpy.requester.responsestream.ResponseStream`
+    """
+    parameter = req.get_post_parameter()
+    if self.single_flight is None or self.cassette is not None or \
+       not self.single_flight.isCoalescable(req, parameter):
+      return self.send(req, parameter, stream)
+    return self.single_flight.call(req, parameter, self.send, req, parameter)
 
-  def request(self, req):
-    """Request the request
+  def send(self, req, parameter, stream=False):
+    """Sends a request, retrying failed tries, unless its response is cached
+    or replayed
 
     :param req: entrezpy request
     :type  req: :class:`entrezpy.base.request.EutilsRequest`
+    :param dict parameter: POST parameters
+    :param bool stream: return the response body as stream
+    :return: decoded response, response stream or None if request failed
+    :rtype: str or :class:`entrezpy.requester.responsestream.ResponseStream`
     """
     retries = 0
     req_timeout = self.init_timeout
-    data = urllib.parse.urlencode(req.get_post_parameter(),
-                                  doseq=req.doseq).encode('utf-8')
+    data = urllib.parse.urlencode(parameter, doseq=req.doseq).encode('utf-8')
     req.qry_url = data.decode()
+    if self.cassette is not None and self.cassette.isReplaying():
+      return self.cassette.play(req, parameter)
+    if self.cassette is not None:
+      stream = False
+    cache_key = None
+    if self.cache is not None:
+      cache_key, body = self.cache.lookup(req, parameter, self.cache_stats)
+      if body is not None:
+        req.set_status_success()
+        req.set_transfer_size(0, len(body))
+        req.cached = True
+        if self.cassette is not None:
+          self.cassette.record_try(req, parameter, 200, None, body, time.time(), 0)
+        return body.decode('utf-8')
+      stream = stream and cache_key is None
+    isHedged = self.hedge_policy is not None and self.cassette is None and \
+               self.hedge_policy.isHedgeable(req, parameter)
+    if isHedged:
+      stream = False
     response = None
+    breaker = self.retry_policy.get_breaker(req.url)
     while retries < self.max_retries:
-      self.logger.debug(json.dumps({'try':retries}))
-      wait = self.wait
+      self.logger.debug({'try':retries})
+      retry_after = None
+      outcome = entrezpy.requester.concurrency.ConcurrencyController.overload
+      self.wait_for_breaker(breaker)
+      if self.concurrency is not None:
+        self.concurrency.acquire()
+      self.ratelimiter.acquire()
+      start = time.monotonic()
       try:
-        self.logger.debug(json.dumps({'request':{'qry-url':req.qry_url,
-                                                 'req-id':req.id,
-                                                 'req-query':req.query_id,
-                                                 'req-url':req.url,
-                                                 'try' : retries}}))
+        self.logger.debug({'request':{'qry-url':req.qry_url,
+                                      'req-id':req.id,
+                                      'req-query':req.query_id,
+                                      'req-url':req.url,
+                                      'try' : retries}})
         req.set_status_success()
-        response = urllib.request.urlopen(urllib.request.Request(req.url,data=data),
-                                          timeout=req_timeout)
-        response = response.read().decode('utf-8')
+        if isHedged:
+          response = self.hedged_post(req, parameter, data, req_timeout)
+        else:
+          response = self.post(req, parameter, data, req_timeout, stream)
+        if not stream:
+          body = response
+          response = body.decode('utf-8')
+          if cache_key is not None:
+            self.cache.store(cache_key, body, self.cache_stats)
       except urllib.error.HTTPError as http_err:
         log_msg = {'code' : http_err.code, 'reason' : http_err.reason}
         req.set_request_error(http_err.reason)
         if http_err.code == 400: # Bad request form, stop right now
           log_msg.update({'action':'abort'})
-          sys.exit(self.logger.error(json.dumps({'HTTP-error':log_msg})))
-        log_msg.update({'action' : 'retry'})
-        self.logger.warning(json.dumps({'HTTP-error':log_msg}))
+          self.record_try(breaker, start,
+                          entrezpy.requester.concurrency.ConcurrencyController.neutral)
+          sys.exit(self.logger.error({'HTTP-error':log_msg}))
+        retry_after = self.retry_policy.get_retry_after(http_err)
+        if http_err.code < 500 and http_err.code != 429:
+          outcome = entrezpy.requester.concurrency.ConcurrencyController.neutral
+        log_msg.update({'action' : 'retry', 'retry-after':retry_after})
+        self.logger.warning({'HTTP-error':log_msg})
         retries += 1
-        wait = random.randint(1, 3)
       except socket.gaierror:
-        self.logger.warning(json.dumps({'socket.gaierror':{'action':'retry'}}))
+        self.logger.warning({'socket.gaierror':{'action':'retry'}})
         retries += 1
-        wait = random.randint(2, 4)
       except urllib.error.URLError as url_err:
         # req.set_request_error(url_err.reason) TODO: fix json not serializing error objects
         req.set_request_error("urllib.error.URLError")
-        self.logger.error(json.dumps({'urllib.error.URLError': {'action':'retry'}}))
+        self.logger.error({'urllib.error.URLError': {'action':'retry'}})
         retries += 1
-        wait = random.randint(1, 3)
       except socket.timeout:
         req_timeout += self.timeout_step
-        self.logger.warning(json.dumps({'timeout':{'action':'retry'}}))
-        self.logger.debug(json.dumps({'timeout':{'action':'retry',
-                                                 'wait':wait,
-                                                 'timeout':req_timeout,
-                                                 'step':self.timeout_step}}))
+        self.logger.warning({'timeout':{'action':'retry'}})
+        self.logger.debug({'timeout':{'action':'retry',
+                                      'timeout':req_timeout,
+                                      'step':self.timeout_step}})
         retries += 1
         if req_timeout > self.timeout_max:
-          self.logger.warning(json.dumps({'maxTimeout':{'action':'giving up request'}}))
-          self.logger.debug(json.dumps({'maxTimeout':{'action':'giving up',
-                                                      'timeout':req_timeout}}))
+          self.record_try(breaker, start,
+                          entrezpy.requester.concurrency.ConcurrencyController.overload)
+          self.logger.warning({'maxTimeout':{'action':'giving up request'}})
+          self.logger.debug({'maxTimeout':{'action':'giving up',
+                                           'timeout':req_timeout}})
           req.set_request_error("maxTimeout")
           return None
       except httplib.IncompleteRead:
-          self.logger.warning(json.dumps({'httplib.IncompleteRead':{'action':'retry'}}))
+          self.logger.warning({'httplib.IncompleteRead':{'action':'retry'}})
           retries += 1
-          wait = random.randint(1, 3)
       except ssl.SSLError:
-          self.logger.warning(json.dumps({'ssl.SSLError':{'action':'retry'}}))
+          self.logger.warning({'ssl.SSLError':{'action':'retry'}})
           retries += 1
-          wait = random.randint(1, 3)
       except http.client.RemoteDisconnected:
-          self.logger.warning(json.dumps({'http.client.RemoteDisconnected':{'action':'retry'}}))
+          self.logger.warning({'http.client.RemoteDisconnected':{'action':'retry'}})
+          retries += 1
+      except entrezpy.requester.responsestream.ResponseStreamError as stream_err:
+          self.logger.warning({'ResponseStreamError':{'error':str(stream_err),
+                                                      'action':'retry'}})
           retries += 1
-          wait = random.randint(3, 5)
       else:
+        self.record_try(breaker, start,
+                        entrezpy.requester.concurrency.ConcurrencyController.success)
         return response
-      finally:
-        time.sleep(wait)
+      self.record_try(breaker, start, outcome)
+      if retries < self.max_retries:
+        if not self.spend_retry(req):
+          return None
+        time.sleep(self.retry_policy.backoff(retries, retry_after))
     # Should print this only if while failed
-    self.logger.error(json.dumps({'maxRetry':{'action':'giving up request'}}))
-    self.logger.debug(json.dumps({'maxRetry':{'retries':retries,
-                                              'action':'giving up request',
-                                              'max':self.max_retries}}))
+    self.logger.error({'maxRetry':{'action':'giving up request'}})
+    self.logger.debug({'maxRetry':{'retries':retries,
+                                   'action':'giving up request',
+                                   'max':self.max_retries}})
     req.set_request_error("maxRetry")
     return None
 
+  def wait_for_breaker(self, breaker):
+    """Waits until the circuit breaker of the endpoint admits a try
+
+    :param breaker: circuit breaker or None
+    :type  breaker: :class:`entrezpy.requester.retrypolicy.CircuitBreaker`
+    """
+    if breaker is None:
+      return
+    wait = breaker.admit()
+    while wait > 0:
+      self.logger.debug({'circuit breaker':{'endpoint':breaker.endpoint, 'wait':wait}})
+      time.sleep(wait)
+      wait = breaker.admit()
+
+  def record_try(self, breaker, start, outcome):
+    """Reports a try to the circuit breaker of the endpoint and releases its
+    slot of the concurrency controller
+
+    :param breaker: circuit breaker or None
+    :type  breaker: :class:`entrezpy.requester.retrypolicy.CircuitBreaker`
+    :param float start: start of the try after admission, see
+      :func:`time.monotonic`
+    :param str outcome: outcome of the try, see
+      :class:`entrezpy.requester.concurrency.ConcurrencyController`
+    """
+    if self.concurrency is not None:
+      self.concurrency.release(start, outcome)
+    if breaker is None:
+      return
+    if outcome == entrezpy.requester.concurrency.ConcurrencyController.overload:
+      breaker.record_failure()
+    else:
+      breaker.record_success()
+
+  def spend_retry(self, req):
+    """Spends one retry from the budget of the query of a request. Marks
+    the request as failed if the budget is spent.
+
+    :param req: entrezpy request
+    :type  req: :class:`entrezpy.base.request.EutilsRequest`
+    :return: True if the request can be retried
+    :rtype: bool
+    """
+    if req.retry_budget is None or req.retry_budget.spend():
+      return True
+    self.logger.error({'retryBudget':{'action':'giving up request', 'query':req.query_id,
+                                      'budget':req.retry_budget.dump()}})
+    req.set_request_error("retryBudget")
+    return False
+
+  def hedged_post(self, req, parameter, data, timeout):
+    """Sends one try of a hedged request. If no response arrived within the
+    hedge delay, a duplicate try is admitted, see :meth:`admit_hedge`, and
+    sent. The first successful response is returned and the other try
+    cancelled. Tries run on :attr:`worker_pool`, which is unbounded, i.e.
+    the calling worker can wait for them.
+
+    :param req: entrezpy request
+    :type  req: :class:`entrezpy.base.request.EutilsRequest`
+    :param dict parameter: POST parameters
+    :param bytes data: urlencoded POST parameters
+    :param float timeout: request timeout
+    :return: decompressed response body
+    :rtype: bytes
+    :raises: error of the first try if both tries failed
+    """
+    results = queue.SimpleQueue()
+    tries = [entrezpy.requester.hedging.HedgedTry()]
+    worker_pool = self.worker_pool
+    if worker_pool is None:
+      worker_pool = entrezpy.requester.workerpool.WorkerPool.get_shared()
+    worker_pool.submit(self.run_hedged_try, tries[0], results, req, parameter, data, timeout)
+    try:
+      done = results.get(timeout=self.hedge_policy.get_delay(req.eutil))
+    except queue.Empty:
+      if self.admit_hedge(req):
+        tries.append(entrezpy.requester.hedging.HedgedTry())
+        worker_pool.submit(self.run_hedged_try, tries[1], results, req, parameter, data,
+                           timeout, True)
+        self.hedge_policy.count(hedged=1)
+        self.logger.debug(lambda: {'hedge':{'req-id':req.id, 'req-query':req.query_id,
+                                            'delay':self.hedge_policy.get_delay(req.eutil)}})
+      done = results.get()
+    received = 1
+    while done.error is not None and received < len(tries):
+      done = results.get()
+      received += 1
+    cancelled = sum(1 for i in tries if i is not done and i.cancel())
+    self.hedge_policy.count(wins=int(done is not tries[0]), cancelled=cancelled)
+    if done.error is not None:
+      raise tries[0].error
+    self.hedge_policy.record_latency(req.eutil, done.duration)
+    return done.body
+
+  def admit_hedge(self, req):
+    """Admits the duplicate try of a hedged request. The duplicate takes a
+    slot of the concurrency controller, if any, and is not sent if none is
+    free. It is admitted by the rate limiter afterwards.
+
+    :param req: entrezpy request
+    :type  req: :class:`entrezpy.base.request.EutilsRequest`
+    :return: True if the duplicate try can be sent
+    :rtype: bool
+    """
+    if self.concurrency is not None and not self.concurrency.try_acquire():
+      self.logger.debug({'hedge':{'req-id':req.id, 'req-query':req.query_id,
+                                  'action':'skip', 'reason':'concurrency window full'}})
+      return False
+    self.ratelimiter.acquire()
+    return True
+
+  def run_hedged_try(self, hedged_try, results, req, parameter, data, timeout,
+                     isDuplicate=False):
+    """Runs one try of a hedged request and puts it into `results` once
+    completed. A duplicate try releases its slot of the concurrency
+    controller taken by :meth:`admit_hedge`.
+
+    :param hedged_try: try
+    :type  hedged_try: :class:`entrezpy.requester.hedging.HedgedTry`
+    :param results: completed tries
+    :type  results: :class:`queue.SimpleQueue`
+    :param bool isDuplicate: try is the duplicate of a hedged request
+    """
+    start = time.monotonic()
+    try:
+      hedged_try.complete(self.post(req, parameter, data, timeout, False, hedged_try), None,
+                          time.monotonic()-start)
+    except Exception as err:
+      hedged_try.complete(None, err, time.monotonic()-start)
+    if isDuplicate and self.concurrency is not None:
+      outcome = entrezpy.requester.concurrency.ConcurrencyController.neutral
+      if not hedged_try.isCancelled:
+        outcome = entrezpy.requester.concurrency.ConcurrencyController.get_outcome(
+          hedged_try.error)
+      self.concurrency.release(start, outcome)
+    results.put(hedged_try)
+
+  def post(self, req, parameter, data, timeout, stream, hedged_try=None):
+    """Sends one try of a request and records it if a recording
+    :attr:`cassette` is set.
+
+    :param req: entrezpy request
+    :type  req: :class:`entrezpy.base.request.EutilsRequest`
+    :param dict parameter: POST parameters
+    :param bytes data: urlencoded POST parameters
+    :param float timeout: request timeout
+    :param bool stream: return the response stream
+    :param hedged_try: try of a hedged request
+    :type  hedged_try: :class:`entrezpy.requester.hedging.HedgedTry`
+    :return: decompressed response body or response stream
+    :rtype: bytes or :class:`entrezpy.requester.responsestream.ResponseStream`
+    """
+    start = time.time()
+    try:
+      response = self.connection_pool.post(req.url, data, timeout, stream=stream,
+                                           hedged_try=hedged_try)
+      if stream:
+        return response
+      body = response.read()
+      req.set_transfer_size(response.bytes_read, response.bytes_decoded)
+      response.close()
+    except urllib.error.HTTPError as http_err:
+      if self.cassette is not None:
+        self.cassette.record_try(req, parameter, http_err.code, http_err.headers, None,
+                                 start, time.time()-start, http_err.reason)
+      raise
+    except Exception as err:
+      if self.cassette is not None:
+        self.cassette.record_try(req, parameter, None, None, None, start,
+                                 time.time()-start, type(err).__name__)
+      raise
+    if self.cassette is not None:
+      self.cassette.record_try(req, parameter, 200, response.response.headers, body, start,
+                               time.time()-start)
+    return body
 
   def run_one_request(self, request, monitor):
     """
@@ -163,6 +464,6 @@ class Requester:
     o.observe(request)
     response = self.request(request)
     request.calc_duration()
-    o.processed_requests += 1
+    o.complete(request)
     self.logger.debug((response, response.status, response.read(), response.read().decode('utf-8')))
     return response
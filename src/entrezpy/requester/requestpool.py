@@ -7,68 +7,219 @@
 
 
 import sys
-import atexit
-import json
 import signal
 import queue
+import collections
 import time
 import threading
 
+import entrezpy.requester.processparser
 import entrezpy.requester.threadedrequest
+import entrezpy.requester.workerpool
 import entrezpy.log.logger
 
 
 class RequestPool:
-  """ Threading Pool for requests. This class inits the threading pool,
-  adds requests waits until all threads finish. A request consist of a tuple
-  with the request and corresponding analyzer. Failed requests are stored
-  separately to handle them later. If the number of threads is 0, use
+  """ Threading Pool for requests. This class adds requests and waits until
+  all of them finish. A request consist of a tuple with the request and
+  corresponding analyzer. Failed requests are stored separately to handle
+  them later. If the number of threads is 0, use
   :meth:`entrezpy.base.query.EutilsQuery.RequestPool.run_single`. Otherwise,
-  call :class:`entrezpy.base.query.EutilsQuery.ThreadedRequester`
-  This is useful in cases where analyzers are calling not thread-safe methods
-  or classes, e.g. Sqlite3
+  up to `num_threads` workers send requests with
+  :class:`entrezpy.requester.threadedrequest.ThreadedRequester`.
+  Single-threaded mode is useful in cases where analyzers are calling not
+  thread-safe methods or classes, e.g. Sqlite3
+
+  Workers run on the process-wide
+  :class:`entrezpy.requester.workerpool.WorkerPool` shared by all queries
+  instead of threads owned by the query. A worker is submitted when a request
+  is added and fewer than `num_threads` workers of this pool are running, and
+  returns its thread to the shared pool once no request is left. Queries
+  therefore neither start nor leak threads, and :meth:`drain` waits on a
+  :class:`entrezpy.requester.workerpool.CompletionBarrier` counting the
+  requests of this pool.
+
+  With `parse_threads` the pool runs as two stages: `num_threads` network
+  workers only download responses and put them into a bounded queue of
+  `parse_queue_size` responses, and `parse_threads`
+  :class:`entrezpy.requester.threadedrequest.ThreadedParser` workers parse
+  them. Network workers are not blocked by slow analyzers until the queue is
+  full, which throttles downloading when parsing falls behind. Responses are
+  downloaded completely in this mode, i.e. not streamed.
+
+  Responses of analyzers setting
+  :attr:`entrezpy.base.analyzer.EutilsAnalyzer.stream_response` are streamed
+  in single-threaded mode and by a single network worker. Concurrent workers
+  download them completely since a streamed response is read while holding
+  the analyzer lock.
+
+  With a `process_parser`, responses for analyzers supporting it are parsed
+  in worker processes by
+  :class:`entrezpy.requester.processparser.ProcessParser` and merged into the
+  analyzer afterwards.
   """
 
-  def __init__(self, num_threads, failed_requests, monitor, requester):
+  def __init__(self, num_threads, failed_requests, monitor, requester, parse_threads=0,
+               parse_queue_size=None, process_parser=None, worker_pool=None, stop_event=None):
     """
-    Initiates a threading pool with a given number of threads.
+    Initiates a request pool with a given number of threads.
 
-    :param int num_threads: number of threads
+    :param int num_threads: number of concurrent requests
     :param reference failed_requests:
       :attr:`entrezpy.base.query.EutilsQuery.failed_requests`
+    :param int parse_threads: number of parse workers, 0 to parse in the
+      network workers
+    :param int parse_queue_size: maximum number of downloaded responses
+      waiting for parsing, default is twice the number of network workers
+    :param process_parser: parser for responses in worker processes
+    :type  process_parser: :class:`entrezpy.requester.processparser.ProcessParser`
+    :param worker_pool: pool running the workers, default is the process-wide
+      pool
+    :type  worker_pool: :class:`entrezpy.requester.workerpool.WorkerPool`
+    :raises TypeError: if `worker_pool` is no
+      :class:`entrezpy.requester.workerpool.WorkerPool`
+    :param stop_event: event stopping the workers, set by the SIGINT handler
+      of its owner, e.g. :class:`entrezpy.session.Session`. If None, the pool
+      creates one and installs its own SIGINT handler.
+    :type  stop_event: :class:`threading.Event`
     :ivar requests: request queue
-    :type requests: :class:`queue.Queue`
+    :type requests: :class:`collections.deque`
+    :ivar responses: response queue between network and parse workers or None
+    :type responses: :class:`queue.Queue`
+    :ivar barrier: outstanding requests of threaded queries
+    :type barrier: :class:`entrezpy.requester.workerpool.CompletionBarrier`
     """
-    self.requests = queue.Queue(num_threads)
+    self.requests = collections.deque()
     self.failed_requests = failed_requests
     self.requester = requester
     self.monitor = monitor
     self.threads = num_threads
-    self.stop_event = threading.Event()
+    self.parse_threads = parse_threads if num_threads > 0 else 0
+    self.process_parser = process_parser
+    self.worker_pool = worker_pool
+    self.responses = None
+    if self.parse_threads > 0:
+      self.responses = queue.Queue(parse_queue_size if parse_queue_size else 2*num_threads)
+    self.barrier = entrezpy.requester.workerpool.CompletionBarrier()
+    self.workers = {'network':0, 'parse':0}
+    self.stop_event = stop_event
     self.logger = entrezpy.log.logger.get_class_logger(RequestPool)
     self.lock = threading.Lock()
-    atexit.register(self.destructor)
+    self.analyzer_locks = {}
+    self.requester_worker = None
+    self.parser_worker = None
     if self.useThreads():
-      self.dispatch_workers()
-    signal.signal(signal.SIGINT, self.sigint_handler)
+      self.init_workers()
+    if self.stop_event is None:
+      self.stop_event = threading.Event()
+      if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGINT, self.sigint_handler)
 
   def useThreads(self):
     if self.threads > 0:
       return True
     return False
 
-  def dispatch_workers(self):
-    for _ in range(self.threads):
-      w = entrezpy.requester.threadedrequest.ThreadedRequester(
-          self.requests, self.failed_requests, self.monitor, self.requester, self.stop_event, self.lock)
+  def init_workers(self):
+    """Inits the network and parse workers and the shared worker pool"""
+    if self.worker_pool is None:
+      self.worker_pool = entrezpy.requester.workerpool.WorkerPool.get_shared()
+    entrezpy.requester.workerpool.check_pool(self.worker_pool)
+    self.requester_worker = entrezpy.requester.threadedrequest.ThreadedRequester(
+        self.failed_requests, self.monitor, self.requester, self.get_lock, self.responses,
+        self.process_parser, self.threads == 1)
+    if self.parse_threads > 0:
+      self.parser_worker = entrezpy.requester.threadedrequest.ThreadedParser(
+          self.failed_requests, self.monitor, self.get_lock, self.process_parser)
+    self.logger.debug({'threading workers':'initialized', 'network':self.threads,
+                       'parse':self.parse_threads})
+
+  def dispatch_worker(self, stage):
+    """Submits a worker for a stage to the worker pool unless the maximum
+    number of workers for the stage is running.
+
+    :param str stage: `network` or `parse`
+    """
+    with self.lock:
+      if self.workers[stage] >= (self.threads if stage == 'network' else self.parse_threads):
+        return
+      self.workers[stage] += 1
+    if stage == 'network':
+      self.worker_pool.submit(self.run_worker, stage, self.take_request,
+                              self.requester_worker.run_one_request)
+    else:
+      self.worker_pool.submit(self.run_worker, stage, self.take_response,
+                              self.parser_worker.parse_one_response)
+
+  def take_request(self):
+    """Returns the next request tuple or None if no request is left"""
+    return self.requests.popleft() if self.requests else None
+
+  def take_response(self):
+    """Returns the next downloaded response tuple or None if none is left"""
+    try:
+      return self.responses.get_nowait()
+    except queue.Empty:
+      return None
+
+  def run_worker(self, stage, take, process):
+    """Processes items of one stage until none is left. Taking an item and
+    leaving when none is left are atomic with respect to
+    :meth:`dispatch_worker`, i.e. no item is left without worker.
+
+    :param str stage: `network` or `parse`
+    :param callable take: returns the next argument tuple for `process` or
+      None if no item is left
+    :param callable process: processes one item and returns True if the
+      request has been passed to the next stage
+    """
+    while True:
+      with self.lock:
+        item = take()
+        if item is None:
+          self.workers[stage] -= 1
+          return
+      handed_over = False
       try:
-        w.start()
-        self.logger.debug(json.dumps({'thread':w.name, 'status':'started'}))
-      except RuntimeError as e:
-        sys.exit(self.logger.error(json.dumps({'thread':'failed to start', 'status':'failed', 'error' : str(e)}))
-)
+        if self.stop_event.is_set():
+          self.logger.info({'received stop signal':'aborting'})
+        else:
+          handed_over = process(*item)
+          if handed_over:
+            self.dispatch_worker('parse')
+      except BaseException as err:
+        self.logger.error({'worker':stage, 'failed':repr(err)})
+        self.fail_request(item[0] if stage == 'network' else item[1], err)
+      finally:
+        if not handed_over:
+          self.barrier.done()
+
+  def fail_request(self, request, err):
+    """Marks a request as failed after an error in a worker, e.g. a failing
+    analyzer, and stores it in the failed requests of the query.
+
+    :param request: entrezpy request
+    :type  request: :class:`entrezpy.base.request.EutilsRequest`
+    :param err: error raised in the worker
+    :type  err: BaseException
+    """
+    request.set_request_error(repr(err))
+    with self.lock:
+      self.failed_requests.append(request)
 
-    self.logger.debug(json.dumps({'threading workers':'dispatched'}))
+  def get_lock(self, analyzer):
+    """Returns the lock serializing parsing for one analyzer. Workers send
+    requests concurrently and hold this lock only while merging a response
+    into the analyzer.
+
+    :param analyzer: entrezpy analyzer instance
+    :type  analyzer: :class:`entrezpy.base.analyzer.EutilsAnalyzer`
+    :rtype: :class:`threading.Lock`
+    """
+    with self.lock:
+      if id(analyzer) not in self.analyzer_locks:
+        self.analyzer_locks[id(analyzer)] = (analyzer, threading.Lock())
+      return self.analyzer_locks[id(analyzer)][1]
 
   def add_request(self, request, analyzer):
     """Adds one request into the threading pool as
@@ -79,33 +230,44 @@ class RequestPool:
     :param analyzer: entrezpy analyzer instance
     :type  analyzer: :class:`entrezpy.base.analyzer.EutilsAnalyzer`
     """
-    self.requests.put((request, analyzer))
+    if self.useThreads():
+      self.barrier.add()
+      self.requests.append((request, analyzer))
+      self.dispatch_worker('network')
+    else:
+      self.requests.append((request, analyzer))
 
   def drain(self):
     """Empty threading pool and wait until all requests finish"""
     if self.useThreads():
-      self.logger.debug(json.dumps({'threads':self.threads}))
-      self.logger.debug(json.dumps({'threads':'draining request pool'}))
-      self.requests.join()
+      self.logger.debug({'threads':self.threads})
+      self.logger.debug({'threads':'draining request pool'})
+      self.barrier.wait()
+      with self.lock:
+        self.analyzer_locks = {}
     else:
-      self.logger.debug(json.dumps({'threads':'none'}))
+      self.logger.debug({'threads':'none'})
       self.run_single()
+      with self.lock:
+        self.analyzer_locks = {}
 
   #def check_threads(self, stop_event):
     #while True:
       #for i in threading.enumerate():
-        #self.logger.debug(json.dumps({'threads':i}))
+        #self.logger.debug({'threads':i})
         #time.sleep(0.5)
 
   def run_single(self):
     """Run single threaded requests."""
-    while not self.requests.empty():
-      request, analyzer = self.requests.get()
-      response = self.run_one_request(request)
-      if response:
-        analyzer.parse(response, request)
-      else:
-        self.failed_requests.append(request)
+    while self.requests:
+      request, analyzer = self.requests.popleft()
+      stream = analyzer.stream_response and \
+               not entrezpy.requester.processparser.isProcessParsed(self.process_parser, analyzer)
+      response = self.run_one_request(request, stream)
+      entrezpy.requester.processparser.parse_locked(analyzer, response, request,
+                                                    self.failed_requests, self.get_lock(analyzer),
+                                                    self.process_parser)
+      self.monitor.get_observer(request.query_id).complete(request)
 
   def destructor(self):
     """ Shutdown all ongoing threads when exiting due to an error.
@@ -113,30 +275,32 @@ class RequestPool:
     .. note::
       Deamon processes don't always stop when the main
       program exits and hang aroud. atexit.register(self.desctructor) seems
-      to be a way to implement a dectructor. Currently not used.
+      to be a way to implement a dectructor. Currently not used. Workers
+      run on the shared :class:`entrezpy.requester.workerpool.WorkerPool`,
+      which is shut down at exit.
     """
     pass
 
   def sigint_handler(self, sigint, frame):
-    self.logger.debug(json.dumps({'sigint detected':'stopping threads'}))
+    self.logger.debug({'sigint detected':'stopping threads'})
     self.stop_event.set()
-    self.logger.debug(json.dumps({'sigint detected':'waiting for threads to stop'}))
+    self.logger.debug({'sigint detected':'waiting for threads to stop'})
     time.sleep(1)
-    sys.exit(self.logger.info(json.dumps({'sigint detected':'aborting'})))
+    sys.exit(self.logger.info({'sigint detected':'aborting'}))
 
 
-  def run_one_request(self, request):
+  def run_one_request(self, request, stream=False):
     """
     Processes one request from the queue and logs its progress.
 
     :param request: single entrezpy request
     :type  request: :class:`entrezpy.base.request.EutilsRequest`
+    :param bool stream: request response as stream
     """
     request.start_stopwatch()
     o = self.monitor.get_observer(request.query_id)
     o.observe(request)
-    response = self.requester.request(request)
+    response = self.requester.request(request, stream)
     request.calc_duration()
-    o.processed_requests += 1
     #self.logger.debug((response, response.status, response.read(), response.read().decode('utf-8')))
     return response
@@ -0,0 +1,261 @@
+"""
+..
+  Copyright 2020 The University of Sydney
+  This file is part of entrezpy.
+
+  Entrezpy is free software: you can redistribute it and/or modify it under the
+  terms of the GNU Lesser General Public License as published by the Free
+  Software Foundation, either version 3 of the License, or (at your option) any
+  later version.
+
+  Entrezpy is distributed in the hope that it will be useful, but WITHOUT ANY
+  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+  A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with entrezpy.  If not, see <https://www.gnu.org/licenses/>.
+
+.. module:: entrezpy.requester.responsestream
+  :synopsis: Exports class ResponseStream passing HTTP response bodies to
+    analyzers while they are downloaded and decompressed.
+"""
+
+
+import io
+import zlib
+import http.client
+
+import entrezpy.log.logger
+
+
+class ResponseStreamError(Exception):
+  """Raised if reading a streamed response fails, e.g. due to a dropped
+  connection. The original error is available as `__cause__`."""
+
+
+class ContentDecoder:
+  """ContentDecoder decompresses gzip or deflate encoded response bodies
+  incrementally. Unknown or missing encodings are passed unchanged.
+
+  :param str encoding: HTTP Content-Encoding
+  :ivar int bytes_in: number of encoded bytes
+  :ivar int bytes_out: number of decoded bytes
+  """
+
+  encodings = 'gzip, deflate'
+  """Accepted content encodings"""
+
+  def __init__(self, encoding=None):
+    self.encoding = encoding.lower().strip() if encoding else None
+    self.decompressor = None
+    if self.encoding in ('gzip', 'x-gzip'):
+      self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if self.encoding == 'deflate':
+      self.decompressor = zlib.decompressobj(zlib.MAX_WBITS)
+    self.bytes_in = 0
+    self.bytes_out = 0
+
+  def decode(self, chunk):
+    """Decodes one chunk of the body
+
+    :param bytes chunk: encoded bytes
+    :return: decoded bytes
+    :rtype: bytes
+    """
+    self.bytes_in += len(chunk)
+    if self.decompressor is None:
+      data = chunk
+    elif self.encoding == 'deflate' and self.bytes_in == len(chunk):
+      data = self.decode_deflate(chunk)
+    else:
+      data = self.decompressor.decompress(chunk)
+    self.bytes_out += len(data)
+    return data
+
+  def decode_deflate(self, chunk):
+    """Decodes the first deflate chunk. Some servers send raw deflate streams
+    without zlib header.
+
+    :rtype: bytes
+    """
+    try:
+      return self.decompressor.decompress(chunk)
+    except zlib.error:
+      self.decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+      return self.decompressor.decompress(chunk)
+
+  def flush(self):
+    """Returns remaining decoded bytes at the end of the body
+
+    :rtype: bytes
+    """
+    if self.decompressor is None:
+      return b''
+    data = self.decompressor.flush()
+    self.bytes_out += len(data)
+    return data
+
+
+class ResponseStream(io.RawIOBase):
+  """ResponseStream is a binary, read-only file object reading the body of an
+  HTTP response directly from the connection. Analyzers parse the body while
+  it is downloaded and only hold the chunk currently read in memory. Bodies
+  with gzip or deflate content encoding are decompressed while reading.
+
+  :meth:`peek` reads the beginning of the body ahead, e.g. to check for
+  E-Utilities errors, without consuming it. If the stream is closed before
+  the body has been read completely, the connection is closed since it cannot
+  be reused.
+
+  :param response: HTTP response with unread body
+  :type  response: :class:`http.client.HTTPResponse`
+  :param connection: connection receiving the response
+  :type  connection: :class:`http.client.HTTPConnection`
+  :param bytes body: encoded body if already read from the connection
+  :ivar decoder: content decoder counting received and decoded bytes
+  :type decoder: :class:`ContentDecoder`
+  """
+
+  chunk_size = 64 * 1024
+  """Number of bytes read at once by analyzers"""
+
+  def __init__(self, response, connection, body=None):
+    super().__init__()
+    self.response = response
+    self.connection = connection
+    self.decoder = ContentDecoder(response.getheader('Content-Encoding'))
+    self.ahead = bytearray()
+    self.eof = False
+    if body is not None:
+      try:
+        self.ahead += self.decoder.decode(body)
+        self.ahead += self.decoder.flush()
+      except zlib.error as err:
+        raise ResponseStreamError(type(err).__name__) from err
+      self.eof = True
+
+  def readable(self):
+    """:rtype: bool"""
+    return True
+
+  def fill(self, size):
+    """Reads and decodes up to `size` bytes from the connection into the
+    read-ahead buffer.
+
+    :return: False if the body has been read completely
+    :rtype: bool
+    :raises ResponseStreamError: if reading from the connection fails
+    """
+    if self.eof:
+      return False
+    try:
+      chunk = self.response.read(size)
+      if chunk:
+        self.ahead += self.decoder.decode(chunk)
+      else:
+        self.ahead += self.decoder.flush()
+        self.eof = True
+    except (http.client.HTTPException, OSError, zlib.error) as err:
+      self.connection.close()
+      raise ResponseStreamError(type(err).__name__) from err
+    return not self.eof
+
+  def readinto(self, buffer):
+    """Implements :meth:`io.RawIOBase.readinto`. Bytes read ahead by
+    :meth:`.peek` are returned first.
+
+    :raises ResponseStreamError: if reading from the connection fails
+    """
+    while not self.ahead and self.fill(max(len(buffer), ResponseStream.chunk_size)):
+      pass
+    size = min(len(buffer), len(self.ahead))
+    buffer[:size] = self.ahead[:size]
+    del self.ahead[:size]
+    return size
+
+  def readall(self):
+    """Reads the remaining body at once
+
+    :rtype: bytes
+    """
+    while self.fill(ResponseStream.chunk_size):
+      pass
+    data = bytes(self.ahead)
+    self.ahead = bytearray()
+    return data
+
+  def peek(self, size=None):
+    """Reads up to `size` decoded bytes ahead and returns them without
+    consuming them.
+
+    :param int size: number of bytes, default :attr:`chunk_size`
+    :rtype: bytes
+    :raises ResponseStreamError: if reading from the connection fails
+    """
+    if size is None:
+      size = ResponseStream.chunk_size
+    while len(self.ahead) < size and self.fill(size - len(self.ahead)):
+      pass
+    return bytes(self.ahead[:size])
+
+  @property
+  def bytes_read(self):
+    """Number of body bytes received from the connection
+
+    :rtype: int
+    """
+    return self.decoder.bytes_in
+
+  @property
+  def bytes_decoded(self):
+    """Number of body bytes after decompression
+
+    :rtype: int
+    """
+    return self.decoder.bytes_out
+
+  def close(self):
+    """Closes the stream. The connection is closed as well if the body has not
+    been read completely."""
+    if not self.closed:
+      if not self.response.isclosed():
+        self.connection.close()
+      self.ahead = bytearray()
+    super().close()
+
+  def text(self):
+    """Returns a buffered text stream decoding the body as UTF-8.
+
+    :rtype: :class:`io.TextIOWrapper`
+    """
+    return io.TextIOWrapper(io.BufferedReader(self, ResponseStream.chunk_size),
+                            encoding='utf-8')
+
+
+def parse_response(analyzer, response, request, failed_requests):
+  """Passes a response to its analyzer. Streamed responses are closed
+  afterwards and requests whose stream broke during parsing are stored as
+  failed requests.
+
+  :param analyzer: entrezpy analyzer instance
+  :type  analyzer: :class:`entrezpy.base.analyzer.EutilsAnalyzer`
+  :param response: response from :class:`entrezpy.requester.requester.Requester`
+  :type  response: str or :class:`ResponseStream`
+  :param request: entrezpy request
+  :type  request: :class:`entrezpy.base.request.EutilsRequest`
+  :param list failed_requests: failed requests of the query
+  """
+  if not response:
+    failed_requests.append(request)
+    return
+  try:
+    analyzer.parse(response, request)
+  except ResponseStreamError as err:
+    entrezpy.log.logger.get_class_logger(ResponseStream).warning(
+      {'stream error':str(err), 'query':request.query_id, 'request':request.id})
+    request.set_request_error("stream: {}".format(err))
+    failed_requests.append(request)
+  finally:
+    if isinstance(response, ResponseStream):
+      request.set_transfer_size(response.bytes_read, response.bytes_decoded)
+      response.close()
@@ -0,0 +1,269 @@
+"""
+..
+  Copyright 2020 The University of Sydney
+  This file is part of entrezpy.
+
+  Entrezpy is free software: you can redistribute it and/or modify it under the
+  terms of the GNU Lesser General Public License as published by the Free
+  Software Foundation, either version 3 of the License, or (at your option) any
+  later version.
+
+  Entrezpy is distributed in the hope that it will be useful, but WITHOUT ANY
+  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+  A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with entrezpy.  If not, see <https://www.gnu.org/licenses/>.
+
+.. module:: entrezpy.requester.retrypolicy
+  :synopsis: Exports class RetryPolicy computing backoff between retries,
+    class RetryBudget limiting the retries of one query and class
+    CircuitBreaker pausing requests to failing endpoints.
+"""
+
+
+import time
+import random
+import threading
+import email.utils
+
+import entrezpy.log.logger
+
+
+class RetryBudget:
+  """RetryBudget limits the retries of all requests of one query. Requests
+  give up once the budget is spent instead of retrying each up to the
+  maximum of the policy.
+
+  :param int retries: retries of the query, None for no limit
+  """
+
+  def __init__(self, retries=None):
+    self.retries = retries
+    self.spent = 0
+    self.lock = threading.Lock()
+
+  def spend(self):
+    """Spends one retry
+
+    :return: True if the retry is within budget
+    :rtype: bool
+    """
+    with self.lock:
+      if self.retries is not None and self.spent >= self.retries:
+        return False
+      self.spent += 1
+      return True
+
+  def __getstate__(self):
+    """Pickles the budget without lock, e.g. with requests parsed in worker
+    processes"""
+    return {'retries':self.retries, 'spent':self.spent}
+
+  def __setstate__(self, state):
+    self.__init__(state['retries'])
+    self.spent = state['spent']
+
+  def dump(self):
+    """:rtype: dict"""
+    return {'retries':self.retries, 'spent':self.spent}
+
+
+class CircuitBreaker:
+  """CircuitBreaker pauses all requests to one endpoint after
+  `failure_threshold` consecutive failed tries, e.g. during a service
+  brownout. After `reset_timeout` seconds a single probe request is
+  admitted. A successful probe closes the breaker and resumes traffic, a
+  failed probe opens it again. Breakers are shared by all requesters of a
+  process, see :meth:`get_breaker`.
+
+  Requests ask :meth:`admit` for the time to wait before sending, like
+  :meth:`entrezpy.requester.ratelimiter.RateLimiter.reserve`, and report
+  each try with :meth:`record_success` or :meth:`record_failure`.
+
+  :param str endpoint: endpoint URL
+  :param int failure_threshold: consecutive failures opening the breaker
+  :param float reset_timeout: seconds before probing an open breaker
+  """
+
+  closed = 'closed'
+  open = 'open'
+  half_open = 'half-open'
+
+  breakers = {}
+  """Process-wide breakers by endpoint"""
+
+  registry_lock = threading.Lock()
+
+  def __init__(self, endpoint, failure_threshold=5, reset_timeout=30.0):
+    self.endpoint = endpoint
+    self.failure_threshold = failure_threshold
+    self.reset_timeout = reset_timeout
+    self.state = CircuitBreaker.closed
+    self.failures = 0
+    self.opened = None
+    self.probe_start = None
+    self.trips = 0
+    self.lock = threading.Lock()
+    self.logger = entrezpy.log.logger.get_class_logger(CircuitBreaker)
+
+  @classmethod
+  def get_breaker(cls, endpoint, failure_threshold=5, reset_timeout=30.0):
+    """Returns the process-wide breaker for an endpoint and creates it if
+    required.
+
+    :param str endpoint: endpoint URL
+    :rtype: :class:`CircuitBreaker`
+    """
+    with cls.registry_lock:
+      if endpoint not in cls.breakers:
+        cls.breakers[endpoint] = cls(endpoint, failure_threshold, reset_timeout)
+      return cls.breakers[endpoint]
+
+  def isClosed(self):
+    """:rtype: bool"""
+    return self.state == CircuitBreaker.closed
+
+  def admit(self):
+    """Admits a request or returns the time to wait before asking again.
+    An open breaker admits one probe after :attr:`reset_timeout`. A probe
+    without result for :attr:`reset_timeout` seconds is replaced by a new one.
+
+    :return: seconds to wait, 0 if the request is admitted
+    :rtype: float
+    """
+    with self.lock:
+      if self.state == CircuitBreaker.closed:
+        return 0
+      now = time.monotonic()
+      if self.state == CircuitBreaker.open:
+        if now < self.opened + self.reset_timeout:
+          return self.opened + self.reset_timeout - now
+        self.state = CircuitBreaker.half_open
+        self.probe_start = now
+        self.logger.info({'circuit breaker':{'endpoint':self.endpoint, 'state':self.state}})
+        return 0
+      if now >= self.probe_start + self.reset_timeout:
+        self.probe_start = now
+        return 0
+      return self.probe_start + self.reset_timeout - now
+
+  def record_success(self):
+    """Records a successful try and closes the breaker"""
+    with self.lock:
+      self.failures = 0
+      if self.state != CircuitBreaker.closed:
+        self.state = CircuitBreaker.closed
+        self.logger.info({'circuit breaker':{'endpoint':self.endpoint, 'state':self.state}})
+
+  def record_failure(self):
+    """Records a failed try and opens the breaker after
+    :attr:`failure_threshold` consecutive failures or a failed probe"""
+    with self.lock:
+      self.failures += 1
+      if self.state == CircuitBreaker.half_open or \
+         (self.state == CircuitBreaker.closed and self.failures >= self.failure_threshold):
+        self.state = CircuitBreaker.open
+        self.opened = time.monotonic()
+        self.trips += 1
+        self.logger.warning({'circuit breaker':{'endpoint':self.endpoint, 'state':self.state,
+                                                'failures':self.failures}})
+
+  def dump(self):
+    """:rtype: dict"""
+    return {'endpoint':self.endpoint, 'state':self.state, 'failures':self.failures,
+            'trips':self.trips, 'failure_threshold':self.failure_threshold,
+            'reset_timeout':self.reset_timeout}
+
+
+class RetryPolicy:
+  """RetryPolicy decides how long failed tries wait before retrying.
+  Waits grow exponentially with full jitter, i.e. are drawn uniformly
+  between 0 and `base` * 2^retry seconds, capped at `cap`, so that clients
+  failing together do not retry in lockstep. Responses with status 429 or
+  503 and a `Retry-After` header wait the given time, at most
+  `retry_after_max` seconds, plus jitter of up to `base` seconds.
+
+  Each query gets a :class:`RetryBudget` of `budget` retries from
+  :meth:`new_budget`. With `breaker_threshold` set, tries are reported to
+  the shared :class:`CircuitBreaker` of their endpoint.
+
+  :param int max_retries: retries per request before giving up
+  :param float base: backoff base in seconds
+  :param float cap: maximum backoff in seconds
+  :param int budget: retries per query, None for no limit
+  :param float retry_after_max: maximum honored `Retry-After` in seconds
+  :param int breaker_threshold: consecutive failures opening the circuit
+    breaker of an endpoint, None to disable circuit breakers
+  :param float breaker_reset: seconds before probing an open breaker
+  """
+
+  retry_after_codes = (429, 503)
+  """HTTP status codes whose `Retry-After` header is honored"""
+
+  def __init__(self, max_retries=20, base=1.0, cap=60.0, budget=None, retry_after_max=120.0,
+               breaker_threshold=5, breaker_reset=30.0):
+    self.max_retries = max_retries
+    self.base = base
+    self.cap = cap
+    self.budget = budget
+    self.retry_after_max = retry_after_max
+    self.breaker_threshold = breaker_threshold
+    self.breaker_reset = breaker_reset
+    self.random = random.Random()
+
+  def new_budget(self):
+    """Returns the retry budget for one query
+
+    :rtype: :class:`RetryBudget`
+    """
+    return RetryBudget(self.budget)
+
+  def get_breaker(self, endpoint):
+    """Returns the shared circuit breaker of an endpoint or None if disabled
+
+    :param str endpoint: endpoint URL
+    :rtype: :class:`CircuitBreaker` or None
+    """
+    if self.breaker_threshold is None:
+      return None
+    return CircuitBreaker.get_breaker(endpoint, self.breaker_threshold, self.breaker_reset)
+
+  def backoff(self, retries, retry_after=None):
+    """Returns the wait before the next try
+
+    :param int retries: number of failed tries so far, at least 1
+    :param float retry_after: seconds requested by the server or None
+    :rtype: float
+    """
+    if retry_after is not None:
+      return min(retry_after, self.retry_after_max) + self.random.uniform(0, self.base)
+    return self.random.uniform(0, min(self.cap, self.base * 2 ** (retries-1)))
+
+  def get_retry_after(self, http_err):
+    """Returns the `Retry-After` of a 429 or 503 response in seconds or
+    None. The header is either a number of seconds or an HTTP date.
+
+    :param http_err: HTTP error response
+    :type  http_err: :class:`urllib.error.HTTPError`
+    :rtype: float or None
+    """
+    if http_err.code not in RetryPolicy.retry_after_codes or http_err.headers is None:
+      return None
+    value = http_err.headers.get('Retry-After')
+    if not value:
+      return None
+    try:
+      return max(0.0, float(value))
+    except ValueError:
+      pass
+    try:
+      return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+      return None
+
+  def dump(self):
+    """:rtype: dict"""
+    return {'max_retries':self.max_retries, 'base':self.base, 'cap':self.cap,
+            'budget':self.budget, 'retry_after_max':self.retry_after_max,
+            'breaker_threshold':self.breaker_threshold, 'breaker_reset':self.breaker_reset}
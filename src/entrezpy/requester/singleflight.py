@@ -0,0 +1,185 @@
+"""
+..
+  Copyright 2020 The University of Sydney
+  This file is part of entrezpy.
+
+  Entrezpy is free software: you can redistribute it and/or modify it under the
+  terms of the GNU Lesser General Public License as published by the Free
+  Software Foundation, either version 3 of the License, or (at your option) any
+  later version.
+
+  Entrezpy is distributed in the hope that it will be useful, but WITHOUT ANY
+  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+  A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with entrezpy.  If not, see <https://www.gnu.org/licenses/>.
+
+.. module:: entrezpy.requester.singleflight
+  :synopsis: Exports class SingleFlight coalescing identical requests in
+    flight into one call.
+"""
+
+
+import asyncio
+import threading
+import concurrent.futures
+
+import entrezpy.base.request
+import entrezpy.log.logger
+
+
+class SingleFlight:
+  """SingleFlight coalesces identical requests in flight. The first request
+  with the same URL and normalized POST parameters, see
+  :meth:`entrezpy.base.request.EutilsRequest.get_cache_key`, sends the call
+  and all identical requests arriving meanwhile wait for its response
+  instead of sending their own. Once the call completed, the response is
+  returned to every waiting request, and thereby passed to the analyzer of
+  each. Later requests send a new call, i.e. unlike a response cache,
+  nothing is stored.
+
+  Requests of threaded and asyncio queries are coalesced with each other
+  since calls are :class:`concurrent.futures.Future` instances. Requests
+  storing results on the History server, i.e. epost, Esearch with
+  `usehistory` or Elink `*_history` commands, are never coalesced, and
+  responses of coalesced requests are not streamed.
+
+  Process-wide instances are shared via :meth:`get_shared`.
+  """
+
+  shared = None
+  """Process-wide single flight shared by all queries"""
+
+  registry_lock = threading.Lock()
+
+  @staticmethod
+  def get_shared():
+    """Returns the process-wide single flight and creates it if required
+
+    :rtype: :class:`SingleFlight`
+    """
+    with SingleFlight.registry_lock:
+      if SingleFlight.shared is None:
+        SingleFlight.shared = SingleFlight()
+      return SingleFlight.shared
+
+  def __init__(self):
+    """:ivar int calls: calls sent for coalescable requests
+       :ivar int coalesced: requests answered by the call of another
+         request, i.e. saved calls
+       :ivar int bytes_saved: response bytes not downloaded again
+       :ivar int failed: coalesced requests whose shared call failed
+    """
+    self.flights = {}
+    self.calls = 0
+    self.coalesced = 0
+    self.bytes_saved = 0
+    self.failed = 0
+    self.lock = threading.Lock()
+    self.logger = entrezpy.log.logger.get_class_logger(SingleFlight)
+
+  def isCoalescable(self, request, parameter):
+    """Tests if a request can share the call of an identical request
+
+    :param request: entrezpy request
+    :type  request: :class:`entrezpy.base.request.EutilsRequest`
+    :param dict parameter: POST parameters
+    :rtype: bool
+    """
+    return not entrezpy.base.request.EutilsRequest.isHistoryStoring(request.eutil, parameter)
+
+  def join(self, request, parameter):
+    """Joins the call of an identical request in flight or starts a new one
+
+    :param request: entrezpy request
+    :type  request: :class:`entrezpy.base.request.EutilsRequest`
+    :param dict parameter: POST parameters
+    :return: key, call and if this request sends the call
+    :rtype: tuple
+    """
+    key = (request.url, request.get_cache_key(parameter))
+    with self.lock:
+      if key in self.flights:
+        self.coalesced += 1
+        return key, self.flights[key], False
+      self.flights[key] = concurrent.futures.Future()
+      self.calls += 1
+      return key, self.flights[key], True
+
+  def land(self, key, flight, request, response):
+    """Completes a call and passes its response to the waiting requests
+
+    :param tuple key: call key from :meth:`join`
+    :param flight: call
+    :type  flight: :class:`concurrent.futures.Future`
+    :param request: request which sent the call
+    :type  request: :class:`entrezpy.base.request.EutilsRequest`
+    :param response: decoded response or None if the request failed
+    :type  response: str or None
+    """
+    with self.lock:
+      del self.flights[key]
+    flight.set_result((response, request.request_error))
+
+  def follow(self, request, result):
+    """Applies the result of a shared call to a coalesced request
+
+    :param request: coalesced request
+    :type  request: :class:`entrezpy.base.request.EutilsRequest`
+    :param tuple result: response and request error of the call
+    :return: decoded response or None if the call failed
+    :rtype: str or None
+    """
+    response, error = result
+    if response is None:
+      with self.lock:
+        self.failed += 1
+      request.set_request_error(error if error else 'singleFlight')
+      return None
+    request.set_status_success()
+    request.set_transfer_size(0, len(response))
+    with self.lock:
+      self.bytes_saved += len(response)
+    self.logger.debug({'coalesced':{'query':request.query_id, 'request':request.id}})
+    return response
+
+  def call(self, request, parameter, send, *args):
+    """Sends a request unless an identical request is in flight, whose
+    response is waited for instead
+
+    :param request: entrezpy request
+    :type  request: :class:`entrezpy.base.request.EutilsRequest`
+    :param dict parameter: POST parameters
+    :param callable send: sends the request and returns its decoded
+      response or None
+    :param args: arguments for `send`
+    :rtype: str or None
+    """
+    key, flight, isLeader = self.join(request, parameter)
+    if not isLeader:
+      return self.follow(request, flight.result())
+    response = None
+    try:
+      response = send(*args)
+    finally:
+      self.land(key, flight, request, response)
+    return response
+
+  async def acall(self, request, parameter, send, *args):
+    """Asyncio variant of :meth:`call`. `send` is a coroutine function."""
+    key, flight, isLeader = self.join(request, parameter)
+    if not isLeader:
+      return self.follow(request, await asyncio.wrap_future(flight))
+    response = None
+    try:
+      response = await send(*args)
+    finally:
+      self.land(key, flight, request, response)
+    return response
+
+  def dump(self):
+    """:rtype: dict"""
+    with self.lock:
+      return {'calls':self.calls, 'coalesced':self.coalesced, 'inflight':len(self.flights),
+              'bytes_saved':self.bytes_saved, 'failed':self.failed}
@@ -6,70 +6,137 @@
 """
 
 
-import json
-import threading
-
 import entrezpy.requester.requester
+import entrezpy.requester.processparser
 import entrezpy.log.logger
 
 
-class ThreadedRequester(threading.Thread):
+class ThreadedRequester:
   """
-  ThreadedRequester handles multitthreaded request. It inherits from
-  :class:`threading.Thread`. Requests are fetched  from
-  :class:`entrezpy.base.query.EutilsQuery.RequestPool` and processed in
-  :meth:`.run`.
+  ThreadedRequester handles multitthreaded requests. Requests are fetched
+  from :class:`entrezpy.requester.requestpool.RequestPool` by workers running
+  on the shared :class:`entrezpy.requester.workerpool.WorkerPool` and
+  processed in :meth:`.run_one_request`. Several workers send requests
+  concurrently, only limited by the rate limiter of the requester. Only
+  parsing the response, i.e. merging it into the analyzer, is serialized per
+  analyzer since analyzers are not thread-safe.
+
+  If a response queue is given, responses are downloaded completely and
+  passed to :class:`.ThreadedParser` workers instead of being parsed.
+
+  A streamed response is read from the connection while its analyzer lock is
+  held, which would serialize the downloads of concurrent workers. Responses
+  are therefore only streamed if `stream` is set, i.e. by a query with a
+  single network worker.
   """
 
-  def __init__(self, requests, failed_requests, monitor, requester, stop_event, lock):
+  def __init__(self, failed_requests, monitor, requester, get_lock, responses=None,
+               process_parser=None, stream=False):
     """Inits :class:`.ThreadedRequester` to handle multithreaded requests.
 
-    :param reference requests:
-      :attr:`entrezpy.base.query.EutilsQuery.RequestPool.requests`
     :type reference failed_request:
       :attr:`entrezpy.base.query.EutilsQuery.failed_requests`
+    :param get_lock: returns the lock for an analyzer,
+      :meth:`entrezpy.requester.requestpool.RequestPool.get_lock`
+    :param responses: bounded queue of responses to parse,
+      :attr:`entrezpy.requester.requestpool.RequestPool.responses`
+    :type  responses: :class:`queue.Queue`
+    :param process_parser: parser for responses in worker processes
+    :type  process_parser: :class:`entrezpy.requester.processparser.ProcessParser`
+    :param bool stream: stream responses for analyzers supporting it
     """
-    super().__init__(daemon=True)
-    self.requests = requests
     self.failed_requests = failed_requests
     self.monitor = monitor
     self.requester = requester
-    self.stop_event = stop_event
-    self.lock = lock
+    self.stream = stream
+    self.get_lock = get_lock
+    self.responses = responses
+    self.process_parser = process_parser
     self.logger = entrezpy.log.logger.get_class_logger(ThreadedRequester)
 
-  def run(self):
-    """Overwrite :meth:`threading.Thread.run` for multithreaded requests."""
-    while not self.requests.empty() or not self.stop_event.is_set():
-      request, analyzer = self.requests.get()
-      if self.stop_event.is_set():
-        self.logger.info(json.dumps({'received stop signal':'aborting'}))
-        break
-      self.run_one_request(request, analyzer)
-      self.logger.info(json.dumps({'query':request.query_id,
-                                   'request':request.id,
-                                   'status': request.status}))
-      self.requests.task_done()
-
   def run_one_request(self, request, analyzer):
     """
-    Processes one request from the queue and logs its progress.
+    Processes one request from the queue and logs its progress. The request
+    is sent without holding a lock. Parsing the response holds the lock of the
+    analyzer. The completed request is reported to the observer afterwards,
+    as failed if sending or parsing raised an error.
 
     :param request: single entrezpy request
     :type  request: :class:`entrezpy.base.request.EutilsRequest`
+    :return: True if the response has been passed to the parse workers,
+      False if the request is complete
+    :rtype: bool
     """
-    self.lock.acquire()
-    self.logger.debug(json.dumps({'lock':self.lock.locked()}))
     request.start_stopwatch()
     o = self.monitor.get_observer(request.query_id)
     o.observe(request)
-    response = self.requester.request(request)
-    request.calc_duration()
-    o.processed_requests += 1
-    self.logger.debug(response)
-    if response:
-      analyzer.parse(response, request)
-    else:
-      self.failed_requests.append(request)
-    self.lock.release()
-    self.logger.debug(json.dumps({'lock':self.lock.locked()}))
+    handed_over = False
+    try:
+      if self.responses is not None:
+        response = self.requester.request(request)
+        request.calc_duration()
+        self.responses.put((response, request, analyzer))
+        handed_over = True
+        return True
+      stream = self.stream and analyzer.stream_response and \
+               not entrezpy.requester.processparser.isProcessParsed(self.process_parser, analyzer)
+      response = self.requester.request(request, stream=stream)
+      request.calc_duration()
+      entrezpy.requester.processparser.parse_locked(analyzer, response, request,
+                                                    self.failed_requests,
+                                                    self.get_lock(analyzer), self.process_parser)
+    except BaseException as err:
+      request.set_request_error(repr(err))
+      raise
+    finally:
+      if not handed_over:
+        o.complete(request)
+    self.logger.info({'query':request.query_id, 'request':request.id, 'status': request.status})
+    return False
+
+
+class ThreadedParser:
+  """
+  ThreadedParser parses responses downloaded by :class:`.ThreadedRequester`
+  workers. Parsing holds the lock of the analyzer, or only merging if the
+  response is parsed in a worker process. The completed request is
+  reported to the observer afterwards, also if parsing failed.
+  """
+
+  def __init__(self, failed_requests, monitor, get_lock, process_parser=None):
+    """Inits :class:`.ThreadedParser`.
+
+    :type reference failed_request:
+      :attr:`entrezpy.base.query.EutilsQuery.failed_requests`
+    :param get_lock: returns the lock for an analyzer,
+      :meth:`entrezpy.requester.requestpool.RequestPool.get_lock`
+    :param process_parser: parser for responses in worker processes
+    :type  process_parser: :class:`entrezpy.requester.processparser.ProcessParser`
+    """
+    self.failed_requests = failed_requests
+    self.monitor = monitor
+    self.get_lock = get_lock
+    self.process_parser = process_parser
+    self.logger = entrezpy.log.logger.get_class_logger(ThreadedParser)
+
+  def parse_one_response(self, response, request, analyzer):
+    """Parses one downloaded response and reports the completed request.
+
+    :param response: downloaded response
+    :type  response: str
+    :param request: single entrezpy request
+    :type  request: :class:`entrezpy.base.request.EutilsRequest`
+    :return: False, the request is complete
+    :rtype: bool
+    """
+    try:
+      entrezpy.requester.processparser.parse_locked(analyzer, response, request,
+                                                    self.failed_requests,
+                                                    self.get_lock(analyzer), self.process_parser)
+    except BaseException as err:
+      request.set_request_error(repr(err))
+      raise
+    finally:
+      self.monitor.get_observer(request.query_id).complete(request)
+    self.logger.info({'query':request.query_id, 'request':request.id, 'status': request.status})
+    return False
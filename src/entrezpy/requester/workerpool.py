@@ -0,0 +1,230 @@
+"""
+..
+  Copyright 2020 The University of Sydney
+  This file is part of entrezpy.
+
+  Entrezpy is free software: you can redistribute it and/or modify it under the
+  terms of the GNU Lesser General Public License as published by the Free
+  Software Foundation, either version 3 of the License, or (at your option) any
+  later version.
+
+  Entrezpy is distributed in the hope that it will be useful, but WITHOUT ANY
+  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+  A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with entrezpy.  If not, see <https://www.gnu.org/licenses/>.
+
+.. module:: entrezpy.requester.workerpool
+  :synopsis: Exports class WorkerPool, a process-wide pool of reusable worker
+    threads, and class CompletionBarrier waiting for the tasks of one query.
+"""
+
+
+import queue
+import atexit
+import threading
+
+import entrezpy.log.logger
+
+
+class CompletionBarrier:
+  """CompletionBarrier counts outstanding tasks, e.g. the requests of one
+  query, and blocks in :meth:`wait` until all are done.
+  """
+
+  def __init__(self):
+    self.outstanding = 0
+    self.condition = threading.Condition(threading.Lock())
+
+  def add(self, tasks=1):
+    """Registers outstanding tasks"""
+    with self.condition:
+      self.outstanding += tasks
+
+  def done(self):
+    """Marks one task as done and wakes waiting threads if none is left"""
+    with self.condition:
+      self.outstanding -= 1
+      if self.outstanding <= 0:
+        self.condition.notify_all()
+
+  def wait(self, timeout=None):
+    """Blocks until all tasks are done
+
+    :param float timeout: maximum wait in seconds
+    :return: True if all tasks are done
+    :rtype: bool
+    """
+    with self.condition:
+      return self.condition.wait_for(lambda: self.outstanding <= 0, timeout)
+
+
+class WorkerPool:
+  """WorkerPool runs tasks on reusable daemon threads shared by all queries
+  of a process, see :meth:`get_shared`. Threads are started on demand when
+  no idle thread can take a submitted task and exit after being idle for
+  `idle_timeout` seconds. Queries therefore pay thread start-up only when
+  the pool grows, and idle processes keep no threads.
+
+  Tasks run until they return. Long running tasks, e.g. a query draining its
+  requests, occupy their thread. The pool is unbounded since queries bound
+  their own concurrency and tasks wait for each other, e.g. network workers
+  for parse workers or Conduit queries for their requests. A bounded pool
+  deadlocks once all its threads wait for tasks which have no thread left,
+  see :func:`check_pool`.
+
+  :param float idle_timeout: seconds before an idle thread exits
+  :param int min_workers: threads started by :meth:`start` and never reaped
+  """
+
+  shared = None
+  """Process-wide pool"""
+
+  shared_lock = threading.Lock()
+
+  def __init__(self, idle_timeout=30.0, min_workers=0):
+    self.idle_timeout = idle_timeout
+    self.min_workers = min_workers
+    self.tasks = queue.SimpleQueue()
+    self.threads = set()
+    self.idle = 0
+    self.pending = 0
+    self.started = 0
+    self.reaped = 0
+    self.completed = 0
+    self.isShutdown = False
+    self.barrier = CompletionBarrier()
+    self.lock = threading.Lock()
+    self.logger = entrezpy.log.logger.get_class_logger(WorkerPool)
+
+  @classmethod
+  def get_shared(cls):
+    """Returns the process-wide pool and creates it if required. A pool
+    shut down is replaced by a new one.
+
+    :rtype: :class:`WorkerPool`
+    """
+    with cls.shared_lock:
+      if cls.shared is None or cls.shared.isShutdown:
+        cls.shared = cls()
+        atexit.register(cls.shared.shutdown, False)
+      return cls.shared
+
+  def start(self):
+    """Starts :attr:`min_workers` threads
+
+    :return: this pool
+    :rtype: :class:`WorkerPool`
+    """
+    with self.lock:
+      while len(self.threads) < self.min_workers:
+        self.start_thread()
+    return self
+
+  def submit(self, task, *args):
+    """Runs `task(*args)` on a worker thread
+
+    :param callable task: task
+    :raises RuntimeError: if the pool has been shut down
+    """
+    with self.lock:
+      if self.isShutdown:
+        raise RuntimeError("WorkerPool has been shut down")
+      self.barrier.add()
+      self.pending += 1
+      self.tasks.put((task, args))
+      if self.pending > self.idle:
+        self.start_thread()
+
+  def start_thread(self):
+    """Starts one worker thread. Requires :attr:`lock`."""
+    self.started += 1
+    thread = threading.Thread(target=self.work, name='entrezpy-worker-{}'.format(self.started),
+                              daemon=True)
+    self.threads.add(thread)
+    thread.start()
+
+  def work(self):
+    """Runs tasks until shut down or idle for :attr:`idle_timeout`"""
+    thread = threading.current_thread()
+    while True:
+      with self.lock:
+        self.idle += 1
+      try:
+        item = self.tasks.get(timeout=self.idle_timeout)
+      except queue.Empty:
+        with self.lock:
+          self.idle -= 1
+          if self.pending == 0 and len(self.threads) > self.min_workers:
+            self.threads.discard(thread)
+            self.reaped += 1
+            return
+        continue
+      with self.lock:
+        self.idle -= 1
+        self.pending -= 1
+      if item is None:
+        with self.lock:
+          self.threads.discard(thread)
+        return
+      task, args = item
+      try:
+        task(*args)
+      except BaseException as err:
+        self.logger.error({'worker task failed':repr(err), 'task':getattr(task, '__qualname__', str(task))})
+      finally:
+        with self.lock:
+          self.completed += 1
+        self.barrier.done()
+
+  def drain(self, timeout=None):
+    """Blocks until all submitted tasks are done
+
+    :param float timeout: maximum wait in seconds
+    :return: True if all tasks are done
+    :rtype: bool
+    """
+    return self.barrier.wait(timeout)
+
+  def shutdown(self, wait=True):
+    """Stops accepting tasks and stops all threads after the queued tasks
+
+    :param bool wait: wait for the threads to finish
+    """
+    with self.lock:
+      if self.isShutdown:
+        return
+      self.isShutdown = True
+      threads = list(self.threads)
+      for _ in threads:
+        self.pending += 1
+        self.tasks.put(None)
+    if wait:
+      for i in threads:
+        if i is not threading.current_thread():
+          i.join()
+    self.logger.debug(lambda: {'shutdown':self.dump()})
+
+  def dump(self):
+    """:rtype: dict"""
+    return {'threads':len(self.threads), 'idle':self.idle, 'pending':self.pending,
+            'idle_timeout':self.idle_timeout,
+            'started':self.started, 'reaped':self.reaped, 'completed':self.completed,
+            'shutdown':self.isShutdown}
+
+
+def check_pool(worker_pool):
+  """Rejects pools other than :class:`WorkerPool`, e.g.
+  :class:`concurrent.futures.ThreadPoolExecutor`, since their bounded
+  threads deadlock when tasks of a query wait for each other.
+
+  :param worker_pool: pool running threaded queries
+  :return: `worker_pool`
+  :rtype: :class:`WorkerPool`
+  :raises TypeError: if `worker_pool` is not a :class:`WorkerPool`
+  """
+  if not isinstance(worker_pool, WorkerPool):
+    raise TypeError("worker_pool requires an unbounded entrezpy WorkerPool, got {}".format(
+      type(worker_pool).__name__))
+  return worker_pool
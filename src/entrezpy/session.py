@@ -0,0 +1,240 @@
+"""
+..
+  Copyright 2020 The University of Sydney
+  This file is part of entrezpy.
+
+  Entrezpy is free software: you can redistribute it and/or modify it under the
+  terms of the GNU Lesser General Public License as published by the Free
+  Software Foundation, either version 3 of the License, or (at your option) any
+  later version.
+
+  Entrezpy is distributed in the hope that it will be useful, but WITHOUT ANY
+  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+  A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with entrezpy.  If not, see <https://www.gnu.org/licenses/>.
+
+.. module:: entrezpy.session
+  :synopsis: Exports class Session holding the setup shared by many queries.
+"""
+
+
+import os
+import sys
+import uuid
+import base64
+import signal
+import itertools
+import threading
+
+import entrezpy.base.query
+import entrezpy.efetch.efetcher
+import entrezpy.elink.elinker
+import entrezpy.epost.eposter
+import entrezpy.esearch.esearcher
+import entrezpy.esummary.esummarizer
+import entrezpy.requester.asyncrequester
+import entrezpy.requester.cache
+import entrezpy.requester.concurrency
+import entrezpy.requester.connectionpool
+import entrezpy.requester.monitor
+import entrezpy.requester.processparser
+import entrezpy.requester.ratelimiter
+import entrezpy.requester.requester
+import entrezpy.requester.requestpool
+import entrezpy.requester.workerpool
+import entrezpy.log.logger
+
+
+class Session:
+  """Session holds the setup shared by all queries created from it: apikey,
+  rate limiter, connection pool, worker pool, requester, response cache,
+  cassette, query monitor and logging. Setting up a query otherwise resolves
+  the apikey, creates a requester and a monitor and installs a SIGINT
+  handler for each query. Queries from a session only create their request
+  pool and cost a few microseconds, e.g. for many small Elink or Esummary
+  queries:
+
+    session = entrezpy.Session('tool', 'me@example.org', apikey='key')
+    for uids in batches:
+      analyzer = session.esummarizer().inquire({'db':'pubmed', 'id':uids})
+
+  The response cache, cassette, journal, retry and hedge policies, single
+  flight, adaptive concurrency and parse settings are taken from
+  :class:`entrezpy.base.query.EutilsQuery` when the session is created.
+  Queries of a session share its cache statistics, see
+  :meth:`get_cache_stats`, and are stopped together on SIGINT.
+
+  :param str tool: tool name
+  :param str email: user email
+  :param str apikey: NCBI apikey
+  :param str apikey_var: enviroment variable storing NCBI apikey
+  :param int threads: default threads of queries
+  :param str log_level: logging level set with
+    :func:`entrezpy.log.logger.set_level`, None keeps the current settings
+  :param connection_pool: persistent connections, default is the
+    process-wide pool
+  :type  connection_pool: :class:`entrezpy.requester.connectionpool.ConnectionPool`
+  :param worker_pool: threads running threaded queries, default is the
+    process-wide pool
+  :type  worker_pool: :class:`entrezpy.requester.workerpool.WorkerPool`
+  :raises TypeError: if `worker_pool` is no
+    :class:`entrezpy.requester.workerpool.WorkerPool`
+  """
+
+  def __init__(self, tool, email, apikey=None, apikey_var=None, threads=None, log_level=None,
+               connection_pool=None, worker_pool=None):
+    if log_level is not None:
+      entrezpy.log.logger.set_level(log_level)
+    self.id = base64.urlsafe_b64encode(uuid.uuid4().bytes).decode('utf-8')
+    self.query_ids = itertools.count()
+    self.tool = tool
+    self.email = email
+    self.threads = 0 if not threads else threads
+    self.requests_per_sec = 3
+    self.max_requests_per_sec = 10
+    self.apikey = self.check_ncbi_apikey(apikey, apikey_var)
+    self.ratelimiter = entrezpy.requester.ratelimiter.RateLimiter.get_limiter(self.apikey,
+                                                                              self.requests_per_sec)
+    self.connection_pool = connection_pool
+    if self.connection_pool is None:
+      self.connection_pool = entrezpy.requester.connectionpool.ConnectionPool.get_shared()
+    self.worker_pool = worker_pool
+    if self.worker_pool is None:
+      self.worker_pool = entrezpy.requester.workerpool.WorkerPool.get_shared()
+    entrezpy.requester.workerpool.check_pool(self.worker_pool)
+    self.cache = entrezpy.base.query.EutilsQuery.cache
+    self.cassette = entrezpy.base.query.EutilsQuery.cassette
+    self.retry_policy = entrezpy.base.query.EutilsQuery.retry_policy
+    self.hedge_policy = entrezpy.base.query.EutilsQuery.hedge_policy
+    self.single_flight = entrezpy.base.query.EutilsQuery.single_flight
+    self.journal = entrezpy.base.query.EutilsQuery.journal
+    self.parse_threads = entrezpy.base.query.EutilsQuery.parse_threads
+    self.parse_queue_size = entrezpy.base.query.EutilsQuery.parse_queue_size
+    self.process_parser = None
+    if entrezpy.base.query.EutilsQuery.parse_processes > 0:
+      self.process_parser = entrezpy.requester.processparser.ProcessParser.get_shared(
+        entrezpy.base.query.EutilsQuery.parse_processes)
+    self.concurrency = None
+    if entrezpy.base.query.EutilsQuery.adaptive_concurrency:
+      self.concurrency = entrezpy.requester.concurrency.ConcurrencyController.get_controller(
+        self.apikey)
+    self.cache_stats = entrezpy.requester.cache.CacheStats()
+    self.requester = entrezpy.requester.requester.Requester(1/self.requests_per_sec,
+                                                            connection_pool=self.connection_pool,
+                                                            ratelimiter=self.ratelimiter,
+                                                            cache=self.cache,
+                                                            cache_stats=self.cache_stats,
+                                                            cassette=self.cassette,
+                                                            retry_policy=self.retry_policy,
+                                                            concurrency=self.concurrency,
+                                                            hedge_policy=self.hedge_policy,
+                                                            single_flight=self.single_flight,
+                                                            worker_pool=self.worker_pool)
+    self.async_requester = None
+    self.query_monitor = entrezpy.requester.monitor.QueryMonitor()
+    self.stop_event = threading.Event()
+    self.logger = entrezpy.log.logger.get_class_logger(Session)
+    if threading.current_thread() is threading.main_thread():
+      signal.signal(signal.SIGINT, self.sigint_handler)
+    self.logger.debug(lambda: {'init':self.dump()})
+
+  def check_ncbi_apikey(self, apikey=None, env_var=None):
+    """Checks and sets NCBI apikey as
+    :meth:`entrezpy.base.query.EutilsQuery.check_ncbi_apikey`.
+
+    :param str apikey: NCBI apikey
+    :param str env_var: enviromental variable storing NCBI apikey
+    """
+    if 'NCBI_API_KEY' in os.environ:
+      self.requests_per_sec = self.max_requests_per_sec
+      return os.environ['NCBI_API_KEY']
+    if apikey:
+      self.requests_per_sec = self.max_requests_per_sec
+      return apikey
+    if env_var and (env_var in os.environ):
+      self.requests_per_sec = self.max_requests_per_sec
+      return os.environ[env_var]
+    return None
+
+  def new_query_id(self):
+    """Returns a unique query id for a query of this session
+
+    :rtype: str
+    """
+    return '{}.{}'.format(self.id, next(self.query_ids))
+
+  def new_request_pool(self, threads, failed_requests):
+    """Returns a request pool for one query using the shared setup
+
+    :param int threads: threads of the query
+    :param list failed_requests: failed requests of the query
+    :rtype: :class:`entrezpy.requester.requestpool.RequestPool`
+    """
+    return entrezpy.requester.requestpool.RequestPool(threads, failed_requests,
+                                                      self.query_monitor, self.requester,
+                                                      self.parse_threads, self.parse_queue_size,
+                                                      self.process_parser, self.worker_pool,
+                                                      self.stop_event)
+
+  def get_async_requester(self):
+    """Returns the requester for asyncio queries and creates it if required
+
+    :rtype: :class:`entrezpy.requester.asyncrequester.AsyncRequester`
+    """
+    if self.async_requester is None:
+      self.async_requester = entrezpy.requester.asyncrequester.AsyncRequester(
+        1/self.requests_per_sec, ratelimiter=self.ratelimiter, cache=self.cache,
+        cache_stats=self.cache_stats, cassette=self.cassette, retry_policy=self.retry_policy,
+        concurrency=self.concurrency, hedge_policy=self.hedge_policy,
+        single_flight=self.single_flight)
+    return self.async_requester
+
+  def esearcher(self, threads=None, qid=None):
+    """:rtype: :class:`entrezpy.esearch.esearcher.Esearcher`"""
+    return entrezpy.esearch.esearcher.Esearcher(self.tool, self.email, threads=threads, qid=qid,
+                                                session=self)
+
+  def esummarizer(self, threads=None, qid=None):
+    """:rtype: :class:`entrezpy.esummary.esummarizer.Esummarizer`"""
+    return entrezpy.esummary.esummarizer.Esummarizer(self.tool, self.email, threads=threads,
+                                                     qid=qid, session=self)
+
+  def elinker(self, threads=None, qid=None):
+    """:rtype: :class:`entrezpy.elink.elinker.Elinker`"""
+    return entrezpy.elink.elinker.Elinker(self.tool, self.email, threads=threads, qid=qid,
+                                          session=self)
+
+  def eposter(self, threads=None, qid=None):
+    """:rtype: :class:`entrezpy.epost.eposter.Eposter`"""
+    return entrezpy.epost.eposter.Eposter(self.tool, self.email, threads=threads, qid=qid,
+                                          session=self)
+
+  def efetcher(self, threads=None, qid=None):
+    """:rtype: :class:`entrezpy.efetch.efetcher.Efetcher`"""
+    return entrezpy.efetch.efetcher.Efetcher(self.tool, self.email, threads=threads, qid=qid,
+                                             session=self)
+
+  def get_cache_stats(self):
+    """Returns the response cache usage of all queries of this session
+
+    :rtype: dict
+    """
+    return self.cache_stats.dump()
+
+  def sigint_handler(self, sigint, frame):
+    self.logger.debug({'sigint detected':'stopping queries'})
+    self.stop_event.set()
+    sys.exit(self.logger.info({'sigint detected':'aborting'}))
+
+  def dump(self):
+    """:rtype: dict"""
+    return {'id':self.id, 'tool':self.tool, 'contact':self.email, 'apikey':self.apikey,
+            'req/sec':self.requests_per_sec, 'threads':self.threads,
+            'parse_threads':self.parse_threads,
+            'parse_processes':self.process_parser.processes if self.process_parser else 0,
+            'concurrency':self.concurrency.limit() if self.concurrency else None,
+            'cache':type(self.cache).__name__ if self.cache else None,
+            'cassette':self.cassette.path if self.cassette else None,
+            'journal':self.journal.path if self.journal else None}
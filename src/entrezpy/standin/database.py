@@ -0,0 +1,152 @@
+"""
+..
+  Copyright 2020 The University of Sydney
+  This file is part of entrezpy.
+
+  Entrezpy is free software: you can redistribute it and/or modify it under the
+  terms of the GNU Lesser General Public License as published by the Free
+  Software Foundation, either version 3 of the License, or (at your option) any
+  later version.
+
+  Entrezpy is distributed in the hope that it will be useful, but WITHOUT ANY
+  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+  A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with entrezpy.  If not, see <https://www.gnu.org/licenses/>.
+
+.. module:: entrezpy.standin.database
+  :synopsis: Exports classes StandinDatabase and History providing synthetic
+    Entrez records and history server entries to the stand-in server.
+"""
+
+
+import uuid
+import zlib
+import threading
+
+
+class StandinDatabase:
+  """StandinDatabase generates deterministic synthetic records for any Entrez
+  database. UIDs of a database range from 1 to :attr:`size`. A search term
+  matches a contiguous UID range whose position depends on database and term
+  and whose length is :attr:`default_count`, or the count set for this term
+  in `terms`. Identical searches therefore return identical results across
+  runs and processes. Each UID links to :attr:`links_per_uid` UIDs in every
+  other database.
+
+  :param int size: number of UIDs per database
+  :param int default_count: number of UIDs matching a search term
+  :param dict terms: number of UIDs matching specific search terms
+  :param int links_per_uid: number of links per UID
+  """
+
+  def __init__(self, size=10000000, default_count=10000, terms=None, links_per_uid=3):
+    self.size = size
+    self.default_count = default_count
+    self.terms = terms if terms else {}
+    self.links_per_uid = links_per_uid
+
+  def search(self, db, term):
+    """Returns the UIDs matching a search term
+
+    :param str db: Entrez database
+    :param str term: search term
+    :rtype: range
+    """
+    count = min(self.terms.get(term, self.default_count), self.size)
+    start = zlib.crc32('{}:{}'.format(db, term).encode()) % (self.size - count + 1)
+    return range(start+1, start+count+1)
+
+  def summary(self, db, uid):
+    """Returns the summary for one UID
+
+    :param str db: Entrez database
+    :param int uid: UID
+    :rtype: dict
+    """
+    return {'uid':str(uid), 'title':'Stand-in {} record {}'.format(db, uid),
+            'source':'entrezpy stand-in', 'pubdate':str(1950 + uid % 70),
+            'length':self.sequence_length(uid)}
+
+  def sequence_length(self, uid):
+    """:rtype: int"""
+    return 60 + uid % 240
+
+  def sequence(self, uid):
+    """Returns a deterministic nucleotide sequence for one UID
+
+    :rtype: str
+    """
+    bases = 'ACGT'
+    return ''.join(bases[(uid * (i+7)) % 4] for i in range(self.sequence_length(uid)))
+
+  def record_xml(self, db, uid):
+    """Returns one record in XML
+
+    :rtype: str
+    """
+    return '<Record><Id>{0}</Id><Db>{1}</Db><Title>Stand-in {1} record {0}</Title>' \
+           '<Sequence>{2}</Sequence></Record>'.format(uid, db, self.sequence(uid))
+
+  def record_text(self, db, uid):
+    """Returns one record as FASTA
+
+    :rtype: str
+    """
+    return '>{0} Stand-in {1} record {0}\n{2}\n'.format(uid, db, self.sequence(uid))
+
+  def links(self, dbfrom, dbto, uid):
+    """Returns the UIDs in dbto linked to one UID in dbfrom
+
+    :rtype: list
+    """
+    seed = zlib.crc32('{}:{}'.format(dbfrom, dbto).encode())
+    return [(uid * 7919 + seed + i * 104729) % self.size + 1 for i in range(self.links_per_uid)]
+
+  def score(self, uid, link):
+    """Returns the score of a link
+
+    :rtype: int
+    """
+    return 1000000 - (uid * 31 + link) % 1000000
+
+
+class History:
+  """History emulates the Entrez history server. Each WebEnv stores a list of
+  UID lists which are referenced by their query key, starting at 1.
+  """
+
+  def __init__(self):
+    self.webenvs = {}
+    self.lock = threading.Lock()
+
+  def store(self, uids, webenv=None):
+    """Stores UIDs in a WebEnv. A new WebEnv is created if webenv is not
+    given or unknown.
+
+    :param uids: UIDs
+    :type  uids: list or range
+    :param str webenv: WebEnv
+    :return: WebEnv and query key
+    :rtype: tuple
+    """
+    with self.lock:
+      if webenv not in self.webenvs:
+        webenv = 'MCID_standin_{}'.format(uuid.uuid4().hex)
+        self.webenvs[webenv] = []
+      self.webenvs[webenv].append(uids)
+      return webenv, len(self.webenvs[webenv])
+
+  def fetch(self, webenv, querykey):
+    """Returns stored UIDs or None if WebEnv or query key are unknown
+
+    :param str webenv: WebEnv
+    :param int querykey: query key
+    :rtype: list, range or None
+    """
+    with self.lock:
+      entries = self.webenvs.get(webenv)
+      if entries is None or not 0 < int(querykey) <= len(entries):
+        return None
+      return entries[int(querykey)-1]
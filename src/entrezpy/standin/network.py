@@ -0,0 +1,212 @@
+"""
+..
+  Copyright 2020 The University of Sydney
+  This file is part of entrezpy.
+
+  Entrezpy is free software: you can redistribute it and/or modify it under the
+  terms of the GNU Lesser General Public License as published by the Free
+  Software Foundation, either version 3 of the License, or (at your option) any
+  later version.
+
+  Entrezpy is distributed in the hope that it will be useful, but WITHOUT ANY
+  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+  A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with entrezpy.  If not, see <https://www.gnu.org/licenses/>.
+
+.. module:: entrezpy.standin.network
+  :synopsis: Exports classes Latency, Faults and RateEnforcer emulating
+    network and server conditions of E-Utilities in the stand-in server.
+"""
+
+
+import time
+import random
+import threading
+import collections
+
+
+class Latency:
+  """Latency draws response latencies in seconds from a distribution. Use
+  the class methods to create one.
+
+    Latency.constant(0.1)
+    Latency.uniform(0.05, 0.2)
+    Latency.lognormal(0.1, 0.5)
+    Latency.exponential(0.1)
+
+  :param str kind: distribution, one of :attr:`kinds`
+  :param tuple param: distribution parameters
+  :param int seed: random seed for reproducible latencies
+  :raises ValueError: if the distribution is unknown
+  """
+
+  kinds = ('constant', 'uniform', 'lognormal', 'exponential')
+  """Known distributions"""
+
+  def __init__(self, kind, param, seed=None):
+    if kind not in Latency.kinds:
+      raise ValueError("Unknown latency distribution: {}, expected one of {}".format(
+        kind, ', '.join(Latency.kinds)))
+    self.kind = kind
+    self.param = param
+    self.random = random.Random(seed)
+    self.lock = threading.Lock()
+
+  @classmethod
+  def constant(cls, seconds):
+    """:rtype: :class:`Latency`"""
+    return cls('constant', (seconds,))
+
+  @classmethod
+  def uniform(cls, low, high, seed=None):
+    """:rtype: :class:`Latency`"""
+    return cls('uniform', (low, high), seed)
+
+  @classmethod
+  def lognormal(cls, median, sigma, seed=None):
+    """Log-normal latencies, the usual shape of server response times
+
+    :param float median: median latency in seconds
+    :param float sigma: standard deviation of the logarithm
+    :rtype: :class:`Latency`
+    """
+    return cls('lognormal', (median, sigma), seed)
+
+  @classmethod
+  def exponential(cls, mean, seed=None):
+    """:rtype: :class:`Latency`"""
+    return cls('exponential', (mean,), seed)
+
+  def sample(self):
+    """Returns one latency in seconds
+
+    :rtype: float
+    """
+    if self.kind == 'constant':
+      return self.param[0]
+    with self.lock:
+      if self.kind == 'uniform':
+        return self.random.uniform(*self.param)
+      if self.kind == 'lognormal':
+        return self.param[0] * self.random.lognormvariate(0, self.param[1])
+      return self.random.expovariate(1 / self.param[0])
+
+  def dump(self):
+    """:rtype: dict"""
+    return {'kind':self.kind, 'param':self.param}
+
+
+class Faults:
+  """Faults injects failures into responses of the stand-in server with the
+  given probabilities per request:
+
+  - `error`: HTTP server error, drawn from `error_codes`
+  - `throttle`: HTTP 429 like NCBI answers requests exceeding the rate limit
+  - `timeout`: the server stalls for `stall` seconds and closes the
+    connection without response
+  - `disconnect`: the server closes the connection without response
+
+  :param float error_rate: probability of server errors
+  :param tuple error_codes: HTTP status codes of server errors
+  :param float throttle_rate: probability of 429 responses
+  :param float timeout_rate: probability of timeouts
+  :param float stall: stall time for timeouts in seconds
+  :param float disconnect_rate: probability of closed connections
+  :param int seed: random seed for reproducible faults
+  :param float retry_after: `Retry-After` in seconds sent with 429 and 503
+    responses, None to send none
+  """
+
+  def __init__(self, error_rate=0.0, error_codes=(500, 502, 503), throttle_rate=0.0,
+               timeout_rate=0.0, stall=5.0, disconnect_rate=0.0, seed=None, retry_after=None):
+    self.error_rate = error_rate
+    self.error_codes = error_codes
+    self.throttle_rate = throttle_rate
+    self.timeout_rate = timeout_rate
+    self.stall = stall
+    self.disconnect_rate = disconnect_rate
+    self.retry_after = retry_after
+    self.random = random.Random(seed)
+    self.lock = threading.Lock()
+
+  def draw(self):
+    """Draws the fault for one request
+
+    :return: fault and HTTP status code if applicable, or (None, None)
+    :rtype: tuple
+    """
+    with self.lock:
+      p = self.random.random()
+      code = self.random.choice(self.error_codes) if self.error_codes else 500
+    for fault, rate in (('error', self.error_rate), ('throttle', self.throttle_rate),
+                        ('timeout', self.timeout_rate), ('disconnect', self.disconnect_rate)):
+      if p < rate:
+        if fault == 'error':
+          return fault, code
+        if fault == 'throttle':
+          return fault, 429
+        return fault, None
+      p -= rate
+    return None, None
+
+  def dump(self):
+    """:rtype: dict"""
+    return {'error_rate':self.error_rate, 'error_codes':self.error_codes,
+            'throttle_rate':self.throttle_rate, 'timeout_rate':self.timeout_rate,
+            'stall':self.stall, 'disconnect_rate':self.disconnect_rate,
+            'retry_after':self.retry_after}
+
+
+class RateEnforcer:
+  """RateEnforcer rejects requests exceeding the NCBI rate limits: at most
+  `anonymous` requests per `window` seconds without API key and `apikey`
+  requests with API key. Rates are counted per API key, or for all anonymous
+  requests together, over a sliding window. The window is shortened by
+  `slack` to tolerate jitter in arrival times of clients sending requests at
+  exactly the allowed rate.
+
+  :param int anonymous: allowed requests per window without API key
+  :param int apikey: allowed requests per window with API key
+  :param float window: window in seconds
+  :param float slack: tolerated jitter in seconds
+  """
+
+  def __init__(self, anonymous=3, apikey=10, window=1.0, slack=0.05):
+    self.anonymous = anonymous
+    self.apikey = apikey
+    self.window = window
+    self.slack = slack
+    self.arrivals = {}
+    self.lock = threading.Lock()
+
+  def limit(self, apikey):
+    """Returns the allowed requests per window for an API key
+
+    :rtype: int
+    """
+    return self.apikey if apikey else self.anonymous
+
+  def admit(self, apikey):
+    """Registers one request and tests if it is within the rate limit.
+    Rejected requests are not counted.
+
+    :param str apikey: API key or None
+    :return: if request is admitted and the number of requests in the window
+    :rtype: tuple
+    """
+    now = time.monotonic()
+    with self.lock:
+      arrivals = self.arrivals.setdefault(apikey, collections.deque())
+      while arrivals and arrivals[0] <= now - self.window + self.slack:
+        arrivals.popleft()
+      if len(arrivals) >= self.limit(apikey):
+        return False, len(arrivals) + 1
+      arrivals.append(now)
+      return True, len(arrivals)
+
+  def dump(self):
+    """:rtype: dict"""
+    return {'anonymous':self.anonymous, 'apikey':self.apikey, 'window':self.window,
+            'slack':self.slack}
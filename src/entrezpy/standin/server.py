@@ -0,0 +1,395 @@
+"""
+..
+  Copyright 2020 The University of Sydney
+  This file is part of entrezpy.
+
+  Entrezpy is free software: you can redistribute it and/or modify it under the
+  terms of the GNU Lesser General Public License as published by the Free
+  Software Foundation, either version 3 of the License, or (at your option) any
+  later version.
+
+  Entrezpy is distributed in the hope that it will be useful, but WITHOUT ANY
+  WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+  A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with entrezpy.  If not, see <https://www.gnu.org/licenses/>.
+
+.. module:: entrezpy.standin.server
+  :synopsis: Exports class StandinServer, a local HTTP server emulating the
+    NCBI E-Utilities for offline benchmarks and tests.
+"""
+
+
+import sys
+import gzip
+import json
+import time
+import threading
+import http.server
+import urllib.parse
+
+import entrezpy.standin.database
+import entrezpy.standin.network
+import entrezpy.log.logger
+
+
+class StandinHandler(http.server.BaseHTTPRequestHandler):
+  """StandinHandler answers GET and POST requests to the E-Utilities served
+  by :class:`StandinServer` over HTTP/1.1 keep-alive connections."""
+
+  protocol_version = 'HTTP/1.1'
+
+  disable_nagle_algorithm = True
+  """Headers and body are written separately. Without TCP_NODELAY the body
+  waits for the delayed ACK of the headers, adding about 40 ms per response."""
+
+  def log_message(self, format, *args):
+    self.server.logger.debug(lambda: {'client':self.client_address[0],
+                                      'request':format % args})
+
+  def do_GET(self):
+    self.handle_eutil(urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query))
+
+  def do_POST(self):
+    data = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8')
+    param = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+    for key, values in urllib.parse.parse_qs(data).items():
+      param.setdefault(key, []).extend(values)
+    self.handle_eutil(param)
+
+  def handle_eutil(self, param):
+    """Applies rate limit, faults and latency and sends the E-Utility
+    response.
+
+    :param dict param: request parameters as lists of values
+    """
+    server = self.server
+    eutil = urllib.parse.urlsplit(self.path).path.rsplit('/', 1)[-1]
+    server.count('requests')
+    if server.ratelimit:
+      apikey = StandinServer.value(param, 'api_key')
+      isAdmitted, count = server.ratelimit.admit(apikey)
+      if not isAdmitted:
+        server.count('throttled')
+        return self.send_body(429, 'application/json',
+                              json.dumps({'error':'API rate limit exceeded',
+                                          'api-key':apikey if apikey else self.client_address[0],
+                                          'count':str(count),
+                                          'limit':str(server.ratelimit.limit(apikey))}))
+    fault, code = server.faults.draw() if server.faults else (None, None)
+    if fault in ('error', 'throttle'):
+      server.count(fault)
+      headers = None
+      if server.faults.retry_after is not None and code in (429, 503):
+        headers = {'Retry-After':str(server.faults.retry_after)}
+      return self.send_body(code, 'text/plain', http.HTTPStatus(code).phrase, headers)
+    if fault in ('timeout', 'disconnect'):
+      server.count(fault)
+      if fault == 'timeout':
+        time.sleep(server.faults.stall)
+      self.close_connection = True
+      return None
+    if server.latency:
+      time.sleep(server.latency.sample())
+    if eutil not in StandinServer.eutils:
+      server.count('not_found')
+      return self.send_body(404, 'text/plain', 'Unknown E-Utility: {}'.format(eutil))
+    content_type, body = getattr(server, StandinServer.eutils[eutil])(param)
+    server.count(eutil)
+    return self.send_body(200, content_type, body)
+
+  def send_body(self, status, content_type, body, headers=None):
+    """Sends a response, gzip compressed if accepted by the client
+
+    :param int status: HTTP status code
+    :param str content_type: content type
+    :param str body: response body
+    :param dict headers: additional headers
+    """
+    body = body.encode('utf-8')
+    self.send_response(status)
+    self.send_header('Content-Type', '{}; charset=UTF-8'.format(content_type))
+    for name, value in (headers or {}).items():
+      self.send_header(name, value)
+    if self.server.compress and 'gzip' in self.headers.get('Accept-Encoding', ''):
+      body = gzip.compress(body, compresslevel=1)
+      self.send_header('Content-Encoding', 'gzip')
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+    self.server.count('bytes_sent', len(body))
+
+
+class StandinServer(http.server.ThreadingHTTPServer):
+  """StandinServer is a local HTTP server emulating esearch, efetch,
+  esummary, elink and epost well enough for the entrezpy parameter, request
+  and analyzer classes. It serves synthetic records from
+  :class:`entrezpy.standin.database.StandinDatabase`, keeps WebEnvs and query
+  keys in :class:`entrezpy.standin.database.History` and pages results with
+  retstart and retmax.
+
+  Latency, failures and NCBI rate limits can be emulated to measure
+  performance features reproducibly offline. Point queries at the server by
+  setting :attr:`entrezpy.base.query.EutilsQuery.base_url`:
+
+    server = entrezpy.standin.server.StandinServer(
+      latency=entrezpy.standin.network.Latency.lognormal(0.1, 0.5),
+      ratelimit=entrezpy.standin.network.RateEnforcer()).start()
+    entrezpy.base.query.EutilsQuery.base_url = server.url
+    ...
+    server.stop()
+
+  The elink commands neighbor, neighbor_score and neighbor_history are
+  emulated. Other commands are answered with an elink error response.
+
+  :param str host: host address
+  :param int port: port, 0 for a free port
+  :param database: synthetic records
+  :type  database: :class:`entrezpy.standin.database.StandinDatabase`
+  :param latency: response latency, default none
+  :type  latency: :class:`entrezpy.standin.network.Latency`
+  :param faults: injected failures, default none
+  :type  faults: :class:`entrezpy.standin.network.Faults`
+  :param ratelimit: enforced rate limits, default none
+  :type  ratelimit: :class:`entrezpy.standin.network.RateEnforcer`
+  :param bool compress: gzip compress responses if accepted by the client
+  :ivar dict stats: counters for requests, E-Utilities, faults and sent bytes
+  """
+
+  daemon_threads = True
+
+  eutils = {'esearch.fcgi':'esearch', 'efetch.fcgi':'efetch', 'esummary.fcgi':'esummary',
+            'elink.fcgi':'elink', 'epost.fcgi':'epost'}
+  """Emulated E-Utilities and their implementing methods"""
+
+  def __init__(self, host='127.0.0.1', port=0, database=None, latency=None, faults=None,
+               ratelimit=None, compress=True):
+    super().__init__((host, port), StandinHandler)
+    self.database = database if database else entrezpy.standin.database.StandinDatabase()
+    self.history = entrezpy.standin.database.History()
+    self.latency = latency
+    self.faults = faults
+    self.ratelimit = ratelimit
+    self.compress = compress
+    self.stats = {}
+    self.lock = threading.Lock()
+    self.thread = None
+    self.logger = entrezpy.log.logger.get_class_logger(StandinServer)
+
+  @property
+  def url(self):
+    """Base URL of the server, replacing
+    :attr:`entrezpy.base.query.EutilsQuery.base_url`
+
+    :rtype: str
+    """
+    return 'http://{}:{}'.format(*self.server_address[:2])
+
+  def start(self):
+    """Starts serving in a daemon thread
+
+    :return: the server
+    :rtype: :class:`StandinServer`
+    """
+    self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+    self.thread.start()
+    self.logger.info({'stand-in':{'url':self.url}})
+    return self
+
+  def stop(self):
+    """Stops serving and closes the server socket"""
+    self.shutdown()
+    self.server_close()
+    self.logger.info(lambda: {'stand-in':{'stopped':self.url, 'stats':self.stats}})
+
+  def __enter__(self):
+    return self.start()
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.stop()
+
+  def handle_error(self, request, client_address):
+    """Counts clients closing the connection before the response was sent,
+    e.g. cancelled hedged tries, instead of printing a traceback"""
+    if isinstance(sys.exc_info()[1], ConnectionError):
+      self.count('client_disconnect')
+      return
+    super().handle_error(request, client_address)
+
+  def count(self, counter, value=1):
+    """Increases a counter in :attr:`stats`"""
+    with self.lock:
+      self.stats[counter] = self.stats.get(counter, 0) + value
+
+  def dump(self):
+    """:rtype: dict"""
+    return {'url':self.url, 'stats':self.stats,
+            'latency':self.latency.dump() if self.latency else None,
+            'faults':self.faults.dump() if self.faults else None,
+            'ratelimit':self.ratelimit.dump() if self.ratelimit else None}
+
+  @staticmethod
+  def value(param, key, default=None):
+    """Returns the first value of a request parameter"""
+    return param.get(key, [default])[0]
+
+  @staticmethod
+  def ids(param):
+    """Returns the UIDs of the id parameters as integers"""
+    return [int(j) for i in param.get('id', []) for j in i.split(',') if j.strip()]
+
+  def get_uids(self, param):
+    """Returns the UIDs of a request from its id parameters or the history
+    server.
+
+    :return: UIDs, or None for unknown WebEnv or query key
+    :rtype: list, range or None
+    """
+    webenv = StandinServer.value(param, 'WebEnv')
+    querykey = StandinServer.value(param, 'query_key')
+    if webenv and querykey and 'id' not in param:
+      return self.history.fetch(webenv, querykey)
+    return StandinServer.ids(param)
+
+  @staticmethod
+  def page(uids, param, default_retmax):
+    """Returns the UIDs within retstart and retmax"""
+    retstart = int(StandinServer.value(param, 'retstart', 0))
+    retmax = int(StandinServer.value(param, 'retmax', default_retmax))
+    return uids[retstart:retstart+retmax]
+
+  def esearch(self, param):
+    """Emulates esearch.fcgi, answering in JSON
+
+    :rtype: tuple(str, str)
+    """
+    db = StandinServer.value(param, 'db', 'pubmed')
+    term = StandinServer.value(param, 'term')
+    result = {'header':{'type':'esearch', 'version':'0.3'}}
+    if term:
+      uids = self.database.search(db, term)
+    else:
+      uids = self.get_uids(param)
+      if uids is None or 'WebEnv' not in param:
+        result['esearchresult'] = {'ERROR':'Empty term and query_key - nothing todo'}
+        return 'application/json', json.dumps(result)
+    retstart = int(StandinServer.value(param, 'retstart', 0))
+    idlist = [] if StandinServer.value(param, 'rettype') == 'count' \
+                else StandinServer.page(uids, param, 20)
+    result['esearchresult'] = {'count':str(len(uids)), 'retmax':str(len(idlist)),
+                               'retstart':str(retstart), 'idlist':[str(i) for i in idlist],
+                               'translationset':[], 'querytranslation':term if term else ''}
+    if StandinServer.value(param, 'usehistory') == 'y':
+      webenv, querykey = self.history.store(uids, StandinServer.value(param, 'WebEnv'))
+      result['esearchresult'].update({'webenv':webenv, 'querykey':str(querykey)})
+    return 'application/json', json.dumps(result)
+
+  def esummary(self, param):
+    """Emulates esummary.fcgi, answering in JSON or XML
+
+    :rtype: tuple(str, str)
+    """
+    db = StandinServer.value(param, 'db', 'pubmed')
+    uids = self.get_uids(param)
+    isXml = StandinServer.value(param, 'retmode') == 'xml'
+    if not uids:
+      if isXml:
+        return 'text/xml', '<?xml version="1.0" ?>\n<eSummaryResult><ERROR>Empty id list - ' \
+                           'nothing todo</ERROR></eSummaryResult>\n'
+      return 'application/json', json.dumps({'header':{'type':'esummary', 'version':'0.3'},
+                                             'error':'Empty id list - nothing todo'})
+    if 'WebEnv' in param and 'id' not in param:
+      uids = StandinServer.page(uids, param, 10000)
+    if isXml:
+      docsums = []
+      for i in uids:
+        summary = self.database.summary(db, i)
+        items = ''.join('<Item Name="{}" Type="String">{}</Item>'.format(k, v)
+                        for k, v in summary.items() if k != 'uid')
+        docsums.append('<DocSum><Id>{}</Id>{}</DocSum>'.format(i, items))
+      return 'text/xml', '<?xml version="1.0" ?>\n<eSummaryResult>{}</eSummaryResult>\n'.format(
+        ''.join(docsums))
+    result = {'uids':[str(i) for i in uids]}
+    for i in uids:
+      result[str(i)] = self.database.summary(db, i)
+    return 'application/json', json.dumps({'header':{'type':'esummary', 'version':'0.3'},
+                                           'result':result})
+
+  def efetch(self, param):
+    """Emulates efetch.fcgi, answering XML records, FASTA or UID lists as
+    text or, with retmode xml, as XML IdList
+
+    :rtype: tuple(str, str)
+    """
+    db = StandinServer.value(param, 'db', 'pubmed')
+    uids = self.get_uids(param)
+    if not uids:
+      return 'text/xml', '<?xml version="1.0" ?>\n<eFetchResult><ERROR>Empty id list - ' \
+                         'nothing todo</ERROR></eFetchResult>\n'
+    if 'WebEnv' in param and 'id' not in param:
+      uids = StandinServer.page(uids, param, 20)
+    if StandinServer.value(param, 'rettype') == 'uilist':
+      if StandinServer.value(param, 'retmode') == 'xml':
+        return 'text/xml', '<?xml version="1.0" ?>\n<eSearchResult>\n<IdList>\n{}</IdList>\n' \
+                           '</eSearchResult>\n'.format(''.join('<Id>{}</Id>\n'.format(i)
+                                                               for i in uids))
+      return 'text/plain', ''.join('{}\n'.format(i) for i in uids)
+    if StandinServer.value(param, 'retmode', 'xml') == 'xml':
+      return 'text/xml', '<?xml version="1.0" ?>\n<StandinRecordSet>\n{}\n</StandinRecordSet>\n'.format(
+        '\n'.join(self.database.record_xml(db, i) for i in uids))
+    return 'text/plain', ''.join(self.database.record_text(db, i) for i in uids)
+
+  def epost(self, param):
+    """Emulates epost.fcgi, answering in XML
+
+    :rtype: tuple(str, str)
+    """
+    uids = StandinServer.ids(param)
+    if not uids:
+      return 'text/xml', '<?xml version="1.0" ?>\n<ePostResult><ERROR>Empty id list - ' \
+                         'nothing todo</ERROR></ePostResult>\n'
+    webenv, querykey = self.history.store(uids, StandinServer.value(param, 'WebEnv'))
+    return 'text/xml', '<?xml version="1.0" ?>\n<ePostResult>\n\t<QueryKey>{}</QueryKey>\n' \
+                       '\t<WebEnv>{}</WebEnv>\n</ePostResult>\n'.format(querykey, webenv)
+
+  def elink(self, param):
+    """Emulates elink.fcgi commands neighbor, neighbor_score and
+    neighbor_history, answering in JSON. Each id parameter is linked
+    separately, i.e. id=1&id=2 results in two linksets and id=1,2 in one.
+
+    :rtype: tuple(str, str)
+    """
+    result = {'header':{'type':'elink', 'version':'0.3'}}
+    cmd = StandinServer.value(param, 'cmd', 'neighbor')
+    dbfrom = StandinServer.value(param, 'dbfrom', 'pubmed')
+    dbto = StandinServer.value(param, 'db', dbfrom)
+    linkname = StandinServer.value(param, 'linkname', '{}_{}'.format(dbfrom, dbto))
+    if cmd not in ('neighbor', 'neighbor_score', 'neighbor_history'):
+      result['ERROR'] = 'Command {} not supported by entrezpy stand-in'.format(cmd)
+      return 'application/json', json.dumps(result)
+    if 'id' in param:
+      idsets = [StandinServer.ids({'id':[i]}) for i in param['id']]
+    else:
+      idsets = [self.get_uids(param)]
+    if not idsets or None in idsets:
+      result['ERROR'] = 'Empty id list - nothing todo'
+      return 'application/json', json.dumps(result)
+    result['linksets'] = []
+    for ids in idsets:
+      links = sorted({j for i in ids for j in self.database.links(dbfrom, dbto, i)})
+      linkset = {'dbfrom':dbfrom, 'ids':[str(i) for i in ids]}
+      if cmd == 'neighbor':
+        linkset['linksetdbs'] = [{'dbto':dbto, 'linkname':linkname,
+                                  'links':[str(i) for i in links]}]
+      if cmd == 'neighbor_score':
+        linkset['linksetdbs'] = [{'dbto':dbto, 'linkname':linkname,
+                                  'links':[{'id':str(i), 'score':str(self.database.score(ids[0], i))}
+                                           for i in links]}]
+      if cmd == 'neighbor_history':
+        webenv, querykey = self.history.store(links, StandinServer.value(param, 'WebEnv'))
+        linkset['webenv'] = webenv
+        linkset['linksetdbhistories'] = [{'dbto':dbto, 'linkname':linkname,
+                                          'querykey':str(querykey)}]
+      result['linksets'].append(linkset)
+    return 'application/json', json.dumps(result)